@@ -4,7 +4,15 @@ import math
 import copy
 import time
 import sys
+import threading
+import queue
+import bisect
+import json
+import hashlib
+import shutil
+import tempfile
 import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
 import numpy as np
 import pandas as pd
 import xgboost as xgb
@@ -18,11 +26,30 @@ from sklearn.metrics import balanced_accuracy_score, multilabel_confusion_matrix
 from sklearn.metrics import accuracy_score, fbeta_score, precision_recall_fscore_support, roc_auc_score
 from sklearn.metrics import roc_curve, auc
 #from sklearn.metrics.pairwise import manhattan_distances
-from scipy.stats import ranksums
+from scipy.stats import ranksums, rankdata, norm
 from sklearn.ensemble import VotingClassifier
 import os
 import mifs
 from scipy.spatial.distance import cityblock
+from collections import OrderedDict
+
+# Cores the evaluations of the process can use. None for all the cores of the machine (see the islands of apply_island_model())
+available_cores = None
+
+def available_cpu_count():
+    return available_cores if available_cores else mp.cpu_count()
+
+# Data of the processes of the pools (evaluation, majority voting, KNN imputation) by pool. Filled once per process by the initializer of the pool
+_worker_states = {}
+
+def worker_state(pool_name, **values):
+    '''
+    Returns the data of the pool_name pool in this process, after adding the given values. The initializer of a pool
+    gives the data once per process instead of once per task and the tasks only read it.
+    '''
+    state = _worker_states.setdefault(pool_name, {})
+    state.update(values)
+    return state
 
 class Individual():
     """
@@ -31,17 +58,22 @@ class Individual():
     Attributes:
         individual: individual solution --> Just one individual not the whole individual matrix!
         process_i: i-th process
-        dataset: the input dataset
+        dataset: the input dataset (Features X Samples, or Samples X Features if sample_major is True)
         dataset_with_missing_values: the dataset with missing values imputated
         labels: (list) List with output labels per sample
         num_of_folds: (int) the number of folds
         output_folder: the output folder
+        nthread: (int) the number of threads XGBoost uses for the training. Default: all the cores of the machine
+        sample_major: (bool) True if the dataset is a Samples X Features array (e.g. the view of a SharedDataset)
+        binned: (bool) True to train on the pre-binned folds of BinnedFolds with the hist tree method
+        dmatrix_pool: (DMatrixPool) if given, the DMatrix of the folds are taken from (or kept in) this pool
+        keep_boosters: (bool) True to keep the boosters of the folds in the XGBoost binary format in boosters (see ModelStore)
     """
 
-    def __init__(self, individual, process_i, dataset, labels, num_of_folds, filter_mask, multiclass=True, random_state=None, last_eval=False, feature_names=None, verbose=True):
+    def __init__(self, individual, process_i, dataset, labels, num_of_folds, filter_mask, multiclass=True, random_state=None, last_eval=False, feature_names=None, verbose=True, nthread=None, sample_major=False, binned=False, dmatrix_pool=None, keep_boosters=False):
         self.individual = np.array(individual)
         self.process_i = process_i
-        self.dataset = np.array(dataset)
+        self.dataset = np.asarray(dataset) # No copy. The dataset is only read by the individual
         self.labels = labels
         self.num_of_folds = num_of_folds
         self.parameters = parameters #Global parameter
@@ -51,61 +83,82 @@ class Individual():
         self.last_eval = last_eval
         self.feature_names = feature_names
         self.verbose = verbose
-
-    def evaluate(self):
+        self.nthread = nthread if nthread else available_cpu_count() # Threads of XGBoost. Fewer when the individuals are evaluated in a pool of processes
+        self.sample_major = sample_major
+        self.binned = binned
+        self.dmatrix_pool = dmatrix_pool
+        self.keep_boosters = keep_boosters
+        self.boosters = []
+
+    def evaluate(self, folds=None):
         '''
         Evaluates the solutions of the population one by one (in parallel processes) by creating XGBoost models and evaluating their performances
 
         Input: an Individual class object
-        Arduments: None
+        Arduments: folds: the indices of the folds of the cross validation to train. All the folds if None
         Output: 
             - An array of the evaluation metrics and the standard deviation of the K-fold cross validation
             - An array of the FPR and TPR to build the AUC ROC
         '''
-        evaluation_values = []
-        l = self.individual.shape[0] - self.parameters
+        return self.summarize(self.train_folds(folds))
+
+    def booster_params(self):
+        '''
+        The XGBoost parameters of the boosters of the individual (its hyperparameter genes)
+        '''
+        xgb_params = {'eta':self.individual[4], 'max_depth':int(self.individual[5]),
+                    'gamma':self.individual[6], 'lambda':self.individual[7],
+                    'alpha':self.individual[8], 'min_child_weight':self.individual[9],
+                    'scale_pos_weight':self.individual[10],
+                    'nthread':self.nthread,'objective':'binary:logistic', 'eval_metric':['auc']}
+                    #'colsample_bytree':self.individual[11],'subsample':self.individual[12],\
+        if self.multiclass==True:
+            xgb_params['objective']='multi:softmax'
+            xgb_params['eval_metric']=['mlogloss']
+            xgb_params['num_class']=np.unique(self.labels).shape[0]
+        return xgb_params
 
+    def feature_mask(self):
         mask = self.filter_mask.copy()
 
         # No need to keep the parameters in the mask variable. We use it only for the features we want to select
         mask = mask[self.parameters:].round()
         mask = mask.astype(bool)#np.array(mask,dtype=bool)
-        if mask.any():
-            num_rounds = 1000
-            xgb_params = {'eta':self.individual[4], 'max_depth':int(self.individual[5]),
-                        'gamma':self.individual[6], 'lambda':self.individual[7],
-                        'alpha':self.individual[8], 'min_child_weight':self.individual[9],
-                        'scale_pos_weight':self.individual[10],
-                        'nthread':mp.cpu_count(),'objective':'binary:logistic', 'eval_metric':['auc']}
-                        #'colsample_bytree':self.individual[11],'subsample':self.individual[12],\
-            if self.multiclass==True:
-                xgb_params['objective']='multi:softmax'
-                xgb_params['eval_metric']=['mlogloss']
-                xgb_params['num_class']=np.unique(self.labels).shape[0]
-
-
-            inputs = self.dataset[mask,:] # Apply the mask on the dataset to keep ONLY the "approved" features as inputs
-            inputs = inputs.T # Transpose the input to be Samples X Features
-            outputs = self.labels.copy()
-
+        return mask
 
-            N_trees=[]
-            metrics_array = []#np.empty((10,self.num_of_folds))
-            i=0
-            fpr_tpr_array = []
-            skf = StratifiedKFold(n_splits = self.num_of_folds, shuffle = True, random_state=self.random_state)
-            for train_index, test_index in skf.split(inputs, outputs):
-                training_inputs, testing_inputs = inputs[train_index], inputs[test_index]
-                training_outputs, testing_outputs = outputs[train_index], outputs[test_index]
-                dtrain = xgb.DMatrix(training_inputs, label = training_outputs)
-                deval = xgb.DMatrix(testing_inputs, label = testing_outputs)
-                metrics_array.append([])
+    def train_folds(self, folds=None):
+        '''
+        Trains one booster on each fold of the cross validation (or only on the given folds) and predicts the evaluation samples
 
+        Returns: a list with (evaluation labels, predictions, split complexity, number of trees) of every trained fold.
+        Empty if the individual has no feature.
+        '''
+        fold_records = []
+        mask = self.feature_mask()
+        if mask.any():
+            num_rounds = 1000
+            xgb_params = self.booster_params()
+            if self.binned:
+                binned_folds = get_binned_folds(self.dataset, self.labels, self.num_of_folds, self.random_state, self.sample_major)
+                xgb_params['tree_method'] = 'hist'
+                xgb_params['max_bin'] = binned_folds.max_bin
+                build_fold_matrices = binned_folds.matrices
+            else:
+                build_fold_matrices = self.fold_matrices
+            if self.dmatrix_pool is not None: # Individuals with the same features differ only in the hyperparameters
+                fold_matrices = self.dmatrix_pool.get_or_build(mask, (self.num_of_folds, self.random_state, self.binned), build_fold_matrices)
+            else:
+                fold_matrices = build_fold_matrices(mask)
+            for fold, (dtrain, deval, testing_outputs) in enumerate(fold_matrices):
+                if folds is not None and fold not in folds:
+                    continue
                 watchlist = [(deval,'eval')]
 
                 verbose_eval = False
                 booster = xgb.train(params = xgb_params, dtrain = dtrain, num_boost_round = num_rounds,
                                     evals = watchlist, early_stopping_rounds = 100,verbose_eval = verbose_eval)
+                if self.keep_boosters:
+                    self.boosters.append(booster.save_raw())
 
                 ############################################
 
@@ -120,42 +173,50 @@ class Individual():
                     total_splits += n_nodes - n_leaves
 
 
-                N_trees.append(booster.best_ntree_limit)
                 predictions = booster.predict(deval, iteration_range = (0,booster.best_ntree_limit))+1e-08
 
                 ############################################
 
-                ######### Calculating AUC,FPR,TPR  #########
+                fold_records.append((testing_outputs, predictions,
+                                     1-(total_splits/(booster.best_ntree_limit*(2**(xgb_params['max_depth'])-1))), # complexity Splits
+                                     booster.best_ntree_limit))
+        return fold_records
 
-                fpr, tpr, threshold = roc_curve(testing_outputs, predictions)
-                roc_auc = auc(fpr, tpr)
+    def summarize(self, fold_records):
+        '''
+        Calculates the evaluation of the individual (see evaluate()) from the fold_records of train_folds()
+        '''
+        evaluation_values = []
+        mask = self.feature_mask()
+        if fold_records:
+            metrics_array = []#np.empty((10,self.num_of_folds))
+            fpr_tpr_array = []
+            fold_labels = [record[0] for record in fold_records]
+            fold_predictions = [record[1] for record in fold_records]
+            fold_split_complexity = [record[2] for record in fold_records]
+            N_trees = [record[3] for record in fold_records]
 
-                fpr_tpr_array.append((fpr, tpr, threshold, roc_auc))
+            ######### Calculating the metrics of all the folds at once #########
+            folds = np.repeat(np.arange(len(fold_labels)), [fold.shape[0] for fold in fold_labels])
+            mertics_calc = classification_metrics(np.concatenate(fold_labels), np.concatenate(fold_predictions), np.unique(self.labels), folds)
 
-                ############################################
+            for i in range(len(fold_labels)):
+                fpr_tpr_array.append((*mertics_calc['roc_curve'][i], mertics_calc['roc_auc'][i])) # fpr, tpr, threshold, roc_auc
 
                 # Metrics calculation
-                # Feature complexity
-                metrics_array[i].append(10/(10+np.sum(mask))) #0 complexity features
-
-                metrics_array[i].append(accuracy_score(deval.get_label(),predictions.round())) #1 Accuracy
-
-                metrics_array[i].append(1-(total_splits/(booster.best_ntree_limit*(2**(xgb_params['max_depth'])-1)))) #2 complexity Splits
-
-                metrics_array[i].append(weighted_geometric_mean(deval.get_label(),predictions.round(),np.unique(self.labels))) #3 wGM
-
-                mertics_calc = mertics_calculator(deval.get_label(),predictions) #3
-
-                metrics_array[i].append(mertics_calc['f1_score']) #4 F1 score
-                metrics_array[i].append(mertics_calc['f2_score']) #5 F2 score
-                metrics_array[i].append(mertics_calc['Precision']) #6 Precision
-                metrics_array[i].append(mertics_calc['Recall']) #7 Recall
-                metrics_array[i].append(mertics_calc['roc_auc']) #8 AUC
-                metrics_array[i].append(mertics_calc['Balanced_accuracy']) #9 balanced Accuracy
+                metrics_array.append([10/(10+np.sum(mask)), #0 complexity features
+                                      mertics_calc['Accuracy'][i], #1 Accuracy
+                                      fold_split_complexity[i], #2 complexity Splits
+                                      mertics_calc['wGM'][i], #3 wGM
+                                      mertics_calc['f1_score'][i], #4 F1 score
+                                      mertics_calc['f2_score'][i], #5 F2 score
+                                      mertics_calc['Precision'][i], #6 Precision
+                                      mertics_calc['Recall'][i], #7 Recall
+                                      mertics_calc['roc_auc'][i], #8 AUC
+                                      mertics_calc['Balanced_accuracy'][i]]) #9 balanced Accuracy
                 metrics_array[i].append(np.asarray(metrics_array[i]).mean()) #10 Overall score
                 if self.multiclass:
-                    metrics_array[i].append(1/mertics_calc['manhattan_distance'] if mertics_calc['manhattan_distance']>0 else 1.0) #9
-                i+=1
+                    metrics_array[i].append(1/mertics_calc['manhattan_distance'][i] if mertics_calc['manhattan_distance'][i]>0 else 1.0) #9
 
             #USE THE metrics_array TO CALCULATE STDV & MEAN!
             mean_array = np.array(metrics_array).mean(axis=0)
@@ -214,6 +275,26 @@ class Individual():
                 print(f'Manhattan_distance: {goal11}')
         return np.array(evaluation_values, dtype=float), list(zip(mean_array,stdv_array)), fpr_tpr_array # returns to evaluate_individuals
 
+    def fold_matrices(self, mask):
+        '''
+        Yields the training and evaluation DMatrix and the evaluation labels of every fold of the cross validation
+        for the features of the mask.
+        '''
+        if self.sample_major:
+            inputs = self.dataset[:,mask] # Copies only the columns of the "approved" features
+        else:
+            inputs = self.dataset[mask,:] # Apply the mask on the dataset to keep ONLY the "approved" features as inputs
+            inputs = inputs.T # Transpose the input to be Samples X Features
+        outputs = self.labels.copy()
+
+        skf = StratifiedKFold(n_splits = self.num_of_folds, shuffle = True, random_state=self.random_state)
+        for train_index, test_index in skf.split(inputs, outputs):
+            training_inputs, testing_inputs = inputs[train_index], inputs[test_index]
+            training_outputs, testing_outputs = outputs[train_index], outputs[test_index]
+            dtrain = xgb.DMatrix(training_inputs, label = training_outputs)
+            deval = xgb.DMatrix(testing_inputs, label = testing_outputs)
+            yield dtrain, deval, testing_outputs
+
     def training_best(self,N_trees):
         '''
         Trains one final model based on the parameters of the individual in the first place ot the array (The one with the highest overall score)
@@ -233,16 +314,7 @@ class Individual():
         assert mask.sum()==self.dataset.shape[1]
 
         num_rounds = N_trees
-        xgb_params = {'eta':self.individual[4], 'max_depth':int(self.individual[5]),
-                'gamma':self.individual[6], 'lambda':self.individual[7],
-                'alpha':self.individual[8], 'min_child_weight':self.individual[9],
-                'scale_pos_weight':self.individual[10],
-                'nthread':mp.cpu_count(),'objective':'binary:logistic', 'eval_metric':['auc']}
-        if self.multiclass==True:
-            xgb_params['objective']='multi:softmax'
-            xgb_params['eval_metric']=['mlogloss']
-            xgb_params['num_class']=np.unique(self.labels).shape[0]
-
+        xgb_params = self.booster_params()
 
         inputs = self.dataset.copy()
         outputs = self.labels.copy()
@@ -282,7 +354,7 @@ class Individual():
                 'gamma':self.individual[6], 'lambda':self.individual[7],
                 'alpha':self.individual[8], 'min_child_weight':self.individual[9],
                 'scale_pos_weight':self.individual[10],
-                'nthread':mp.cpu_count(),'objective':'binary:logistic', 'eval_metric':['auc']}
+                'nthread':self.nthread,'objective':'binary:logistic', 'eval_metric':['auc']}
                 #'colsample_bytree':self.individual[11],'subsample':self.individual[12],\
         if self.multiclass==True:
             xgb_params['objective']='multi:softmax'
@@ -301,9 +373,591 @@ class Individual():
 
         return model
 
-def majority_voting(individuals, dataset, labels, filter_mask, index, num_of_folds, N_trees, multiclass, output_folder, par_type, feature_names, verbose):
-    
-    skf = StratifiedKFold(n_splits = num_of_folds, shuffle = True, random_state=np.random.randint(50))
+class FitnessCache():
+    """
+    Keeps the fitness of the individuals that have already been evaluated, so that duplicated individuals and
+    the elite individual of every generation are not trained again.
+
+    The key of an evaluation is the effective genome of the individual (the rounded filter mask of the features and
+    the hyperparameters XGBoost uses, with max_depth cast to int) together with the plan of the folds. The results of
+    an individual are reused across generations only if the folds are fixed (see the cv_seed of evaluate_individuals).
+
+    Attributes:
+        max_size: (int) the maximum number of evaluations kept. The least recently used evaluation is dropped first
+        hits: (int) the number of evaluations taken from the cache
+        misses: (int) the number of evaluations not found in the cache
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._evaluations = OrderedDict()
+
+    def __len__(self):
+        return len(self._evaluations)
+
+    @staticmethod
+    def key(individual, filter_mask, random_state, num_of_folds):
+        '''
+        Returns the key of the evaluation of an individual with a given plan of folds
+        '''
+        features = np.packbits(filter_mask[parameters:].round().astype(bool)).tobytes()
+        hyperparameters = (individual[4], int(individual[5]), individual[6], individual[7],
+                           individual[8], individual[9], individual[10])
+        return (features, tuple(float(h) for h in hyperparameters), random_state, num_of_folds)
+
+    def get(self, key):
+        if key in self._evaluations:
+            self._evaluations.move_to_end(key)
+            self.hits += 1
+            return self._evaluations[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, evaluation):
+        self._evaluations[key] = evaluation
+        self._evaluations.move_to_end(key)
+        while len(self._evaluations) > self.max_size:
+            self._evaluations.popitem(last=False)
+
+    def to_arrays(self):
+        '''
+        Returns the evaluations of the cache as a dict of arrays for np.savez (see from_arrays()), from the least to the most recently used:
+            features (Evaluations X bytes of the packed filter mask), hyperparameters (Evaluations X 7), plans (Evaluations X [random_state, num_of_folds]),
+            results (Evaluations X res), mean_std_counts and mean_std (the (mean, std) pairs of all the evaluations),
+            with_features (False for the evaluations without features, their ROC is zeros), roc_lengths (points of every fold),
+            roc_points (fpr, tpr, threshold of all the folds), roc_auc (one per fold) and counters ([max_size, hits, misses])
+        '''
+        keys = list(self._evaluations.keys())
+        evaluations = list(self._evaluations.values())
+        n_bytes = len(keys[0][0]) if keys else 0
+        with_features = np.array([not isinstance(roc, np.ndarray) for _, _, roc in evaluations], dtype=bool)
+        folds = [fold for (_, _, roc), has_roc in zip(evaluations, with_features) if has_roc for fold in roc]
+        return {'features': np.frombuffer(b''.join(key[0] for key in keys), dtype=np.uint8).reshape(len(keys), n_bytes),
+                'hyperparameters': np.array([key[1] for key in keys], dtype=float).reshape(len(keys), 7),
+                'plans': np.array([key[2:] for key in keys], dtype=np.int64).reshape(len(keys), 2),
+                'results': np.array([res for res, _, _ in evaluations], dtype=float),
+                'mean_std_counts': np.array([len(mean_std) for _, mean_std, _ in evaluations], dtype=np.int64),
+                'mean_std': np.array([pair for _, mean_std, _ in evaluations for pair in mean_std], dtype=float).reshape(-1, 2),
+                'with_features': with_features,
+                'roc_lengths': np.array([len(fold[0]) for fold in folds], dtype=np.int64),
+                'roc_points': np.concatenate([np.column_stack(fold[:3]) for fold in folds]) if folds else np.empty((0, 3)),
+                'roc_auc': np.array([fold[3] for fold in folds], dtype=float),
+                'counters': np.array([self.max_size, self.hits, self.misses], dtype=np.int64)}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        '''
+        Returns the FitnessCache of the arrays of to_arrays()
+        '''
+        max_size, hits, misses = (int(counter) for counter in arrays['counters'])
+        cache = cls(max_size)
+        cache.hits, cache.misses = hits, misses
+        mean_std = np.split(arrays['mean_std'], np.cumsum(arrays['mean_std_counts'])[:-1])
+        roc_points = np.split(arrays['roc_points'], np.cumsum(arrays['roc_lengths'])[:-1])
+        fold = 0
+        for i in range(arrays['features'].shape[0]):
+            random_state, num_of_folds = (int(value) for value in arrays['plans'][i])
+            key = (arrays['features'][i].tobytes(), tuple(float(h) for h in arrays['hyperparameters'][i]), random_state, num_of_folds)
+            if arrays['with_features'][i]:
+                roc = [(points[:,0].copy(), points[:,1].copy(), points[:,2].copy(), arrays['roc_auc'][k])
+                       for k, points in enumerate(roc_points[fold:fold+num_of_folds], fold)]
+                fold += num_of_folds
+            else:
+                roc = np.zeros((num_of_folds,4))
+            cache._evaluations[key] = (arrays['results'][i].copy(), list(zip(mean_std[i][:,0], mean_std[i][:,1])), roc)
+        return cache
+
+class ModelStore():
+    """
+    Keeps the boosters of the cross validation of the individuals on the first Pareto front, in the XGBoost binary
+    format, so that majority_voting() reuses them instead of training the models of its folds again.
+
+    The boosters of the folds are kept with the key of FitnessCache.key(), which includes the random state of the
+    folds, so majority_voting() only finds the boosters of the evaluations that had the same folds as its own. The
+    first N_trees trees of a booster are the model training_best() trains on the same fold.
+
+    Attributes:
+        keys: the keys of the individuals of the last evaluate_individuals()
+        reused: (int) the number of boosters majority_voting() took from the store
+        trained: (int) the number of boosters majority_voting() had to train
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.reused = 0
+        self.trained = 0
+        self._boosters = {}
+
+    def __len__(self):
+        return len(self._boosters)
+
+    def put(self, key, boosters):
+        self._boosters[key] = boosters
+
+    def get(self, key):
+        return self._boosters.get(key)
+
+    def retain(self, positions):
+        '''
+        Keeps only the boosters of the individuals in these positions of the last evaluation (e.g. the first Pareto front)
+        '''
+        kept = set(self.keys[i] for i in positions)
+        self._boosters = {key: boosters for key, boosters in self._boosters.items() if key in kept}
+
+    @staticmethod
+    def booster(raw_booster, n_trees):
+        '''
+        Returns the first n_trees rounds of a stored booster, or None if it has fewer rounds
+        '''
+        booster = xgb.Booster(model_file=bytearray(raw_booster))
+        if booster.num_boosted_rounds() < n_trees:
+            return None
+        return booster[0:int(n_trees)]
+
+class ParetoArchive():
+    """
+    Non-dominated individuals found during the evolution, kept across the generations. The objectives are the
+    evaluation values without the overall score, as in pareto_frontiers() (higher is better).
+
+    The entries are sorted by their first objective (descending) in arrays with spare capacity, which double when they
+    are full. A new individual can only be dominated by the entries with a higher or equal first objective and can only
+    dominate the entries with a lower or equal one, so its position is found with a binary search and only these two
+    parts of the archive are compared with it. With n entries:
+        dominated(): O(log n) for the binary search and O(k*objectives) for the k entries with a higher or equal first objective
+        insert(): the same comparisons with the stronger and the weaker entries, then the entries after the position of the
+                  new individual are moved by one in place, O((n-position)*(genes+objectives)), the growth of the arrays is
+                  amortized O(genes+objectives) per insertion, the removal of dominated entries (O(n*(genes+objectives)))
+                  happens only when the new individual dominates some, and the eviction of max_size is an O(n) argmin.
+    So an insertion is O(n) in the worst case (a vectorized scan and a memmove), not the O(log n) of a tree.
+
+    The evaluations of different generations are compared only if the folds are fixed (see the cv_seed of
+    evaluate_individuals), otherwise an individual stays in the archive with the evaluation of its own folds.
+
+    Attributes:
+        max_size: (int) the maximum number of individuals kept. The one with the lowest overall score is dropped first. None for no limit
+        insertions: (int) the number of individuals that entered the archive
+        individuals: (ndarray) Archive X genes, None if the archive is empty
+        evaluation_values: (ndarray) Eval_val X Archive, None if the archive is empty
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.insertions = 0
+        self._size = 0
+        self._keys = np.empty(0) # -first objective, ascending
+        self._genomes = set()
+        self._individuals = None # Capacity X genes
+        self._values = None # Capacity X Eval_val
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def individuals(self):
+        return self._individuals[:self._size] if self._size else None
+
+    @property
+    def evaluation_values(self):
+        return self._values[:self._size].T if self._size else None
+
+    def _reserve(self, n_genes, n_values):
+        # Room for one more entry. The capacity doubles when the arrays are full
+        capacity = self._keys.shape[0]
+        if self._size < capacity:
+            return
+        capacity = max(16, 2*capacity)
+        keys, individuals, values = np.empty(capacity), np.empty((capacity, n_genes)), np.empty((capacity, n_values))
+        if self._size:
+            keys[:self._size], individuals[:self._size], values[:self._size] = self._keys[:self._size], self.individuals, self._values[:self._size]
+        self._keys, self._individuals, self._values = keys, individuals, values
+
+    def dominated(self, evaluation_values):
+        '''
+        Returns True if an entry of the archive dominates the individual with these evaluation values
+        '''
+        objectives = np.asarray(evaluation_values, dtype=float)[:-1]
+        if not self._size:
+            return False
+        stronger = self._values[:np.searchsorted(self._keys[:self._size], -objectives[0], side='right'),:-1]
+        return bool(((stronger >= objectives).all(axis=1) & (stronger > objectives).any(axis=1)).any())
+
+    def insert(self, individual, evaluation_values):
+        '''
+        Adds the individual if no entry dominates it and removes the entries it dominates.
+        Returns True if the individual entered the archive
+        '''
+        individual = np.asarray(individual, dtype=float)
+        evaluation_values = np.asarray(evaluation_values, dtype=float)
+        genome = individual.tobytes()
+        if genome in self._genomes or self.dominated(evaluation_values):
+            return False
+        key = -evaluation_values[0]
+        if self._size:
+            objectives = evaluation_values[:-1]
+            start = np.searchsorted(self._keys[:self._size], key, side='left')
+            weaker = self._values[start:self._size,:-1]
+            self._remove(start+np.flatnonzero((objectives >= weaker).all(axis=1) & (objectives > weaker).any(axis=1)))
+        self._reserve(individual.shape[0], evaluation_values.shape[0])
+        n = self._size
+        position = np.searchsorted(self._keys[:n], key, side='right')
+        self._keys[position+1:n+1] = self._keys[position:n]
+        self._individuals[position+1:n+1] = self._individuals[position:n]
+        self._values[position+1:n+1] = self._values[position:n]
+        self._keys[position], self._individuals[position], self._values[position] = key, individual, evaluation_values
+        self._size += 1
+        self._genomes.add(genome)
+        self.insertions += 1
+        if self.max_size is not None and self._size > self.max_size:
+            self._remove([self._values[:self._size,-1].argmin()])
+        return True
+
+    def update(self, individuals, evaluation_values):
+        '''
+        Inserts all the individuals of a population (Indiv X genes) with their evaluation values (Eval_val X Indiv).
+        Returns the number of individuals that entered the archive
+        '''
+        return sum(self.insert(individuals[i], evaluation_values[:,i]) for i in range(individuals.shape[0]))
+
+    def merge(self, other):
+        '''
+        Inserts the individuals of another ParetoArchive (e.g. the archive of an island)
+        '''
+        if len(other):
+            self.update(other.individuals, other.evaluation_values)
+
+    def to_arrays(self):
+        '''
+        Returns the archive as a dict of arrays for np.savez (see from_arrays()): individuals (Archive X genes),
+        evaluation_values (Eval_val X Archive) and counters ([max_size (-1 for no limit), insertions])
+        '''
+        return {'individuals': self.individuals if len(self) else np.empty((0, 0)),
+                'evaluation_values': self.evaluation_values if len(self) else np.empty((0, 0)),
+                'counters': np.array([-1 if self.max_size is None else self.max_size, self.insertions], dtype=np.int64)}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        '''
+        Returns the ParetoArchive of the arrays of to_arrays()
+        '''
+        max_size, insertions = (int(counter) for counter in arrays['counters'])
+        archive = cls(None if max_size < 0 else max_size)
+        archive.insertions = insertions
+        archive._size = arrays['individuals'].shape[0]
+        if archive._size:
+            archive._individuals = arrays['individuals'].astype(float)
+            archive._values = arrays['evaluation_values'].T.astype(float)
+            archive._keys = -archive._values[:,0]
+            archive._genomes = set(individual.tobytes() for individual in archive._individuals)
+        return archive
+
+    def _remove(self, positions):
+        if len(positions) == 0:
+            return
+        n = self._size
+        for position in positions:
+            self._genomes.discard(self._individuals[position].tobytes())
+        kept = np.ones(n, dtype=bool)
+        kept[positions] = False
+        m = int(kept.sum())
+        self._keys[:m] = self._keys[:n][kept]
+        self._individuals[:m] = self._individuals[:n][kept]
+        self._values[:m] = self._values[:n][kept]
+        self._size = m
+
+class DMatrixPool():
+    """
+    Keeps the DMatrix of the folds of the feature subsets that have already been trained, so that individuals with
+    the same features and different hyperparameters do not build them again.
+
+    The key of the DMatrix of the folds is the feature mask together with the plan of the folds (number of folds,
+    random state of the split and binned mode). The least recently used feature subsets are dropped when the
+    approximate size of the kept matrices exceeds max_bytes.
+
+    Attributes:
+        max_bytes: (int) the memory budget of the pool
+        nbytes: (int) the approximate size of the kept matrices
+        hits: (int) the number of feature subsets whose matrices were taken from the pool
+        misses: (int) the number of feature subsets whose matrices were built
+    """
+    ENTRY_BYTES = 16 # Approximate bytes per value of a DMatrix: the value, its column index and its sorted copy for the exact method
+
+    def __init__(self, max_bytes=256*1024**2):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._folds = OrderedDict()
+
+    def __len__(self):
+        return len(self._folds)
+
+    @staticmethod
+    def key(mask, fold_plan):
+        return (np.packbits(mask).tobytes(), mask.shape[0], fold_plan)
+
+    @classmethod
+    def matrices_nbytes(cls, fold_matrices):
+        nbytes = 0
+        for dtrain, deval, testing_outputs in fold_matrices:
+            nbytes += (dtrain.num_nonmissing() + deval.num_nonmissing())*cls.ENTRY_BYTES + testing_outputs.nbytes
+        return nbytes
+
+    def get_or_build(self, mask, fold_plan, build_fold_matrices):
+        '''
+        Returns the list of (dtrain, deval, testing_outputs) of the folds for the features of the mask.
+        build_fold_matrices(mask) is called only if they are not in the pool.
+        '''
+        key = self.key(mask, fold_plan)
+        if key in self._folds:
+            self._folds.move_to_end(key)
+            self.hits += 1
+            return self._folds[key][0]
+        self.misses += 1
+        fold_matrices = list(build_fold_matrices(mask))
+        nbytes = self.matrices_nbytes(fold_matrices)
+        if nbytes <= self.max_bytes:
+            self._folds[key] = (fold_matrices, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, dropped_nbytes) = self._folds.popitem(last=False)
+                self.nbytes -= dropped_nbytes
+        return fold_matrices
+
+class SharedDataset():
+    """
+    Keeps one copy of the dataset in shared memory, as a contiguous Samples X Features float32 array, for all the
+    processes that evaluate individuals. XGBoost trains on float32 values, so the results do not change.
+
+    The process that creates the SharedDataset owns the memory block and has to unlink() it at the end. The other
+    processes attach to the block by its name and get a read-only view of the data.
+
+    Attributes:
+        name: (str) the name of the shared memory block
+        shape: (tuple) Samples X Features
+        data: (ndarray) read-only Samples X Features view of the shared memory block
+    """
+
+    def __init__(self, dataset=None, name=None, shape=None):
+        if dataset is not None:
+            dataset = np.asarray(dataset) # Features X Samples
+            shape = (dataset.shape[1], dataset.shape[0])
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))*np.dtype(np.float32).itemsize))
+            data = np.ndarray(shape, dtype=np.float32, buffer=self._shm.buf)
+            data[:] = dataset.T
+        else:
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, track=False) # Only the owner should unlink the block
+            except TypeError: # Python < 3.13
+                self._shm = _attach_untracked_shared_memory(name)
+            data = np.ndarray(shape, dtype=np.float32, buffer=self._shm.buf)
+        data.flags.writeable = False
+        self.name = self._shm.name
+        self.shape = tuple(shape)
+        self.data = data
+
+    def close(self):
+        self.data = None
+        self._shm.close()
+
+    def unlink(self):
+        self.close()
+        self._shm.unlink()
+
+def _attach_untracked_shared_memory(name):
+    '''
+    Attaches to the shared memory block of another process without registering it in the resource tracker, like
+    track=False of Python >= 3.13, so that only the owner of the block unlinks it and the tracker does not report it
+    as leaked. The block is not unregistered after the attach instead: the processes of the pools share the resource
+    tracker of the owner, so the unlink() of the owner would then unregister it a second time.
+    '''
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+# Number of set bits of every byte value. np.bitwise_count is used when it exists (numpy >= 2.0)
+_POPCOUNT_TABLE = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+def popcount(packed_bits, axis=-1):
+    '''
+    Counts the set bits of a uint8 array of packed bits along an axis.
+    '''
+    if hasattr(np, 'bitwise_count'):
+        counts = np.bitwise_count(packed_bits)
+    else:
+        counts = _POPCOUNT_TABLE[packed_bits]
+    return counts.sum(axis=axis, dtype=np.int64)
+
+def packed_feature_genes(individuals):
+    '''
+    Bitset (np.packbits) of the active feature genes (> 0.5, the same as rounding a gene in [0,1] to 1) of every
+    individual: Indiv X ceil(n_features/8) bytes
+    '''
+    return np.packbits(np.asarray(individuals)[:,parameters:] > 0.5, axis=1)
+
+def active_genes(bits, indiv):
+    '''
+    Positions of the active feature genes of an individual in the bitset of packed_feature_genes(). Only the non-zero bytes are unpacked.
+    '''
+    nonzero_bytes = np.flatnonzero(bits[indiv])
+    if nonzero_bytes.size == 0:
+        return nonzero_bytes
+    byte_bits = np.unpackbits(bits[indiv, nonzero_bytes][:,None], axis=1)
+    byte_indx, bit_indx = np.nonzero(byte_bits)
+    return nonzero_bytes[byte_indx]*8 + bit_indx
+
+def xor_distances(bits, chunk_size=64):
+    '''
+    Number of feature genes that differ (XOR) between all the pairs of rows of a bitset of packed_feature_genes().
+    The pairs are processed in chunks of rows to bound the memory of the broadcasting.
+    '''
+    distances = np.empty((bits.shape[0], bits.shape[0]), dtype=np.int64)
+    for start in range(0, bits.shape[0], chunk_size):
+        distances[start:start+chunk_size] = popcount(bits[start:start+chunk_size,None,:] ^ bits[None,:,:])
+    return distances
+
+def _bin_fold(training_inputs, testing_inputs):
+    '''
+    Replaces the values of every feature by bin codes: a training value gets the rank of its value among the distinct
+    training values of the feature and an evaluation value the rank of the highest distinct training value lower or
+    equal to it (0 if there is none). The hist tree method splits between two consecutive distinct training values at
+    the higher one (x < v[b+1]), so every value goes to the same side of the splits as its code. NaN stays NaN.
+
+    Returns: the training codes, the evaluation codes and the highest number of distinct values of a feature
+    '''
+    order = np.argsort(training_inputs, axis=0, kind='stable') # NaN at the end
+    sorted_inputs = np.take_along_axis(training_inputs, order, axis=0)
+    distinct = np.ones(sorted_inputs.shape, dtype=bool)
+    distinct[1:] = sorted_inputs[1:] != sorted_inputs[:-1]
+    distinct &= ~np.isnan(sorted_inputs)
+    training_codes = np.empty(training_inputs.shape, dtype=np.float32)
+    np.put_along_axis(training_codes, order, (np.cumsum(distinct, axis=0)-1).astype(np.float32), axis=0)
+    training_codes[np.isnan(training_inputs)] = np.nan
+
+    testing_codes = np.empty(testing_inputs.shape, dtype=np.float32)
+    for feature in range(training_inputs.shape[1]):
+        values = sorted_inputs[distinct[:,feature], feature]
+        testing_codes[:,feature] = np.maximum(np.searchsorted(values, testing_inputs[:,feature], side='right')-1, 0)
+    testing_codes[np.isnan(testing_inputs)] = np.nan
+    return training_codes, testing_codes, int(distinct.sum(axis=0).max(initial=0))
+
+class BinnedFolds():
+    """
+    The folds of a cross validation with all the features binned once for all the individuals.
+
+    In every fold each distinct training value of a feature has its own bin (see _bin_fold()), so a booster with the
+    hist tree method on the codes grows the same trees and makes the same predictions as the hist tree method on the
+    raw values with max_bin bins: the evaluations are the ones of the hist tree method. They are not the ones of the
+    default (exact) tree method, which grows the trees before pruning the splits with a loss reduction lower than
+    gamma, where hist does not make these splits while it grows the trees.
+
+    The codes are kept in the smallest unsigned integer type that holds max_bin codes and a code for the missing
+    values (missing). The bin cuts (0, 1, ..., max_bin-1) are the same for all the features: they are sketched once
+    per number of features on a grid and the QuantileDMatrix of a feature subset is only binned against them (ref),
+    instead of sketching its columns again. XGBoost cannot take the columns of a QuantileDMatrix, so every feature
+    subset still gets its own QuantileDMatrix (kept in the DMatrixPool if there is one).
+
+    Attributes:
+        folds: list of (training codes, evaluation codes, training labels, evaluation labels), Samples X Features
+        max_bin: the number of bins of every feature
+        missing: the code of the missing values
+    """
+
+    def __init__(self, dataset, labels, num_of_folds, random_state):
+        dataset = np.asarray(dataset, dtype=np.float32) # XGBoost trains on float32 values
+        labels = np.asarray(labels)
+        self.folds = []
+        self.max_bin = 2
+        skf = StratifiedKFold(n_splits = num_of_folds, shuffle = True, random_state=random_state)
+        for train_index, test_index in skf.split(dataset, labels):
+            training_codes, testing_codes, n_bins = _bin_fold(dataset[train_index], dataset[test_index])
+            self.max_bin = max(self.max_bin, n_bins)
+            self.folds.append((training_codes, testing_codes, labels[train_index], labels[test_index]))
+        dtype = np.min_scalar_type(self.max_bin)
+        self.missing = np.iinfo(dtype).max # Higher than the codes
+        self.folds = [(np.nan_to_num(training_codes, nan=self.missing).astype(dtype), np.nan_to_num(testing_codes, nan=self.missing).astype(dtype),
+                       training_outputs, testing_outputs) for training_codes, testing_codes, training_outputs, testing_outputs in self.folds]
+        self._grid_references = {}
+
+    def grid_reference(self, n_features):
+        if n_features not in self._grid_references:
+            grid = np.tile(np.arange(self.max_bin, dtype=np.float32)[:,None], (1, n_features))
+            self._grid_references[n_features] = xgb.QuantileDMatrix(grid, max_bin=self.max_bin)
+        return self._grid_references[n_features]
+
+    def matrices(self, mask):
+        '''
+        Yields the training QuantileDMatrix, the evaluation DMatrix and the evaluation labels of every fold for the
+        features of the mask.
+        '''
+        reference = self.grid_reference(int(np.count_nonzero(mask)))
+        for training_codes, testing_codes, training_outputs, testing_outputs in self.folds:
+            dtrain = xgb.QuantileDMatrix(training_codes[:,mask], label = training_outputs, max_bin = self.max_bin, ref = reference,
+                                         missing = self.missing)
+            deval = xgb.DMatrix(testing_codes[:,mask], label = testing_outputs, missing = self.missing)
+            yield dtrain, deval, testing_outputs
+
+# (dataset, BinnedFolds) of the latest fold plans of the process. The dataset is kept so that its id is not reused
+_binned_folds_cache = OrderedDict()
+
+def get_binned_folds(dataset, labels, num_of_folds, random_state, sample_major=False, max_plans=2):
+    '''
+    Returns the BinnedFolds of the dataset for a fold plan (num_of_folds, random_state). They are computed once and
+    kept for the next individuals. With fixed folds (cv_seed) they are computed once per run and process.
+    '''
+    key = (id(dataset), dataset.shape, num_of_folds, random_state)
+    if key in _binned_folds_cache:
+        _binned_folds_cache.move_to_end(key)
+    else:
+        _binned_folds_cache[key] = (dataset, BinnedFolds(dataset if sample_major else np.asarray(dataset).T, labels, num_of_folds, random_state))
+        if len(_binned_folds_cache) > max_plans:
+            _binned_folds_cache.popitem(last=False)
+    return _binned_folds_cache[key][1]
+
+def train_voting_member(inputs, labels, train_index, test_index, individual, position, filter_mask, n_trees, num_of_folds, multiclass, verbose, nthread=None):
+    '''
+    Trains the final model of one member of the majority vote on the training samples of a fold and predicts the
+    testing samples of the fold with inplace_predict() (no DMatrix for the predictions).
+
+    Returns: the model and its predictions
+    '''
+    feat_sel_indx = filter_mask[parameters:]
+    mdl = Individual(individual, position, inputs[train_index][:,feat_sel_indx], labels[train_index], num_of_folds, filter_mask, multiclass,
+                     verbose=verbose, nthread=nthread).training_best(n_trees)
+    predictions = mdl.inplace_predict(inputs[test_index][:,feat_sel_indx], iteration_range = (0, int(n_trees)))+1e-08
+    return mdl, predictions
+
+def _init_voting_worker(inputs, labels, num_of_folds, multiclass, n_parameters, nthread, verbose):
+    global parameters
+    parameters = n_parameters
+    worker_state('voting', inputs=inputs, labels=labels, num_of_folds=num_of_folds, multiclass=multiclass, nthread=nthread, verbose=verbose)
+
+def _train_voting_member_in_worker(task):
+    train_index, test_index, individual, position, filter_mask, n_trees = task
+    state = worker_state('voting')
+    return train_voting_member(state['inputs'], state['labels'], train_index, test_index, individual, position, filter_mask, n_trees,
+                               state['num_of_folds'], state['multiclass'], state['verbose'], state['nthread'])
+
+def majority_voting(individuals, dataset, labels, filter_mask, index, num_of_folds, N_trees, multiclass, output_folder, par_type, feature_names, verbose, n_jobs=1,
+                    model_store=None):
+    '''
+    Cross validation of the soft and the hard majority vote of the individuals in index.
+
+    The members with the same effective genome (features after the filter, hyperparameters and number of trees) are
+    trained once per fold and the models of all the folds and members are trained before the votes, in a pool of
+    n_jobs processes if n_jobs > 1. The predictions of all the folds and the models of the last fold are written once.
+
+    With a model_store (a ModelStore) the boosters of the cross validation of the members are reused, cut to their
+    number of trees, instead of training new models. The store is a cache keyed on the random state of the folds: the
+    boosters are only reused when the last evaluation had the same folds as the vote, so the results of the vote do
+    not change with the store.
+    '''
+    random_state = np.random.randint(50)
+    skf = StratifiedKFold(n_splits = num_of_folds, shuffle = True, random_state=random_state)
     inputs = dataset.T.copy()
     fpr_array_soft = list()
     tpr_array_soft = list()
@@ -311,17 +965,52 @@ def majority_voting(individuals, dataset, labels, filter_mask, index, num_of_fol
     fpr_array_hard = list()
     tpr_array_hard = list()
     auc_array_hard = list()
-    fpr_tpr_array_soft = list()
-    fpr_tpr_array_hard = list()
     metrics_array_soft = list()
     metrics_array_hard = list()
+    fold_labels = list()
+    fold_soft_predictions = list()
+    fold_hard_predictions = list()
     i=0
     pareto1_intersected_features = filter_mask[index,parameters:].any(axis=0) #get the intersection of the feature names
 
+    # The first member with every effective genome is trained, on every fold
+    fold_indices = list(skf.split(inputs, labels))
+    first_member = {}
+    trained_member = []
+    for ii, p1_indx in enumerate(index):
+        key = (FitnessCache.key(individuals[p1_indx], filter_mask[p1_indx], None, num_of_folds), int(N_trees[index][ii]))
+        trained_member.append(first_member.setdefault(key, ii))
+    unique_members = sorted(first_member.values())
+
+    # The boosters of the cross validation of the members, if they have at least the trees of the member
+    trained = {}
+    if model_store is not None:
+        for ii in unique_members:
+            stored_boosters = model_store.get(FitnessCache.key(individuals[index[ii]], filter_mask[index[ii]], random_state, num_of_folds))
+            if stored_boosters is None:
+                continue
+            for fold, (train_index, test_index) in enumerate(fold_indices):
+                mdl = ModelStore.booster(stored_boosters[fold], N_trees[index][ii])
+                if mdl is not None:
+                    feat_sel_indx = filter_mask[index[ii], parameters:]
+                    trained[(fold, ii)] = (mdl, mdl.inplace_predict(inputs[test_index][:,feat_sel_indx], iteration_range = (0, int(N_trees[index][ii])))+1e-08)
+
+    to_train = [(fold, ii) for fold in range(len(fold_indices)) for ii in unique_members if (fold, ii) not in trained]
+    tasks = [(*fold_indices[fold], individuals[index[ii]], index[ii], filter_mask[index[ii]], N_trees[index][ii]) for fold, ii in to_train]
+    if n_jobs > 1 and len(tasks) > 1:
+        initargs = (inputs, labels, num_of_folds, multiclass, parameters, max(1, available_cpu_count()//n_jobs), verbose)
+        with mp.Pool(processes=n_jobs, initializer=_init_voting_worker, initargs=initargs) as pool:
+            new_models = pool.map(_train_voting_member_in_worker, tasks, chunksize=1)
+    else:
+        new_models = [train_voting_member(inputs, labels, *task, num_of_folds, multiclass, verbose) for task in tasks]
+    if model_store is not None:
+        model_store.reused += len(trained)
+        model_store.trained += len(to_train)
+    trained.update(zip(to_train, new_models))
+
     dict_of_k_fold_pred = {}
-    for train_index, test_index in skf.split(inputs, labels):
-        training_inputs, testing_inputs = inputs[train_index], inputs[test_index]
-        training_outputs, testing_outputs = labels[train_index], labels[test_index]
+    for train_index, test_index in fold_indices:
+        testing_outputs = labels[test_index]
 
         pareto_results_soft = list()
         pareto_results_hard = list()
@@ -333,12 +1022,8 @@ def majority_voting(individuals, dataset, labels, filter_mask, index, num_of_fol
         for ii, p1_indx in enumerate(index):
             feat_sel_indx = filter_mask[p1_indx, parameters:]
 
-            deval = xgb.DMatrix(testing_inputs[:,feat_sel_indx], label = testing_outputs)
-            mdl = Individual(individuals[p1_indx], p1_indx, training_inputs[:,feat_sel_indx],  training_outputs, num_of_folds, filter_mask[p1_indx], multiclass, verbose=verbose).training_best(N_trees[index][ii])
+            mdl, predictions = trained[(i, trained_member[ii])]
             mdls.append(mdl)
-
-            n_train_iter = N_trees[index][ii]
-            predictions = mdl.predict(deval, iteration_range = (0, int(n_train_iter)))+1e-08#(0, mdl.best_ntree_limit))
             dict_of_preds[f'solution_{ii}'] = predictions
 
 
@@ -352,6 +1037,7 @@ def majority_voting(individuals, dataset, labels, filter_mask, index, num_of_fol
 
             if not os.path.exists(output_folder + '/Pareto_1_results/Majority vote/Votes/'):
                 os.makedirs(output_folder + '/Pareto_1_results/Majority vote/Votes/')
+            record_output_file(output_folder, 'Pareto_1_results/Majority vote/Votes/names_of_features.txt')
             with open(output_folder+'/Pareto_1_results/Majority vote/Votes/names_of_features.txt','a') as votes_file:
                 if ii == 1:
                     votes_file.write(f'{par_type}\n')
@@ -365,67 +1051,41 @@ def majority_voting(individuals, dataset, labels, filter_mask, index, num_of_fol
             pareto_results_hard.append(predictions.round())
 
         dict_of_k_fold_pred[f'fold_{i+1}'] = dict_of_preds
-        metrics_array_soft.append([])
-        metrics_array_hard.append([])
-
-        pickle.dump(dict_of_k_fold_pred, open(output_folder + 'Pareto_1_results/Dictionary_of_predictions.pkl', "wb"))
-        pickle.dump(mdls, open(output_folder + '/Pareto_1_results/Models/Models.pkl', "wb"))
-
-
-        MJV_soft_predictions = np.asarray(pareto_results_soft).mean(axis=0)
-        MJV_hard_predictions = np.asarray(pareto_results_hard).mean(axis=0)
-
-        fpr, tpr, threshold = roc_curve(testing_outputs, MJV_soft_predictions)
-        
-        roc_auc = auc(fpr, tpr)
-        fpr_tpr_array_soft.append((fpr, tpr, threshold, roc_auc))
-        fpr_array_soft.append(fpr)
-        tpr_array_soft.append(tpr)
-        auc_array_soft.append(roc_auc)
-
-        fpr, tpr, threshold = roc_curve(testing_outputs, MJV_hard_predictions)
-        roc_auc = auc(fpr, tpr)
-        fpr_tpr_array_hard.append((fpr, tpr, threshold, roc_auc))
-        fpr_array_hard.append(fpr)
-        tpr_array_hard.append(tpr)
-        auc_array_hard.append(roc_auc)
-
-        metrics_array_soft[i].append(accuracy_score(deval.get_label(),MJV_soft_predictions.round())) #1 Accuracy
-        metrics_array_hard[i].append(accuracy_score(deval.get_label(),MJV_hard_predictions.round())) #1 Accuracy
-
-        metrics_array_soft[i].append(weighted_geometric_mean(deval.get_label(),MJV_soft_predictions.round(),np.unique(labels))) #3 wGM
-        metrics_array_hard[i].append(weighted_geometric_mean(deval.get_label(),MJV_hard_predictions.round(),np.unique(labels))) #3 wGM
-
-        mertics_calc_soft = mertics_calculator(deval.get_label(),MJV_soft_predictions)
-        mertics_calc_hard = mertics_calculator(deval.get_label(),MJV_hard_predictions)
-
-        metrics_array_soft[i].append(mertics_calc_soft['f1_score']) #4 F1 score
-        metrics_array_hard[i].append(mertics_calc_hard['f1_score']) #4 F1 score
-
-        metrics_array_soft[i].append(mertics_calc_soft['f2_score']) #5 F2 score
-        metrics_array_hard[i].append(mertics_calc_hard['f2_score']) #5 F2 score
-
-        metrics_array_soft[i].append(mertics_calc_soft['Precision']) #6 Precision
-        metrics_array_hard[i].append(mertics_calc_hard['Precision']) #6 Precision
 
-        metrics_array_soft[i].append(mertics_calc_soft['Recall']) #7 Recall
-        metrics_array_hard[i].append(mertics_calc_hard['Recall']) #7 Recall
-
-        metrics_array_soft[i].append(mertics_calc_soft['roc_auc']) #8 AUC
-        metrics_array_hard[i].append(mertics_calc_hard['roc_auc']) #8 AUC
-
-        metrics_array_soft[i].append(mertics_calc_soft['Balanced_accuracy']) #9 balanced Accuracy
-        metrics_array_hard[i].append(mertics_calc_hard['Balanced_accuracy']) #9 balanced Accuracy
-
-        metrics_array_soft[i].append(np.asarray(metrics_array_soft[i]).mean()) #10 Overall score
-        metrics_array_hard[i].append(np.asarray(metrics_array_hard[i]).mean()) #10 Overall score
-
-        if multiclass:
-            metrics_array_soft[i].append(1/mertics_calc_soft['manhattan_distance'] if mertics_calc_soft['manhattan_distance']>0 else 1.0) #9
-            metrics_array_hard[i].append(1/mertics_calc_hard['manhattan_distance'] if mertics_calc_hard['manhattan_distance']>0 else 1.0) #9
+        fold_labels.append(testing_outputs)
+        fold_soft_predictions.append(np.asarray(pareto_results_soft).mean(axis=0))
+        fold_hard_predictions.append(np.asarray(pareto_results_hard).mean(axis=0))
 
         i+=1
 
+    with open(output_folder + 'Pareto_1_results/Dictionary_of_predictions.pkl', "wb") as predictions_file:
+        pickle.dump(dict_of_k_fold_pred, predictions_file)
+    with open(output_folder + '/Pareto_1_results/Models/Models.pkl', "wb") as models_file:
+        pickle.dump(mdls, models_file) # The models of the last fold
+
+    # Metrics of the soft and the hard majority vote for all the folds at once
+    folds = np.repeat(np.arange(len(fold_labels)), [fold.shape[0] for fold in fold_labels])
+    for MJV_predictions, fpr_array, tpr_array, auc_array, metrics_array in ((fold_soft_predictions, fpr_array_soft, tpr_array_soft, auc_array_soft, metrics_array_soft),
+                                                                            (fold_hard_predictions, fpr_array_hard, tpr_array_hard, auc_array_hard, metrics_array_hard)):
+        mertics_calc = classification_metrics(np.concatenate(fold_labels), np.concatenate(MJV_predictions), np.unique(labels), folds)
+        for i in range(len(fold_labels)):
+            fpr, tpr, threshold = mertics_calc['roc_curve'][i]
+            fpr_array.append(fpr)
+            tpr_array.append(tpr)
+            auc_array.append(mertics_calc['roc_auc'][i])
+
+            metrics_array.append([mertics_calc['Accuracy'][i], #1 Accuracy
+                                  mertics_calc['wGM'][i], #3 wGM
+                                  mertics_calc['f1_score'][i], #4 F1 score
+                                  mertics_calc['f2_score'][i], #5 F2 score
+                                  mertics_calc['Precision'][i], #6 Precision
+                                  mertics_calc['Recall'][i], #7 Recall
+                                  mertics_calc['roc_auc'][i], #8 AUC
+                                  mertics_calc['Balanced_accuracy'][i]]) #9 balanced Accuracy
+            metrics_array[i].append(np.asarray(metrics_array[i]).mean()) #10 Overall score
+            if multiclass:
+                metrics_array[i].append(1/mertics_calc['manhattan_distance'][i] if mertics_calc['manhattan_distance'][i]>0 else 1.0) #9
+
     if not os.path.exists(output_folder + 'Pareto_1_results/Majority vote'):
             os.makedirs(output_folder + 'Pareto_1_results/Majority vote')
 
@@ -461,6 +1121,62 @@ def majority_voting(individuals, dataset, labels, filter_mask, index, num_of_fol
         print('Array of 1st Pareto feature names:\n',feature_names[pareto1_intersected_features])
 
 
+# Version of the manifest.json of the bundles of export_pareto_bundle() (see mevax_predict.py)
+BUNDLE_VERSION = 1
+
+def export_pareto_bundle(bundle_folder, individuals, dataset, labels, filter_mask, index, N_trees, multiclass, feature_names, classes,
+                         normalizer=None, verbose=False):
+    '''
+    Trains the final model of every individual in index on all the samples and writes a bundle that scores new
+    samples without MEvA-X (see mevax_predict.py): the booster of every member in the XGBoost UBJSON format and a
+    manifest.json with the features (indices in the training dataset and names), the number of trees of every
+    member, the classes and the min-max normalization of the features. Members with the same effective genome share
+    their booster file.
+
+    Args:
+        classes: the original labels, in the order of their numeric codes
+        normalizer: the MinMaxScaler of normalize_dataset(), None if the data were not normalized
+    Returns:
+        The path of the manifest.json
+    '''
+    os.makedirs(bundle_folder, exist_ok=True)
+    members = []
+    booster_files = {}
+    used_features = np.zeros(feature_names.shape[0], dtype=bool)
+    for p1_indx in np.atleast_1d(index):
+        feat_sel_indx = filter_mask[p1_indx, parameters:].astype(bool)
+        n_trees = int(N_trees[p1_indx])
+        if not feat_sel_indx.any() or n_trees < 1:
+            continue
+        key = (FitnessCache.key(individuals[p1_indx], filter_mask[p1_indx], None, None), n_trees)
+        if key not in booster_files:
+            booster_files[key] = f'member_{len(booster_files)}.ubj'
+            mdl = Individual(individuals[p1_indx], p1_indx, dataset[feat_sel_indx].T, labels, 1, filter_mask[p1_indx], multiclass,
+                             verbose=verbose).training_best(n_trees)
+            mdl.save_model(os.path.join(bundle_folder, booster_files[key]))
+        used_features |= feat_sel_indx
+        members.append({'individual': int(p1_indx),
+                        'feature_indices': np.flatnonzero(feat_sel_indx).tolist(),
+                        'feature_names': [str(name) for name in feature_names[feat_sel_indx]],
+                        'n_trees': n_trees,
+                        'booster': booster_files[key]})
+
+    normalization = None
+    if normalizer is not None: # x*scale + offset, as MinMaxScaler.transform()
+        normalization = {'method': 'min_max',
+                         'features': {str(feature_names[f]): {'scale': float(normalizer.scale_[f]), 'offset': float(normalizer.min_[f])}
+                                      for f in np.flatnonzero(used_features)}}
+    manifest = {'format': 'MEvA-X bundle', 'version': BUNDLE_VERSION,
+                'objective': 'multi:softmax' if multiclass else 'binary:logistic',
+                'classes': [c.item() if isinstance(c, np.generic) else c for c in classes],
+                'n_training_features': int(feature_names.shape[0]),
+                'normalization': normalization,
+                'members': members}
+    manifest_path = os.path.join(bundle_folder, 'manifest.json')
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    return manifest_path
+
 def mertics_calculator(y_true, y_pred_proba, avg='weighted'):
     y_pred = y_pred_proba.round()
     scores = {}
@@ -504,10 +1220,117 @@ def weighted_geometric_mean(y_true,y_pred,unique_labels=None, verbose=True):
         GM = GM/support_sum
     return GM
 
-def preprocessing_function(dataset_filename, labels_filename, as_pandas=False):
+def classification_metrics(y_true, y_score, unique_labels, folds=None):
+    """
+    Calculates the metrics of the fitness for the predictions of one or more folds at once, from one confusion matrix
+    per fold and one sort of the scores. The values are the same as the ones of accuracy_score(),
+    weighted_geometric_mean() and mertics_calculator() on the rounded scores of every fold.
+
+    Args:
+        y_true: (array) the labels of the samples of all the folds
+        y_score: (array) the predictions of the models (probability of the positive class for two classes, the class
+                 for more classes). The predicted classes are the rounded scores
+        unique_labels: (array) the labels of the dataset
+        folds: (array) the fold of every sample. None for one fold
+
+    Returns:
+        scores: (dict) one array with a value per fold for 'Accuracy', 'wGM', 'f1_score', 'f2_score', 'Precision',
+                'Recall', 'roc_auc', 'Balanced_accuracy' and 'manhattan_distance', and 'roc_curve': a list of
+                (fpr, tpr, thresholds) per fold
+    """
+    y_true = np.asarray(y_true, dtype=float).ravel()
+    y_score = np.asarray(y_score).ravel()
+    y_pred = y_score.round()
+    folds = np.zeros(y_true.shape[0], dtype=int) if folds is None else np.asarray(folds, dtype=int)
+    n_folds = folds.max()+1
+    unique_labels = np.asarray(unique_labels, dtype=float).ravel()
+
+    # One confusion matrix per fold: folds X true class X predicted class
+    classes = np.union1d(unique_labels, np.union1d(y_true, y_pred))
+    n_classes = classes.shape[0]
+    true_indx = np.searchsorted(classes, y_true)
+    pred_indx = np.searchsorted(classes, y_pred)
+    CM = np.bincount((folds*n_classes + true_indx)*n_classes + pred_indx, minlength=n_folds*n_classes*n_classes)
+    CM = CM.reshape(n_folds, n_classes, n_classes).astype(float)
+
+    TP = np.diagonal(CM, axis1=1, axis2=2)
+    support = CM.sum(axis=2) # samples of every class
+    predicted = CM.sum(axis=1) # predictions of every class
+    n_samples = CM.sum(axis=(1,2))
+
+    scores = {}
+    scores['Accuracy'] = TP.sum(axis=1)/n_samples
+
+    # Weighted (by the support) precision, recall, F1 and F2. Zero when they are not defined (zero_division = 0)
+    precision = np.divide(TP, predicted, out=np.zeros_like(TP), where=predicted>0)
+    recall = np.divide(TP, support, out=np.zeros_like(TP), where=support>0)
+    weights = support/support.sum(axis=1, keepdims=True)
+    scores['Precision'] = (precision*weights).sum(axis=1)
+    scores['Recall'] = (recall*weights).sum(axis=1)
+    for name, beta2 in (('f1_score', 1.0), ('f2_score', 4.0)):
+        denominator = beta2*precision + recall
+        f_score = np.divide((1+beta2)*precision*recall, denominator, out=np.zeros_like(TP), where=denominator>0)
+        scores[name] = (f_score*weights).sum(axis=1)
+
+    # Balanced accuracy: mean recall of the classes with samples in the fold
+    scores['Balanced_accuracy'] = np.array([recall[k][support[k]>0].mean() for k in range(n_folds)])
+
+    # Weighted geometric mean of sensitivity and specificity over the labels of the dataset
+    labels_indx = np.searchsorted(classes, unique_labels)
+    TP_l, support_l, predicted_l = TP[:,labels_indx], support[:,labels_indx], predicted[:,labels_indx]
+    TN_l = n_samples[:,None] - support_l - predicted_l + TP_l
+    negatives_l = n_samples[:,None] - support_l
+    with np.errstate(divide='ignore', invalid='ignore'):
+        geo_mean = np.sqrt((TP_l/support_l) * (TN_l/negatives_l))
+    if unique_labels.shape[0]==2:
+        scores['wGM'] = geo_mean[:,0]
+    else:
+        geo_mean[(support_l==0) | (negatives_l==0)] = 0
+        scores['wGM'] = (geo_mean*support_l).sum(axis=1)/support_l.sum(axis=1)
+
+    # Manhattan distance between the labels and the predicted classes
+    scores['manhattan_distance'] = (CM*np.abs(classes[:,None]-classes[None,:])).sum(axis=(1,2))
+
+    # ROC curve and AUC of every fold from one sort of the scores (fold first, then decreasing score)
+    if np.unique(y_true).shape[0] > 2:
+        raise ValueError('The ROC curve needs two classes. multiclass format is not supported')
+    order = np.lexsort((-y_score, folds))
+    sorted_folds = folds[order]
+    sorted_score = y_score[order]
+    sorted_positive = (y_true[order] == y_true.max()).astype(float)
+    fold_starts = np.searchsorted(sorted_folds, np.arange(n_folds+1))
+    scores['roc_curve'] = []
+    scores['roc_auc'] = np.empty(n_folds)
+    for k in range(n_folds):
+        score_k = sorted_score[fold_starts[k]:fold_starts[k+1]]
+        positive_k = sorted_positive[fold_starts[k]:fold_starts[k+1]]
+        if np.unique(y_true[folds==k]).shape[0] != 2:
+            raise ValueError('Only one class present in y_true. ROC AUC score is not defined in that case.')
+        # Last position of every distinct score (same as sklearn.metrics.roc_curve with drop_intermediate=True)
+        threshold_indx = np.r_[np.flatnonzero(np.diff(score_k)), score_k.shape[0]-1]
+        tps = np.cumsum(positive_k)[threshold_indx]
+        fps = 1 + threshold_indx - tps
+        thresholds = score_k[threshold_indx]
+        if tps.shape[0] > 2:
+            optimal_indx = np.flatnonzero(np.r_[True, np.logical_or(np.diff(fps, 2), np.diff(tps, 2)), True])
+            tps, fps, thresholds = tps[optimal_indx], fps[optimal_indx], thresholds[optimal_indx]
+        tps = np.r_[0, tps]
+        fps = np.r_[0, fps]
+        thresholds = np.r_[thresholds[0] + 1, thresholds]
+        fpr, tpr = fps/fps[-1], tps/tps[-1]
+        scores['roc_curve'].append((fpr, tpr, thresholds))
+        scores['roc_auc'][k] = auc(fpr, tpr)
+    return scores
+
+def preprocessing_function(dataset_filename, labels_filename, as_pandas=False, chunk_size=0, memmap_filename=None):
     delimeter = find_delimiter(dataset_filename)
-    [dataset, feature_names, sample_names] = parsing_data_and_labels(dataset_filename = dataset_filename,
-                                                                    delimiter_dataset = delimeter, as_pandas = as_pandas)
+    if chunk_size > 0: # Streams the dataset in chunks of rows into a float32 memory-mapped file (see stream_dataset())
+        [dataset, feature_names, sample_names] = stream_dataset(dataset_filename, delimeter, memmap_filename, chunk_size)
+        if as_pandas:
+            dataset = pd.DataFrame(dataset, index=feature_names, columns=sample_names, copy=False)
+    else:
+        [dataset, feature_names, sample_names] = parsing_data_and_labels(dataset_filename = dataset_filename,
+                                                                        delimiter_dataset = delimeter, as_pandas = as_pandas)
     delimeter = find_delimiter_labels(labels_filename)
     labels = parsing_data_and_labels(labels_filename = labels_filename, delimiter_labels = delimeter, as_pandas = False)
     return dataset, feature_names, sample_names, labels
@@ -581,6 +1404,66 @@ def parsing_data_and_labels(dataset_filename=None, delimiter_dataset=None,\
     elif return_dataset==False and return_labels==True:
         return labels
 
+def _read_dataset_chunks(dataset_filename, delimiter, chunk_size, usecols=None):
+    '''
+    The rows of the dataset in DataFrames of chunk_size rows, with the cleaned names of parsing_data_and_labels()
+    '''
+    for chunk in pd.read_csv(dataset_filename, sep = delimiter, header = 0, index_col = 0, usecols = usecols,
+                             na_values = [-1000,-999,999,' ','_','-',''], chunksize = chunk_size):
+        chunk.columns = chunk.columns.str.strip().str.replace(' ','_')
+        chunk.index = chunk.index.str.strip().str.replace(' ','_')
+        yield chunk
+
+def stream_dataset(dataset_filename, delimiter, memmap_filename, chunk_size=10000):
+    """
+    Reads the dataset like parsing_data_and_labels() and mean_duplicated() in two passes over chunks of chunk_size
+    rows, so that the memory does not depend on the number of features. The first pass reads only the feature names,
+    the second one writes the rows in a float32 memory-mapped file. The duplicated features are averaged as they
+    are read (the missing values are skipped, as in the groupby mean).
+
+    Inputs:
+        - memmap_filename: the file of the Features X Samples float32 matrix. It is overwritten
+    Returns:
+        - dataset (np.memmap, Features X Samples, without dublicated feature names)
+        - data_index_names (Unique feature names, in the order of their first row)
+        - data_col_names (Sample names)
+    """
+    positions = {}
+    row_positions = []
+    for chunk in _read_dataset_chunks(dataset_filename, delimiter, chunk_size, usecols=[0]):
+        for name in chunk.index:
+            row_positions.append(positions.setdefault(name, len(positions)))
+    row_positions = np.array(row_positions, dtype=np.int64)
+    data_index_names = np.array(list(positions), dtype=object)
+    duplicated = np.bincount(row_positions, minlength=len(positions)) > 1
+
+    dataset = None
+    sums, seen = {}, {} # Sums and counts of the values of the duplicated features
+    start = 0
+    for chunk in _read_dataset_chunks(dataset_filename, delimiter, chunk_size):
+        if dataset is None:
+            data_col_names = chunk.columns.values
+            dataset = np.memmap(memmap_filename, dtype=np.float32, mode='w+', shape=(len(positions), data_col_names.shape[0]))
+        values = chunk.to_numpy(dtype=float)
+        chunk_positions = row_positions[start:start+values.shape[0]]
+        start += values.shape[0]
+        unique = ~duplicated[chunk_positions]
+        dataset[chunk_positions[unique]] = values[unique]
+        for position, row in zip(chunk_positions[~unique], values[~unique]):
+            if position not in sums:
+                sums[position] = np.zeros(row.shape[0])
+                seen[position] = np.zeros(row.shape[0], dtype=np.int64)
+            present = ~np.isnan(row)
+            sums[position][present] += row[present]
+            seen[position] += present
+    if dataset is None:
+        raise ValueError(f'The dataset {dataset_filename} has no features')
+    for position in sums:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dataset[position] = np.where(seen[position] > 0, sums[position]/seen[position], np.nan)
+    dataset.flush()
+    return dataset, data_index_names, data_col_names
+
 def mean_duplicated(dataset):
     """
     mean_dublicated method, finds duplicated index names and means out the values by sample (column-wise).
@@ -600,31 +1483,140 @@ def mean_duplicated(dataset):
     return dataset, data_index_names, data_col_names
 
 
-def impute(labels,data,imputer='knn'):
-    imputed_dataset=data.copy()
-    for feat in data.index:
-        if any(data.loc[feat,:].isnull()):
-            if imputer=='knn':
-                imputed_dataset = knnimputer(data)
-            else:
-                for lab in np.unique(labels):
-                    #if any(data.loc[feat,:].isnull()):
-                    if data.loc[feat,np.asarray(labels==lab).squeeze()].shape[0]<=1:
-                        imputed_dataset.loc[feat,np.asarray(labels==lab).squeeze()]=data.loc[feat,np.asarray(labels==lab).squeeze()].fillna(data.loc[feat,:].mean())
-                    else:
-                        imputed_dataset.loc[feat,np.asarray(labels==lab).squeeze()]=data.loc[feat,np.asarray(labels==lab).squeeze()].fillna(data.loc[feat,np.asarray(labels==lab).squeeze()].mean())
-                        if any(imputed_dataset.loc[feat,np.asarray(labels==lab).squeeze()].isnull()):
-                            imputed_dataset.loc[feat,np.asarray(labels==lab).squeeze()]=data.loc[feat,np.asarray(labels==lab).squeeze()].fillna(data.loc[feat,:].mean())
-    return imputed_dataset
-
-def knnimputer(dataset_initial):
-    from knnimpute import knn_impute_optimistic
-
-    dataset_initial = dataset_initial.T # in order to have Samples X Features
-    imp_dataset = knn_impute_optimistic(np.asarray(dataset_initial), np.isnan(np.asarray(dataset_initial)), k=5)
+def has_missing_values(data, block_rows=4096):
+    '''
+    True if the dataset has a NaN. The rows are checked in blocks of block_rows, so that a memory-mapped dataset (see
+    stream_dataset()) is read block by block instead of being copied at once
+    '''
+    values = np.asarray(data) # No copy for a DataFrame of a single dtype
+    return any(np.isnan(values[start:start+block_rows]).any() for start in range(0, values.shape[0], block_rows))
+
+def impute(labels,data,imputer='knn', n_jobs=1):
+    """
+    Fills the missing values of the dataset (Features X Samples) and returns the imputed array. 'knn' runs
+    knn_impute() once on all the features. Any other imputer fills every missing value with the mean of its feature in
+    the samples of the same class (the mean of all the samples if the class has one sample or no value). The dataset
+    itself is returned if it has no missing value. The dtype of the dataset is kept (float32 when it is
+    streamed), but the imputed dataset is a new matrix in memory and 'knn' also makes Samples X Features copies.
+    """
+    if not has_missing_values(data):
+        return data
+    if imputer=='knn':
+        return knnimputer(data, n_jobs=n_jobs)
+    labels = np.asarray(labels).squeeze()
+    overall_means = data.mean(axis=1)
+    class_means = data.T.groupby(labels).mean().T # Features X Classes
+    class_sizes = pd.Series(labels).value_counts()
+    class_means.loc[:, class_sizes.index[class_sizes <= 1]] = np.nan
+    fill = class_means[labels].to_numpy()
+    fill = np.where(np.isnan(fill), overall_means.to_numpy()[:,None], fill)
+    values = data.to_numpy()
+    return np.where(np.isnan(values), fill.astype(values.dtype), values)
+
+def knnimputer(dataset_initial, k=5, n_jobs=1):
+    dataset_initial = np.asarray(dataset_initial).T # in order to have Samples X Features (knn_impute() copies it)
+    imp_dataset = knn_impute(dataset_initial, k=k, n_jobs=n_jobs)
     return imp_dataset.T # in order to have Features X Samples as the original dataset
 
-def normalize_dataset(dataset, output_folder=None,min_max_scaler=True):
+def _init_knn_worker(values, squares, observed, shared):
+    worker_state('knn', values=values, squares=squares, observed=observed, shared=shared)
+
+def _knn_distances_in_worker(rows):
+    state = worker_state('knn')
+    return knn_distance_rows(state['values'], state['squares'], state['observed'], state['shared'], rows)
+
+def knn_distance_rows(values, squares, observed, shared, rows):
+    '''
+    The rows of the distance matrix of knnimpute (all_pairs_normalized_distances) of the samples in rows: the mean
+    squared difference of two samples over the features observed in both, inf if there is none. The sums of the
+    squared differences are the masked matrix products sum(x²·m') + sum(m·x'²) - 2·sum(x·x'), so the temporaries are
+    rows X Samples matrices. They are equal to the sums of knnimpute up to the rounding.
+
+    Args:
+        values: Samples X Features float64 values, centered on the mean of every feature, 0 for the missing values
+        squares: values**2
+        observed: Samples X Features float64 mask of the observed values
+        shared: Samples X Samples number of features observed in both samples
+    '''
+    ssd = squares[rows] @ observed.T
+    ssd += observed[rows] @ squares.T
+    ssd -= 2 * (values[rows] @ values.T)
+    np.maximum(ssd, 0, out=ssd) # The cancellation of equal values can leave small negative sums
+    counts = shared[rows]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # knnimpute sums into the float32 matrix for the samples that share features with all the others
+        distances = np.where((counts > 0).all(axis=1)[:,None], ssd.astype(np.float32)/counts, ssd/counts).astype(np.float32)
+    distances[counts == 0] = np.inf
+    return distances
+
+def knn_impute(samples, k=5, n_jobs=1, block_size=2**23, min_dist=1e-6, max_dist_multiplier=1e6):
+    '''
+    k-nearest neighbours imputation with the results of knn_impute_optimistic() of knnimpute: every missing value is
+    the mean of the k nearest samples that have the value, weighted by the inverse of their distances. The distances
+    (see knn_distance_rows()) are computed in blocks of rows of about block_size values, in n_jobs processes. The
+    imputed values are the ones of knnimpute up to the rounding of the distances, which can only swap neighbours
+    at (almost) the same distance.
+
+    Args:
+        samples: Samples X Features with NaN for the missing values
+    Returns:
+        The imputed copy of samples, of the same dtype
+    '''
+    samples = np.array(samples, order='C') # The copy that is imputed once all the distances are computed
+    missing = np.isnan(samples)
+    n_samples = samples.shape[0]
+    observed = (~missing).astype(np.float64)
+    shared = (observed @ observed.T).round().astype(int)
+    values = np.where(missing, 0, samples).astype(np.float64)
+    values -= values.sum(axis=0) / np.maximum(observed.sum(axis=0), 1) # Centered: the distances do not change, the cancellations are smaller
+    values[missing] = 0
+    squares = values**2
+    rows_per_block = max(1, block_size // max(1, n_samples))
+    blocks = [np.arange(start, min(start+rows_per_block, n_samples)) for start in range(0, n_samples, rows_per_block)]
+    if n_jobs > 1 and len(blocks) > 1:
+        with mp.Pool(processes=min(n_jobs, len(blocks)), initializer=_init_knn_worker, initargs=(values, squares, observed, shared)) as pool:
+            distances = np.concatenate(pool.map(_knn_distances_in_worker, blocks))
+    else:
+        distances = np.concatenate([knn_distance_rows(values, squares, observed, shared, rows) for rows in blocks]) if blocks else np.zeros((0, 0), dtype=np.float32)
+    del values, squares
+
+    finite = distances[np.isfinite(distances)]
+    max_dist = max_dist_multiplier * max(1, finite.max()) if finite.size else max_dist_multiplier
+    np.fill_diagonal(distances, max_dist) # A sample is not its own neighbour
+    np.clip(distances, min_dist, max_dist, out=distances)
+
+    imputed = samples
+    columns_major = np.asfortranarray(samples) # The values before the imputation
+    observed = np.asfortranarray(~missing)
+    weights = np.ones(k, dtype=samples.dtype)
+    for i in np.flatnonzero(missing.any(axis=1)):
+        missing_columns = np.flatnonzero(missing[i])
+        row_distances = distances[i]
+        neighbours = np.argsort(row_distances)
+        missing_values = columns_major[:, missing_columns]
+        np.divide(1.0, row_distances[neighbours[:k]], out=weights)
+        values = missing_values[neighbours[:k]].T @ weights
+        values /= weights.sum()
+
+        # The k nearest samples may miss some of the values: these are averaged over the next nearest samples that have them
+        observed_sorted = observed[:, missing_columns][neighbours]
+        rows_needed = (observed_sorted.cumsum(axis=0) == k).argmax(axis=0) + 1
+        max_rows_needed = rows_needed.max()
+        if max_rows_needed != k:
+            sorted_distances = row_distances[neighbours[:max_rows_needed]]
+            sorted_values = missing_values[neighbours[:max_rows_needed]]
+            observed_sorted = observed_sorted[:max_rows_needed]
+            for j in np.flatnonzero(rows_needed != k):
+                column_observed = observed_sorted[:, j]
+                neighbour_distances = sorted_distances[column_observed][:k]
+                usable_weights = weights[:neighbour_distances.shape[0]]
+                np.divide(1.0, neighbour_distances, out=usable_weights)
+                values[j] = sorted_values[column_observed, j][:usable_weights.shape[0]] @ usable_weights / usable_weights.sum()
+        imputed[i, missing_columns] = values
+    return imputed
+
+def normalize_dataset(dataset, output_folder=None,min_max_scaler=True, return_normalizer=False):
+    # The scalers keep float32 values in float32 and return a new matrix
     if min_max_scaler:
         normalizer = MinMaxScaler()
         dataset_normalized = normalizer.fit_transform(dataset.T)
@@ -633,6 +1625,8 @@ def normalize_dataset(dataset, output_folder=None,min_max_scaler=True):
         normalizer = MaxAbsScaler()
         dataset_normalized = normalizer.fit_transform(dataset.T)
         dataset_normalized = dataset_normalized.T
+    if return_normalizer: # The fitted scaler, for the bundle of the models (see export_pareto_bundle())
+        return dataset_normalized, normalizer
     return dataset_normalized
 
 def transform_labels_to_numeric(labels,unique_labels):
@@ -646,52 +1640,115 @@ def transform_labels_to_numeric(labels,unique_labels):
         unique_labels = encoder.transform(unique_labels)
     return labels, unique_labels
 
+# Version of the entries of the preprocessing cache. Changing the preprocessing or the files of an entry invalidates the old entries
+PREPROCESSING_CACHE_VERSION = 2
+
+def preprocessing_cache_key(dataset_filename, labels_filename, missing_values_flag, normalize_flag, dtype='float64', block_size=2**20):
+    '''
+    The SHA-256 of the contents of the dataset and labels files and of the preprocessing options, the name of the
+    entry of the preprocessing cache. Moving or renaming the files keeps the entry, editing them does not. dtype is
+    the dtype the dataset is read in ('float32' when it is streamed, see stream_dataset()), so that the streamed and
+    the not streamed runs do not share entries.
+    '''
+    digest = hashlib.sha256(f'MEvA-X preprocessing v{PREPROCESSING_CACHE_VERSION} impute={bool(missing_values_flag)} normalize={bool(normalize_flag)} dtype={dtype}'.encode())
+    for filename in (dataset_filename, labels_filename):
+        digest.update(b'\0file\0')
+        with open(filename, 'rb') as handle:
+            for block in iter(lambda: handle.read(block_size), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def save_preprocessed_dataset(cache_entry, dataset, feature_names, sample_names, labels, normalizer=None, verbose=False):
+    '''
+    Writes the imputed and normalized dataset (Features X Samples) in the cache_entry folder: dataset.npy, the labels
+    in labels.npy (with their dtype and shape, the text labels as unicode strings), the names in names.json and the
+    fitted normalizer in normalizer.pkl. The entry is written in a temporary folder and renamed, so that concurrent
+    runs never read a partial entry.
+    '''
+    if os.path.isdir(cache_entry):
+        return
+    temporary = f'{cache_entry}.tmp{os.getpid()}'
+    os.makedirs(temporary, exist_ok=True)
+    try:
+        np.save(os.path.join(temporary, 'dataset.npy'), np.ascontiguousarray(np.asarray(dataset))) # In the dtype of the key
+        labels = np.asarray(labels)
+        np.save(os.path.join(temporary, 'labels.npy'), labels.astype(str) if labels.dtype == object else labels, allow_pickle=False)
+        with open(os.path.join(temporary, 'names.json'), 'w') as names_file:
+            json.dump({'feature_names': [str(name) for name in feature_names],
+                       'sample_names': [str(name) for name in sample_names],
+                       'as_pandas': isinstance(dataset, pd.DataFrame)}, names_file)
+        with open(os.path.join(temporary, 'normalizer.pkl'), 'wb') as normalizer_file:
+            pickle.dump(normalizer, normalizer_file)
+        os.rename(temporary, cache_entry)
+    except OSError as error: # Another run wrote the entry first, or the cache folder is not writable
+        if verbose: print(f'The preprocessed dataset was not cached: {error}')
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+
+def load_preprocessed_dataset(cache_entry):
+    '''
+    Reads an entry of save_preprocessed_dataset(). The dataset is memory-mapped (copy on write).
+
+    Returns: a dict with the dataset, feature_names, sample_names, labels and normalizer, None if the entry does not exist
+    '''
+    if not os.path.isfile(os.path.join(cache_entry, 'names.json')):
+        return None
+    with open(os.path.join(cache_entry, 'names.json')) as names_file:
+        names = json.load(names_file)
+    with open(os.path.join(cache_entry, 'normalizer.pkl'), 'rb') as normalizer_file:
+        normalizer = pickle.load(normalizer_file)
+    feature_names = np.array(names['feature_names'], dtype=object)
+    sample_names = np.array(names['sample_names'], dtype=object)
+    labels = np.load(os.path.join(cache_entry, 'labels.npy'), allow_pickle=False)
+    if labels.dtype.kind == 'U':
+        labels = labels.astype(object) # The text labels as they are read from the labels file
+    dataset = np.load(os.path.join(cache_entry, 'dataset.npy'), mmap_mode='c')
+    if names['as_pandas']:
+        dataset = pd.DataFrame(dataset, index=feature_names, columns=sample_names)
+    return {'dataset': dataset, 'feature_names': feature_names, 'sample_names': sample_names, 'labels': labels, 'normalizer': normalizer}
+
 def pareto_frontiers(evaluation_values):
-    assigned = 0  # How many individuals have assigned to a frontier list so far
-    population = evaluation_values.shape[1]
+    """
+    Fast non-dominated sorting (NSGA-II) of the population. The last row of the evaluation values (overall score) is
+    not used as an objective.
+
+    The dominance relations of all the pairs of individuals are calculated at once with broadcasting, then the fronts
+    are peeled one after the other by counting how many of the remaining individuals dominate each individual.
+
+    Args:
+        evaluation_values: (ndarray) Eval_val X Indiv matrix of the evaluation values (higher is better)
+    Returns:
+        fronts: (ndarray) the number of the Pareto front of each individual. The first front is 1
+    """
+    objectives = np.asarray(evaluation_values, dtype=float)[:-1]
+    population = objectives.shape[1]
+    dominates = dominance_matrix(objectives, objectives)
+
+    domination_count = dominates.sum(axis=0) # How many individuals dominate each individual
     fronts = np.zeros(population, dtype='int')
+    remaining = np.ones(population, dtype=bool)
     front = 1
-    eval_temp = evaluation_values.copy()
-
-    while assigned < population:
-
-        non_dominated_solutions = np.zeros(population, dtype=int)
-        ordered_list = np.flip(np.argsort(eval_temp[0]))
-        non_dominated_solutions[0] = ordered_list[0]
-        number_of_non_dominated_solutions = 1
-
-        for i in range(1, population):
-            n = 0
-            condition = True
-            while n < number_of_non_dominated_solutions:
-                solution1 = eval_temp[:-1,ordered_list[i]] # This is the list of all but the NON-dominated solutions
-                solution2 = eval_temp[:-1,non_dominated_solutions[n]] # This is the list of NON-dominated solutions
-                check = dominant_solution(solution1, solution2)
-                if check==1: #New is dominant
-                    if number_of_non_dominated_solutions==1:
-                        non_dominated_solutions[0]=ordered_list[i]
-                        condition = False # Do NOT add a new non dominated solution, just put the new one on the first position
-                        break # STOP checking. The old solution is defeated and replaced
-                    else:
-                        number_of_non_dominated_solutions=number_of_non_dominated_solutions-1
-                        non_dominated_solutions = np.delete(non_dominated_solutions,n)
-                        continue # Continue checking the new solution compared to all other non dominated
-                elif check==3: #Non-diminated is dominant
-                    condition = False # Do NOT add a new non-dominated solution
-                    break # STOP checking. The new solution is already defeated
-                n += 1
-
-            if condition:
-                non_dominated_solutions[number_of_non_dominated_solutions]=ordered_list[i]
-                number_of_non_dominated_solutions += 1
-        sorted_non_dominated_solutions=sorted(non_dominated_solutions, reverse=True)
-        assigned += number_of_non_dominated_solutions
-        fronts[sorted_non_dominated_solutions[:number_of_non_dominated_solutions]] = front
+    while remaining.any():
+        current_front = remaining & (domination_count == 0) # Dominance is acyclic, so this is never empty
+        fronts[current_front] = front
+        remaining &= ~current_front
+        domination_count -= dominates[current_front].sum(axis=0)
         front += 1
-        eval_temp[:,sorted_non_dominated_solutions[:number_of_non_dominated_solutions]] = -1
     return fronts
 
 
+def dominance_matrix(objectives_a, objectives_b):
+    '''
+    Returns the matrix of the dominance relations of two groups of individuals (Objectives X Indiv each, higher is better):
+    dominates[i,j] is True when individual i of a dominates individual j of b (see dominant_solution())
+    '''
+    greater_or_equal = np.ones((objectives_a.shape[1], objectives_b.shape[1]), dtype=bool)
+    greater = np.zeros((objectives_a.shape[1], objectives_b.shape[1]), dtype=bool)
+    for objective_a, objective_b in zip(objectives_a, objectives_b):
+        greater_or_equal &= objective_a[:,None] >= objective_b[None,:]
+        greater |= objective_a[:,None] > objective_b[None,:]
+    return greater_or_equal & greater
+
 def dominant_solution(solution1, solution2):
     """
     Check = 2 is returned when there is no dominant solution between the two
@@ -749,19 +1806,291 @@ def evaluate_individual(individual):
     return individual.evaluate()
 
 
+def _init_evaluation_worker(dataset, labels, num_of_folds, multiclass, n_parameters, nthread, verbose, shared_dataset_info=None, binned=False,
+                            dmatrix_pool_bytes=0):
+    """
+    Initializer of the processes in the evaluation pool. The dataset and the labels are passed once per process
+    instead of once per individual.
+
+    Args:
+        n_parameters: the number of parameter genes. The global "parameters" is not defined in spawned processes
+        nthread: the number of threads XGBoost can use in every process
+        shared_dataset_info: (tuple) name and shape of a SharedDataset. If given, the process attaches to it and dataset is ignored
+        binned: train on the pre-binned folds (BinnedFolds)
+        dmatrix_pool_bytes: the memory budget of the DMatrixPool of the process. 0 disables the pool
+    """
+    global parameters
+    parameters = n_parameters
+    sample_major = False
+    shared_dataset = None
+    if shared_dataset_info is not None:
+        shared_dataset = SharedDataset(name=shared_dataset_info[0], shape=shared_dataset_info[1])
+        dataset = shared_dataset.data
+        sample_major = True
+    worker_state('evaluation', shared_dataset=shared_dataset, # Keeps the shared memory block open
+                 dataset=dataset, labels=labels, num_of_folds=num_of_folds, multiclass=multiclass,
+                 nthread=nthread, verbose=verbose, sample_major=sample_major, binned=binned,
+                 dmatrix_pool=DMatrixPool(dmatrix_pool_bytes) if dmatrix_pool_bytes > 0 else None)
+
+def _evaluate_in_worker(task):
+    """
+    Evaluates one individual inside a process of the evaluation pool.
+
+    Args:
+        task: (tuple) the position of the individual in the population, the individual, its filter mask, the random state of the folds and keep_boosters
+
+    Returns: individual.evaluate(), the hits and misses of the DMatrixPool of the process for this individual and the
+    boosters of the folds (None without keep_boosters)
+    """
+    i, individual, filter_mask, random_state, keep_boosters = task
+    state = worker_state('evaluation')
+    dmatrix_pool = state['dmatrix_pool']
+    hits, misses = (dmatrix_pool.hits, dmatrix_pool.misses) if dmatrix_pool is not None else (0, 0)
+    individual = Individual(individual, i, state['dataset'], state['labels'], state['num_of_folds'], filter_mask,
+                            state['multiclass'], random_state, verbose=state['verbose'], nthread=state['nthread'],
+                            sample_major=state['sample_major'], binned=state['binned'], dmatrix_pool=dmatrix_pool,
+                            keep_boosters=keep_boosters)
+    evaluation = evaluate_individual(individual)
+    if dmatrix_pool is not None:
+        hits, misses = dmatrix_pool.hits-hits, dmatrix_pool.misses-misses
+    return evaluation, hits, misses, (individual.boosters if keep_boosters else None)
+
+def _train_folds_in_worker(task):
+    """
+    Trains some folds of the cross validation of one individual inside a process of the evaluation pool.
+
+    Args:
+        task: (tuple) the position of the individual in the population, the individual, its filter mask, the random state of the folds and the indices of the folds
+
+    Returns: individual.train_folds(folds) and the hits and misses of the DMatrixPool of the process for this individual
+    """
+    i, individual, filter_mask, random_state, folds = task
+    state = worker_state('evaluation')
+    dmatrix_pool = state['dmatrix_pool']
+    hits, misses = (dmatrix_pool.hits, dmatrix_pool.misses) if dmatrix_pool is not None else (0, 0)
+    fold_records = Individual(individual, i, state['dataset'], state['labels'], state['num_of_folds'], filter_mask,
+                              state['multiclass'], random_state, verbose=state['verbose'], nthread=state['nthread'],
+                              sample_major=state['sample_major'], binned=state['binned'], dmatrix_pool=dmatrix_pool).train_folds(folds)
+    if dmatrix_pool is not None:
+        hits, misses = dmatrix_pool.hits-hits, dmatrix_pool.misses-misses
+    return fold_records, hits, misses
+
+def _evaluation_pool_initargs(dataset, labels, num_of_folds, multiclass, verbose, n_jobs, shared_dataset=None, binned=False, dmatrix_pool=None):
+    '''
+    Returns the arguments of _init_evaluation_worker for a pool of n_jobs processes
+    '''
+    nthread = max(1, available_cpu_count()//n_jobs) # Avoid the oversubscription of the cores by the XGBoost threads
+    dmatrix_pool_bytes = dmatrix_pool.max_bytes//n_jobs if dmatrix_pool is not None else 0 # The budget is shared by the processes
+    if shared_dataset is not None:
+        return (None, labels, num_of_folds, multiclass, parameters, nthread, verbose, (shared_dataset.name, shared_dataset.shape), binned, dmatrix_pool_bytes)
+    return (np.asarray(dataset), labels, num_of_folds, multiclass, parameters, nthread, verbose, None, binned, dmatrix_pool_bytes)
+
+def open_evaluation_pool(dataset, labels, num_of_folds, multiclass, verbose, n_jobs, shared_dataset=None, binned=False, dmatrix_pool=None):
+    '''
+    A pool of n_jobs evaluation processes to pass to evaluate_individuals() for all the generations, so that the
+    DMatrixPool and the BinnedFolds of the processes are kept from one generation to the next. None if n_jobs <= 1.
+    The caller terminates the pool.
+    '''
+    if n_jobs <= 1:
+        return None
+    return mp.Pool(processes=n_jobs, initializer=_init_evaluation_worker,
+                   initargs=_evaluation_pool_initargs(dataset, labels, num_of_folds, multiclass, verbose, n_jobs, shared_dataset, binned, dmatrix_pool))
+
+def race_individuals(dataset, labels, individuals, filter_mask, evaluations, to_evaluate, num_of_folds, racing_folds, multiclass,
+                     random_state, verbose=True, n_jobs=1, shared_dataset=None, binned=False, dmatrix_pool=None, evaluation_pool=None):
+    '''
+    Successive halving of the cross validation. The individuals of to_evaluate are first trained on the first
+    racing_folds folds only. An individual is promoted to the other folds only if its optimistic evaluation (the mean
+    plus the standard deviation of every metric over the first folds) is not dominated by an individual of the first
+    Pareto front of the partial evaluations (and of the complete evaluations found in the cache). The eliminated
+    individuals keep the evaluation of their first folds.
+
+    The folds are the same as the ones of the full cross validation and they are trained in the same order, so the
+    promoted individuals get exactly the evaluation they would get without racing.
+
+    Args:
+        evaluations: the evaluations of the population already known (from the FitnessCache), None for the others
+        to_evaluate: the positions of the individuals to evaluate
+        evaluation_pool: the pool of open_evaluation_pool(). If None, a pool is created for this call when n_jobs > 1
+    Returns:
+        new_evaluations: the evaluations of the individuals of to_evaluate
+        complete: for every individual of to_evaluate, True if it was evaluated on all the folds
+        trained_folds: the number of folds trained and the number of folds the full cross validation would train
+    '''
+    first_folds = list(range(racing_folds))
+    other_folds = list(range(racing_folds, num_of_folds))
+    data = shared_dataset.data if shared_dataset is not None else dataset
+    # Individual objects of the main process, only to put the evaluation together from the folds
+    individual_objects = [Individual(individuals[i], i, data, labels, num_of_folds, filter_mask[i], multiclass, random_state, verbose=verbose,
+                                     sample_major=shared_dataset is not None, binned=binned, dmatrix_pool=dmatrix_pool)
+                          for i in to_evaluate]
+
+    pool = None
+    if n_jobs > 1 and len(to_evaluate) > 1:
+        pool = evaluation_pool if evaluation_pool is not None else \
+               open_evaluation_pool(dataset, labels, num_of_folds, multiclass, verbose, n_jobs, shared_dataset, binned, dmatrix_pool)
+    def train(positions, folds):
+        if pool is None:
+            return [individual_objects[k].train_folds(folds) for k in positions]
+        worker_results = pool.map(_train_folds_in_worker, [(to_evaluate[k], individuals[to_evaluate[k]], filter_mask[to_evaluate[k]], random_state, folds)
+                                                           for k in positions], chunksize=1)
+        if dmatrix_pool is not None:
+            dmatrix_pool.hits += sum(hits for _, hits, _ in worker_results)
+            dmatrix_pool.misses += sum(misses for _, _, misses in worker_results)
+        return [fold_records for fold_records, _, _ in worker_results]
+
+    try:
+        fold_records = train(range(len(to_evaluate)), first_folds)
+        partial_evaluations = [individual.summarize(records) for individual, records in zip(individual_objects, fold_records)]
+
+        # Objectives (rows) of the individuals (columns) as in the evaluation_values of evaluate_individuals
+        racing = [k for k in range(len(to_evaluate)) if fold_records[k]] # Individuals without features have nothing to train
+        known = [i for i in range(individuals.shape[0]) if evaluations[i] is not None]
+        def objectives(i, evaluation):
+            n_features = np.count_nonzero(filter_mask[i,parameters:])
+            return np.concatenate(([10/(10+n_features) if n_features > 0 else 0], evaluation[0][:-1]))
+        values = np.array([objectives(to_evaluate[k], partial_evaluations[k]) for k in racing] +
+                          [objectives(i, evaluations[i]) for i in known]).T
+        promoted = []
+        if racing:
+            first_front = pareto_frontiers(np.vstack((values, np.zeros(values.shape[1])))) == 1
+            for column, k in enumerate(racing):
+                mean_std = partial_evaluations[k][1]
+                stdv = [std for _, std in mean_std[1:10]] # Same metrics as evaluation[0][:-1]
+                if multiclass:
+                    stdv.append(mean_std[9][1])
+                optimistic = values[:,column] + np.concatenate(([0], stdv))
+                front = values[:, first_front & (np.arange(values.shape[1]) != column)]
+                if not ((front >= optimistic[:,None]).all(axis=0) & (front > optimistic[:,None]).any(axis=0)).any():
+                    promoted.append(k)
+
+        if promoted and other_folds:
+            for k, records in zip(promoted, train(promoted, other_folds)):
+                fold_records[k] = fold_records[k] + records
+    finally:
+        if pool is not None and pool is not evaluation_pool:
+            pool.close()
+            pool.join()
+
+    new_evaluations = list(partial_evaluations)
+    for k in promoted:
+        new_evaluations[k] = individual_objects[k].summarize(fold_records[k])
+    complete = [k in promoted or not fold_records[k] for k in range(len(to_evaluate))]
+    trained_folds = (sum(len(records) for records in fold_records), len(racing)*num_of_folds)
+    return new_evaluations, complete, trained_folds
+
 def evaluate_individuals(dataset, labels, individuals, goal_significances, num_of_folds, classification_problems,
-						output_folder, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, multiclass=True, verbose=True):
+						output_folder, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, multiclass=True, verbose=True, n_jobs=1,
+						fitness_cache=None, cv_seed=None, shared_dataset=None, fs_masks=None, binned=False, dmatrix_pool=None, racing_folds=0,
+						model_store=None, evaluation_pool=None):
+    '''
+    Evaluates all the individuals of the population. With n_jobs > 1 the individuals are spread over a pool of processes
+    and the results are collected in the order of the population. The folds of the cross validation are decided
+    before the individuals are sent to the processes, so the results are the same as the ones of the serial evaluation.
+
+    Individuals found in the fitness_cache (a FitnessCache) are not trained again and identical individuals of the
+    population are trained only once. With cv_seed the folds are the same in every generation, otherwise they
+    change in every call.
+
+    If a SharedDataset of the dataset is given, the individuals read their features from it and the processes of the
+    pool attach to it instead of receiving a copy of the dataset.
+
+    fs_masks are the precomputed masks of feature_selection_masks() for the filter_function().
+
+    With binned the boosters train with the hist tree method on BinnedFolds, computed once per fold plan.
+
+    With a dmatrix_pool (a DMatrixPool) the DMatrix of the folds are built once per feature subset and fold plan. The
+    processes of the pool keep their own DMatrixPool with an n_jobs share of the budget and their hits and misses
+    are added to the ones of dmatrix_pool.
+
+    With an evaluation_pool (see open_evaluation_pool()) the processes of the pool are used, with their DMatrixPool
+    and BinnedFolds of the previous generations. Otherwise a pool is created for this call when n_jobs > 1.
 
-    filter_mask = filter_function(individuals, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, verbose)
+    With 0 < racing_folds < num_of_folds the individuals race (see race_individuals()): only the individuals that can
+    still reach the first Pareto front after racing_folds folds are trained on all the folds. The evaluations of the
+    eliminated individuals are not kept in the fitness_cache.
+
+    With a model_store (a ModelStore) the boosters of the folds of the trained individuals are kept in the store for
+    majority_voting() (not the ones of the individuals that race).
+    '''
+
+    filter_mask = filter_function(individuals, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, verbose, fs_masks)
 
     # Create Individual Class instances and use them to find the fitness of the models. Then drop them to save memory
     eval_time_start = time.time()
-    random_state = np.random.randint(500)
+    random_state = np.random.randint(500) # Drawn even when the folds are fixed, to keep the same sequence of random numbers
+    if cv_seed is not None:
+        random_state = cv_seed
     results = []
     mean_std_all = []
     roc_auc_all = []
-    for i, individual in enumerate(individuals):
-        res,mean_std, roc_auc_indiv = evaluate_individual(Individual(individual, i, dataset, labels, num_of_folds, filter_mask[i], multiclass, random_state, verbose))
+
+    # Look for the individuals in the cache. Only the first of the identical individuals is trained
+    evaluations = [None]*individuals.shape[0]
+    to_evaluate = list(range(individuals.shape[0]))
+    if fitness_cache is not None:
+        hits_before, misses_before = fitness_cache.hits, fitness_cache.misses
+        keys = [FitnessCache.key(individuals[i], filter_mask[i], random_state, num_of_folds) for i in range(individuals.shape[0])]
+        first_position = {}
+        for i, key in enumerate(keys):
+            if key in first_position:
+                continue
+            evaluations[i] = fitness_cache.get(key)
+            if evaluations[i] is None:
+                first_position[key] = i
+        to_evaluate = list(first_position.values())
+
+    if dmatrix_pool is not None:
+        pool_hits_before, pool_misses_before = dmatrix_pool.hits, dmatrix_pool.misses
+    complete = [True]*len(to_evaluate)
+    trained_folds = None
+    keep_boosters = model_store is not None
+    new_boosters = [None]*len(to_evaluate)
+    if 0 < racing_folds < num_of_folds and len(to_evaluate) > 1:
+        new_evaluations, complete, trained_folds = race_individuals(dataset, labels, individuals, filter_mask, evaluations, to_evaluate,
+                                                                    num_of_folds, racing_folds, multiclass, random_state, verbose, n_jobs,
+                                                                    shared_dataset, binned, dmatrix_pool, evaluation_pool)
+    elif n_jobs > 1 and len(to_evaluate) > 1:
+        tasks = [(i, individuals[i], filter_mask[i], random_state, keep_boosters) for i in to_evaluate]
+        if evaluation_pool is not None:
+            worker_results = evaluation_pool.map(_evaluate_in_worker, tasks, chunksize=1) # map() keeps the order of the population
+        else:
+            with open_evaluation_pool(dataset, labels, num_of_folds, multiclass, verbose, n_jobs, shared_dataset, binned, dmatrix_pool) as pool:
+                worker_results = pool.map(_evaluate_in_worker, tasks, chunksize=1)
+        new_evaluations = [evaluation for evaluation, _, _, _ in worker_results]
+        new_boosters = [boosters for _, _, _, boosters in worker_results]
+        if dmatrix_pool is not None:
+            dmatrix_pool.hits += sum(hits for _, hits, _, _ in worker_results)
+            dmatrix_pool.misses += sum(misses for _, _, misses, _ in worker_results)
+    else:
+        new_evaluations = []
+        for k, i in enumerate(to_evaluate):
+            if shared_dataset is not None:
+                individual = Individual(individuals[i], i, shared_dataset.data, labels, num_of_folds, filter_mask[i], multiclass, random_state, verbose=verbose, sample_major=True, binned=binned, dmatrix_pool=dmatrix_pool, keep_boosters=keep_boosters)
+            else:
+                individual = Individual(individuals[i], i, dataset, labels, num_of_folds, filter_mask[i], multiclass, random_state, verbose=verbose, binned=binned, dmatrix_pool=dmatrix_pool, keep_boosters=keep_boosters)
+            new_evaluations.append(evaluate_individual(individual))
+            if keep_boosters:
+                new_boosters[k] = individual.boosters
+    for i, evaluation in zip(to_evaluate, new_evaluations):
+        evaluations[i] = evaluation
+
+    if model_store is not None:
+        model_store.keys = [FitnessCache.key(individuals[i], filter_mask[i], random_state, num_of_folds) for i in range(individuals.shape[0])]
+        for i, boosters in zip(to_evaluate, new_boosters):
+            if boosters:
+                model_store.put(model_store.keys[i], boosters)
+
+    if fitness_cache is not None:
+        for i, evaluated_on_all_folds in zip(to_evaluate, complete):
+            if evaluated_on_all_folds:
+                fitness_cache.put(keys[i], evaluations[i])
+        for i, key in enumerate(keys):
+            if evaluations[i] is None: # Duplicate of an individual trained in this generation
+                evaluations[i] = evaluations[first_position[key]]
+                fitness_cache.hits += 1
+
+    for res, mean_std, roc_auc_indiv in evaluations:
         results.append(res)
         mean_std_all.append(mean_std)
         roc_auc_all.append(roc_auc_indiv)
@@ -772,21 +2101,48 @@ def evaluate_individuals(dataset, labels, individuals, goal_significances, num_o
 
     eval_time_stop = time.time()
     if verbose: print(f'Time to run CV: {eval_time_stop-eval_time_start}')
-    with open(output_folder + 'timing.txt','a') as time_file:
+    with RunLogText(output_folder, 'timing.txt') as time_file:
             time_file.write(f'Time to run CV: {eval_time_stop-eval_time_start}\n')
+            if fitness_cache is not None:
+                time_file.write(f'Fitness cache: {fitness_cache.hits-hits_before} hits, {fitness_cache.misses-misses_before} misses '
+                                f'(total: {fitness_cache.hits} hits, {fitness_cache.misses} misses, {len(fitness_cache)} evaluations kept)\n')
+            if dmatrix_pool is not None:
+                time_file.write(f'DMatrix pool: {dmatrix_pool.hits-pool_hits_before} hits, {dmatrix_pool.misses-pool_misses_before} misses '
+                                f'(total: {dmatrix_pool.hits} hits, {dmatrix_pool.misses} misses, hit rate: {dmatrix_pool.hits/max(1, dmatrix_pool.hits+dmatrix_pool.misses):.3f}, '
+                                f'{len(dmatrix_pool)} feature subsets kept, {dmatrix_pool.nbytes/1024**2:.1f} MB)\n')
+            if trained_folds is not None:
+                time_file.write(f'Racing: {sum(complete)} of {len(complete)} individuals evaluated on all the folds, {trained_folds[0]} of {trained_folds[1]} folds trained '
+                                f'({1-trained_folds[0]/max(1, trained_folds[1]):.1%} of the training saved)\n')
+
+    evaluation_values, N_trees = evaluation_matrix(results, filter_mask, goal_significances)
+    if verbose: print(f'N_trees = {N_trees}')
+
+    eval_metrics_names = ['Model_complexity #features','Accuracy','Model_complexity #splits',
+    'weighted Geometric Mean','F1 score','F2 score','Precision','Recall','AUrocC',
+    'Balanced_accuracy','Manhattan distance^-1','Overall score']
+    # G1:Feature_compl, G2:Acc, G3:Sample_compl, G4:wGM, G5:F1, G6:F2, G7:Precision, G8:Recall, G9:AUC, G10:Manhatan_dist, G11:GM
+    return evaluation_values, mean_std_all, roc_auc_all, N_trees
 
+def evaluation_matrix(results, filter_mask, goal_significances):
+    '''
+    Creates the evaluation values of the individuals from the results of their cross validation (the first element of
+    Individual.evaluate()): the feature complexity, the metrics of the cross validation and the overall score.
+
+    Returns:
+        evaluation_values: (ndarray) Eval_val X Indiv matrix of the evaluation values
+        N_trees: (ndarray) the number of trees of every individual for the final models
+    '''
     # Convert the results to numpy array for easier handling
     results = np.array(results, dtype = float)
     ## last element is the mean number of trees in the ensemble. I need it only for the final training
     N_trees = results[:,-1] # N_trees is the num_boost_round for the final models
     N_trees = N_trees.astype('int32')
     results = results[:,:-1] # drop the average number of trees from evaluation values
-    if verbose: print(f'N_trees = {N_trees}')
     # Creating the matrix that holds the evaluation values. It has +2 positions to hold 1. the feature complexity & 2. The overall score
-    evaluation_values = np.empty([len(results[0])+2, individuals.shape[0]], dtype = float) # [[goal1],[goal2],[goal3],...[goal_n],[overall_score]]
+    evaluation_values = np.empty([len(results[0])+2, filter_mask.shape[0]], dtype = float) # [[goal1],[goal2],[goal3],...[goal_n],[overall_score]]
 
     # Find the Model_complexity based on the #active_features in each individual solution
-    for ind in range(individuals.shape[0]):
+    for ind in range(filter_mask.shape[0]):
         ''' HERE WE CHECK IF THE PARAMETERS ARE RIGHT TO FILTER THE GENES (Wilcoxon, mifs, SKB)'''
 
         number_of_selected_feature=0
@@ -802,13 +2158,7 @@ def evaluate_individuals(dataset, labels, individuals, goal_significances, num_o
     # Eval_values_overall = [(b0*x0)+(b1*x1)+(b2*x2)+...+(b_n-2*x_n-2)+(b_n-1*x_n-1)]
     for i in range(evaluation_values.shape[1]): # For all individuals
         evaluation_values[-1,i] = np.multiply(evaluation_values[:-1,i],goal_significances.T).mean()
-
-
-    eval_metrics_names = ['Model_complexity #features','Accuracy','Model_complexity #splits',
-    'weighted Geometric Mean','F1 score','F2 score','Precision','Recall','AUrocC',
-    'Balanced_accuracy','Manhattan distance^-1','Overall score']
-    # G1:Feature_compl, G2:Acc, G3:Sample_compl, G4:wGM, G5:F1, G6:F2, G7:Precision, G8:Recall, G9:AUC, G10:Manhatan_dist, G11:GM
-    return evaluation_values, mean_std_all, roc_auc_all, N_trees
+    return evaluation_values, N_trees
 
 def create_different_classification_problems(labels, unique_labels):
     """
@@ -834,33 +2184,49 @@ def create_different_classification_problems(labels, unique_labels):
             number_of_classification_problems += 1
     return classification_problems
 
-def Wilcoxon_ranksums(dataset, classification_problems):
-    '''l=len(individuals[ind])-parameters'''
+def Wilcoxon_ranksums(dataset, classification_problems, chunk_size=2000):
+    '''
+    Selects the features with a significant Wilcoxon rank sum test (p < 0.05) in at least one of the classification
+    problems. For every problem the features are ranked all at once along the samples, chunk_size features at a time
+    to bound the memory. The values -1000 (missing) are left out of the test of their feature and the features with
+    NaN values in the samples of a problem are not selected by this problem (their p-value is NaN).
+
+    Args:
+        dataset: the dataset Features X Samples
+        classification_problems: the classification problems of create_different_classification_problems()
+        chunk_size: the number of features ranked at once
+
+    Returns:
+        selected: (ndarray) 1 for the selected features, 0 for the rest
+    '''
     print('Calculating Wilcoxon ranksums')
     try:
         dataset = dataset.values.copy()
     except:
         print('The dataset is not Pandas.DataFrame')
+    dataset = np.asarray(dataset, dtype=float)
+    classification_problems = np.asarray(classification_problems).astype(int)
     l = dataset.shape[0]
     selected = np.zeros(l)
-    for feature in range(l):
-        for i in range(len(classification_problems)):
-            if selected[feature]==1:
-                break
-
-            data1=list()
-            data2=list()
-            for j in range(len(dataset[0])):
-                if int(classification_problems[i,j])==1:
-                    if (float(dataset[feature,j])!=-1000):
-                        data1.append(dataset[feature,j])
-                elif int(classification_problems[i,j])==-1:
-                    if (float(dataset[feature,j])!=-1000):
-                        data2.append(dataset[feature,j])
-            if len(data1)>1 and len(data2)>1:
-                [z,pvalue] = ranksums(data1,data2)
-                if pvalue<0.05:
-                    selected[feature]=selected[feature]+1
+    for start in range(0, l, chunk_size):
+        chunk = dataset[start:start+chunk_size]
+        chunk_selected = np.zeros(chunk.shape[0], dtype=bool)
+        for problem in classification_problems:
+            in_problem = (problem==1) | (problem==-1)
+            in_data1 = (problem==1)[in_problem]
+            values = chunk[:,in_problem]
+            nan_values = np.isnan(values)
+            valid = (values != -1000) & ~nan_values
+            # The left out values get the highest ranks, so the ranks of the valid values are the ranks among them
+            ranks = rankdata(np.where(valid, values, np.inf), axis=1)
+            n1 = (valid & in_data1).sum(axis=1)
+            n2 = (valid & ~in_data1).sum(axis=1)
+            rank_sum = np.where(valid & in_data1, ranks, 0).sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z = (rank_sum - n1*(n1+n2+1)/2.0)/np.sqrt(n1*n2*(n1+n2+1)/12.0) # Same statistic as scipy.stats.ranksums
+            pvalue = 2*norm.sf(np.abs(z))
+            chunk_selected |= (n1>1) & (n2>1) & ~nan_values.any(axis=1) & (pvalue<0.05)
+        selected[start:start+chunk_size] = chunk_selected
     return selected
 
 def mifs_calc(data, labels, method = 'JMI', n_features = 100, k_vals = 4):
@@ -959,7 +2325,154 @@ def mutation(selected_individuals, population, min_values, max_values, mutation_
 
     return selected_individuals
 
-def filter_function(individuals, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, verbose):
+def mutate_population(selected_individuals, min_values, max_values, mutation_probability, generations, current_gen, rng, mu=0, s=0.1):
+    '''
+    Vectorized version of mutation(). All the offspring (every individual but the first) are mutated at once with the
+    random numbers of one np.random.Generator.
+
+    selected_individuals: the population after the crossover. It is mutated in place
+    rng: the np.random.Generator of the genetic operators
+    '''
+    if current_gen>=generations/3 and current_gen<generations/6:
+        mutation_probability=mutation_probability/2
+    elif current_gen>=generations/6:
+        mutation_probability=mutation_probability/3
+
+    offspring = selected_individuals[1:] # View. The first individual is the best of the previous generation
+    n_offspring = offspring.shape[0]
+    n_features = offspring.shape[1]-parameters
+    if n_offspring == 0:
+        return selected_individuals
+
+    #Mutation on Parameter-genes ONLY
+    param_range = max_values[:parameters]-min_values[:parameters]
+    mutated = rng.random((n_offspring, parameters)) < mutation_probability
+    noise = rng.normal(mu, s*param_range, size=(n_offspring, parameters))
+    mutated_params = np.clip(offspring[:,:parameters]+noise, min_values[:parameters], max_values[:parameters]-1e-05) #-1E-5 in order to avoid rounding to max value when we use int()
+    offspring[:,:parameters] = np.where(mutated, mutated_params, offspring[:,:parameters])
+
+    ## Mutation on Feature-genes Only
+    if n_features == 0:
+        return selected_individuals
+    genes = offspring[:,parameters:]
+    on_genes = genes>0.5
+    n_on = on_genes.sum(axis=1)
+
+    # Half of the offspring get 1-5 new genes, the other half lose 1-5 genes (as many as mutation() removes)
+    add = rng.random(n_offspring) < 0.5
+    remove = ~add & (n_on>0)
+    n_changes = np.zeros(n_offspring, dtype=int)
+    n_changes[add] = np.minimum(rng.integers(1, 6, size=add.sum()), n_features-n_on[add])
+    few = remove & (n_on<6)
+    n_changes[few] = np.clip(rng.integers(0, n_on[few]), 1, n_on[few])
+    many = remove & (n_on>=6)
+    n_changes[many] = rng.integers(1, 6, size=many.sum())
+
+    # The genes changed in every offspring are the eligible ones (OFF to add, ON to remove) with the smallest random keys
+    max_changes = min(5, n_features)
+    keys = rng.random(genes.shape)
+    keys[np.where(add[:,None], on_genes, ~on_genes)] = 2.0 # Not eligible
+    candidates = np.argpartition(keys, max_changes-1, axis=1)[:,:max_changes]
+    candidates = np.take_along_axis(candidates, np.argsort(np.take_along_axis(keys, candidates, axis=1), axis=1), axis=1)
+    rows, ranks = np.nonzero(np.arange(max_changes)[None,:] < n_changes[:,None])
+    genes[rows, candidates[rows, ranks]] = add[rows].astype(float)
+
+    return selected_individuals
+
+def crossover_population(selected_individuals, two_points_crossover_probability, arithmetic_crossover_probability, rng):
+    '''
+    Vectorized version of the crossover of apply_evolutionary_process(). The pairs of individuals (1,2), (3,4), ...
+    get a two-point crossover of their feature genes or an arithmetic crossover, with the same probabilities and cross
+    points as the loop version but with the random numbers of one np.random.Generator.
+
+    selected_individuals: the selected population. It is changed in place
+    rng: the np.random.Generator of the genetic operators
+    Returns:
+        selected_individuals: the population with the children
+        two_points_log: list of (i, cross_point1, cross_point2, width) for the two-point crossovers of pairs (i, i+1)
+        arithmetic_log: list of (i, alpha) for the arithmetic crossovers of pairs (i, i+1)
+    '''
+    population, length = selected_individuals.shape
+    first_parents = np.arange(1, population-1, 2)
+    random_number = rng.random(first_parents.shape[0]) # one random number per pair activates the cross-over or not
+    two_points = first_parents[random_number<=two_points_crossover_probability]
+    arithmetic = first_parents[(random_number>two_points_crossover_probability) & (random_number<(two_points_crossover_probability+arithmetic_crossover_probability))]
+
+    # Cross points. They are drawn again for the pairs where they are equal
+    cross_point1 = np.zeros(two_points.shape[0])
+    cross_point2 = np.zeros(two_points.shape[0])
+    width = np.zeros(two_points.shape[0])
+    redraw = np.ones(two_points.shape[0], dtype=bool)
+    while redraw.any():
+        new_point1 = np.ceil((length-parameters)*rng.random(redraw.sum()))
+        new_width = np.where(new_point1<math.floor((2*length-1)/3),
+                             np.ceil((math.floor(length-1)/3 -2)*rng.random(redraw.sum())),
+                             np.ceil(rng.random(redraw.sum())*(math.floor(length/3 -1)-2-(new_point1-math.floor(2*length/3)))))
+        cross_point1[redraw] = new_point1
+        width[redraw] = new_width
+        cross_point2[redraw] = new_point1+new_width
+        redraw = cross_point1==cross_point2
+    cross_point1, cross_point2 = np.minimum(cross_point1, cross_point2).astype(int), np.maximum(cross_point1, cross_point2).astype(int)
+
+    # Create the children for the next generation
+    columns = np.arange(length)
+    swap = (columns>=parameters+cross_point1[:,None]) & (columns<parameters+cross_point2[:,None])
+    parent1 = selected_individuals[two_points]
+    parent2 = selected_individuals[two_points+1]
+    selected_individuals[two_points] = np.where(swap, parent2, parent1)
+    selected_individuals[two_points+1] = np.where(swap, parent1, parent2)
+
+    alpha = rng.random(arithmetic.shape[0])
+    parent1 = selected_individuals[arithmetic]
+    parent2 = selected_individuals[arithmetic+1]
+    selected_individuals[arithmetic] = alpha[:,None]*parent1 + (1-alpha[:,None])*parent2
+    selected_individuals[arithmetic+1] = (1-alpha[:,None])*parent1 + alpha[:,None]*parent2
+
+    two_points_log = list(zip(two_points.tolist(), cross_point1.tolist(), cross_point2.tolist(), width.astype(int).tolist()))
+    arithmetic_log = list(zip(arithmetic.tolist(), alpha.tolist()))
+    return selected_individuals, two_points_log, arithmetic_log
+
+def feature_selection_masks(n_features, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes):
+    '''
+    Precomputes the genes selected by every Feature Selection method and k for filter_function()
+    Parameters:
+    -----------
+        n_features [int]: The number of feature genes
+        JMI_genes [array]: The array of positions of genes selected by the JMI method, one row for every k
+        Wilcoxon_genes [array]: The array of positions of genes selected by the Wilcoxon rank sums
+        mRMR_genes [array]: The array of positions of genes selected by the mRMR method, one row for every k
+        SelKBest_genes [array]: The array of positions of genes ordered by the SelectKBest scores
+    Return:
+        fs_masks [dict]: FS method gene (1: JMI, 2: Wilcoxon, 3: mRMR, 4: SelectKBest) -> None if the method has no genes,
+                         k X n_features boolean masks for JMI and mRMR, 1 X n_features boolean mask for Wilcoxon and the
+                         position of every gene in the SelectKBest order for SelectKBest (n_features if not ranked)
+    -----------
+
+    '''
+    fs_masks = {}
+    for method, FS_genes in ((1, JMI_genes), (2, Wilcoxon_genes), (3, mRMR_genes)):
+        if FS_genes is None:
+            fs_masks[method] = None
+            continue
+        if method == 2:
+            FS_genes = [FS_genes]
+        masks = np.zeros((len(FS_genes), n_features), dtype=bool)
+        for k_indx in range(len(FS_genes)): # k = [4,5,6,...,10] for JMI and mRMR
+            masks[k_indx, FS_genes[k_indx]] = True
+        fs_masks[method] = masks
+
+    if SelKBest_genes is None:
+        fs_masks[4] = None
+    else:
+        if not isinstance(SelKBest_genes,np.ndarray):
+            SelKBest_genes = np.flip(np.argsort(SelKBest_genes.scores_))
+        SelKBest_genes = np.asarray(SelKBest_genes, dtype=int).ravel()
+        rank = np.full(n_features, n_features)
+        rank[SelKBest_genes[::-1]] = np.arange(SelKBest_genes.shape[0])[::-1] # The first position of a gene counts
+        fs_masks[4] = rank
+    return fs_masks
+
+def filter_function(individuals, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, verbose, fs_masks=None):
     '''
     Applies the Feature selection method (if applicable) based on the parameter genes each individual has
     Parameters:
@@ -969,73 +2482,59 @@ def filter_function(individuals, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest
         Wilcoxon_genes [array]: The array of positions of genes selected by the mRMR method for filtering
         mRMR_genes [array]: The array of positions of genes selected by the JMI method for filtering
         SelKBest_genes [array]: The array of positions of genes selected by the SelKBest method for filtering
+        fs_masks [dict]: The masks of feature_selection_masks(). Calculated from the FS genes if not given
     Return:
         filter_mask [array]: A boolean array of index for genes to turn ON/OFF
     -----------
 
     '''
-    filter_mask = individuals.copy()
-    for indiv in range(individuals.shape[0]):
-        if int(individuals[indiv,0]) != 0:#No Feature Selection method
-            if int(individuals[indiv,1]) < 2:
-
-                if int(individuals[indiv,0]) == 1: #JMI
-                    if JMI_genes is None:
-                        filter_mask[indiv,parameters:] = filter_mask[indiv,parameters:].round()
-                        if verbose: print('JMI FS has selected no features. No filtering will apply on the features!')
-                        continue
-                    else:
-                        FS_genes = JMI_genes[int(individuals[indiv,2])-4] # k = [4,5,6,...,10] that's why we subtract 4 to have the right index
-
-                elif int(individuals[indiv,0]) == 2: #Wilcoxon ranksums
-                    if Wilcoxon_genes is None:
-                        filter_mask[indiv,parameters:] = filter_mask[indiv,parameters:].round()
-                        if verbose: print('Wilcoxon rank sums FS has selected no features. No filtering will apply on the features!')
-                        continue
-                    else:
-                        #FS_genes = Wilcoxon_genes.to_numpy()[0]
-                        FS_genes = Wilcoxon_genes
-
-                elif int(individuals[indiv,0]) == 3: #mRMR
-                    if mRMR_genes is None:
-                        filter_mask[indiv,parameters:] = filter_mask[indiv,parameters:].round()
-                        if verbose: print('mRMR FS has selected no features. No filtering will apply on the features!')
-                        continue
-                    else:
-                        #FS_genes = mRMR_genes.iloc[int(individuals[indiv,2]-4)].to_numpy() # k = [4,5,6,...,10] that's why we subtract 4 to have the right index
-                        FS_genes = mRMR_genes[int(individuals[indiv,2]-4)]
-
-                elif int(individuals[indiv,0]) == 4: #SelectKBest
-                    if SelKBest_genes is None:
-                        filter_mask[indiv,parameters:] = filter_mask[indiv,parameters:].round()
-                        if verbose: print('Select K Best FS has selected no features. No filtering will apply on the features!')
-                        continue
-                    else:
-                        up_to = int(individuals[indiv,3])
-                        #FS_genes = SelKBest_genes.iloc[:,:up_to].to_numpy()[0]
-                        if isinstance(SelKBest_genes,np.ndarray):
-                            FS_genes = SelKBest_genes[:up_to]
-                        else:
-                            FS_genes = SelKBest_genes.scores_[np.flip(np.argsort(SelKBest_genes.scores_))[:up_to]]
-            else:
-                filter_mask[indiv,parameters:] = filter_mask[indiv,parameters:].round()
-                continue
-
-            if int(individuals[indiv,1]) == 0: # Feature Selection filter only
-                temp_chrom = np.zeros(individuals.shape[1]-parameters)
-                temp_chrom[FS_genes] = individuals[indiv,FS_genes+parameters]
-                temp_chrom[FS_genes] = temp_chrom[FS_genes].round()
-                filter_mask[indiv,parameters:] = temp_chrom
-
-            elif int(individuals[indiv,1]) == 1: # Genetic Algorithm filter only -> Removes genes that the FS method found important
-                temp_chrom = individuals[indiv,parameters:].copy()
-                temp_chrom[FS_genes] = 0
-                temp_chrom = temp_chrom.round()
-                filter_mask[indiv,parameters:] = temp_chrom
-        else:
-            filter_mask[indiv,parameters:] = filter_mask[indiv,parameters:].round()
+    individuals = np.asarray(individuals)
+    if fs_masks is None:
+        fs_masks = feature_selection_masks(individuals.shape[1]-parameters, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes)
+
+    filter_mask = np.empty(individuals.shape, dtype=bool)
+    filter_mask[:,:parameters] = individuals[:,:parameters] != 0
+    filter_mask[:,parameters:] = individuals[:,parameters:].round() != 0 # No Feature Selection method
+
+    FS_method = individuals[:,0].astype(int)
+    use_of_FS = individuals[:,1].astype(int)
+    method_names = {1: 'JMI', 2: 'Wilcoxon rank sums', 3: 'mRMR', 4: 'Select K Best'}
+    for method, masks in fs_masks.items():
+        rows = np.flatnonzero((FS_method == method) & (use_of_FS < 2))
+        if rows.size == 0:
+            continue
+        if masks is None:
+            if verbose: print(f'{method_names[method]} FS has selected no features. No filtering will apply on the features!')
+            continue
+
+        if method == 4: #SelectKBest
+            FS_genes = masks[None,:] < individuals[rows,3].astype(int)[:,None]
+        elif method == 2: #Wilcoxon ranksums
+            FS_genes = np.broadcast_to(masks[0], (rows.size, masks.shape[1]))
+        else: #JMI, mRMR
+            FS_genes = masks[individuals[rows,2].astype(int)-4] # k = [4,5,6,...,10] that's why we subtract 4 to have the right index
+
+        # Feature Selection filter only: keeps the genes of the FS method. Genetic Algorithm filter only: removes them
+        filter_mask[rows,parameters:] &= np.where((use_of_FS[rows] == 0)[:,None], FS_genes, ~FS_genes)
+
+    return filter_mask
+
+def _parameter_distances(individuals, max_values, min_values):
+    '''
+    Squared differences of the parameter genes between all the pairs of individuals, normalized by the range of every
+    parameter and summed over the parameters.
+    '''
+    par = individuals[:,:parameters]/(np.asarray(max_values[:parameters], dtype=float)-np.asarray(min_values[:parameters], dtype=float))
+    return ((par[:,None,:]-par[None,:,:])**2).sum(axis=2)
 
-    return filter_mask.astype(bool)
+def _sharing_counts(dist_mat, sigma_share):
+    '''
+    Niche counts of the individuals of one Pareto front. Every individual counts itself once and the other individuals
+    of the front with distance <= sigma_share with 1-(d/sigma_share)^2.
+    '''
+    sharing = np.where(dist_mat<=sigma_share, 1-(dist_mat/float(sigma_share))**2, 0.0)
+    np.fill_diagonal(sharing, 1.0)
+    return sharing.sum(axis=1)
 
 def similarity_function(fronts, evaluation_values, individuals, sigma_share, max_values, min_values):
     '''
@@ -1054,95 +2553,51 @@ def similarity_function(fronts, evaluation_values, individuals, sigma_share, max
 
     '''
     evaluation_values_f = evaluation_values.copy()
-    # evaluation_values_f_test = evaluation_values.copy()
-    ms = np.empty(np.unique(fronts).shape[0])
-    i=0
     for front in sorted(np.unique(fronts)):
         ind = np.array(np.where(fronts == front)).ravel()
 
-        dist_mat = np.zeros([ind.shape[0],ind.shape[0]],dtype = 'float') #  distance matrix of individuals belonging in the same frontier
-
         front_max_eval = np.max(evaluation_values_f[:-1,ind], axis = 1)
-        with open(output_folder + 'Evolutionary process/Pareto_highest_values.txt','a') as front_max_file:
-            front_max_file.write(f'Pareto: {front} \n {front_max_eval}\n\n')
-
-        for j in range(ind.shape[0]): # 0,1,2,3,4 (e.g. len(ind) = 5)
-            m = 0
-            for k in range(j,ind.shape[0]): # 0,1,2,3,4 | 1,2,3,4 | 2,3,4 | 3,4 | 4=X
-                d = 0
-                if j!=k:
-                    # for gene in range(individuals.shape[1]):
-                    for gene in range(parameters):
-                        d += ((individuals[ind[j],gene]-individuals[ind[k],gene])/float(max_values[gene]-min_values[gene]))**2
-                    d += ((individuals[ind[j],parameters:]-individuals[ind[k],parameters:])**2).sum()
-                    d = math.sqrt(d/individuals.shape[1])
-                    dist_mat[j,k] = dist_mat[k,j] = d
-                    if d<=sigma_share:
-                        m += 1-((d/sigma_share)**2)
-                else:
-                    m+=1
-            for p in range(j): # This is the lower-left part of the distance matrix we need to take into consideration for the m
-                if p!=j and dist_mat[j,p]<=sigma_share:
-                    m += (1-((dist_mat[j,p]/float(sigma_share))**2))
-            if m==0:
-                m=1
-            evaluation_values_f[:-1,ind[j]] = front_max_eval/m
-            ms[i] += m
-        ms[i] /= ind.shape[0]
-        if verbose: print(f'Mean m for frontier {front} ({ind.shape[0]}) = {ms[i]}')
-        i+=1
+        log_text(output_folder, 'Evolutionary process/Pareto_highest_values.txt', f'Pareto: {front} \n {front_max_eval}\n\n')
+
+        # Euclidean distance over all the genes: (a-b)^2 = a^2 + b^2 - 2ab for the feature genes
+        genes = individuals[ind,parameters:].astype(float)
+        squared = (genes**2).sum(axis=1)
+        d = _parameter_distances(individuals[ind], max_values, min_values)
+        d += np.maximum(squared[:,None]+squared[None,:]-2*(genes@genes.T), 0)
+        dist_mat = np.sqrt(d/individuals.shape[1]) #  distance matrix of individuals belonging in the same frontier
+
+        m = _sharing_counts(dist_mat, sigma_share)
+        evaluation_values_f[:-1,ind] = front_max_eval[:,None]/m
+        if verbose: print(f'Mean m for frontier {front} ({ind.shape[0]}) = {m.mean()}')
     return evaluation_values_f
 
-def similarity_function_rounded(fronts, evaluation_values, individuals, sigma_share, max_values, min_values):
+def similarity_function_rounded(fronts, evaluation_values, individuals, sigma_share, max_values, min_values, bits=None, to_log=True):
     '''
-    Calculates the distance between individuals in the same Pareto
+    Calculates the distance between individuals in the same Pareto. The distance of two individuals is the mean of
+    the normalized Euclidean distance of their parameters and the Jaccard distance (XOR/union) of their rounded genes.
+    The gene distances are popcounts on the bitset of packed_feature_genes() of the individuals (computed if not given).
+    With to_log=False the highest values of the fronts are not written (see apply_steady_state_process()).
     '''
     evaluation_values_f = evaluation_values.copy()
-    individuals_temp = individuals[:,parameters:].copy()
-    individuals_temp = individuals_temp.round()
-    ms = np.empty(np.unique(fronts).shape[0])
-    i=0
-    for i,front in enumerate(sorted(np.unique(fronts))):
+    if bits is None:
+        bits = packed_feature_genes(individuals)
+    for front in sorted(np.unique(fronts)):
         ind = np.argwhere(fronts == front).ravel()
-        dist_mat = np.zeros([ind.shape[0],ind.shape[0]],dtype = 'float') #  distance matrix of individuals belong in the same frontier
         front_max_eval = np.max(evaluation_values_f[:-1,ind], axis = 1)
-        with open(output_folder + 'Evolutionary process/Pareto_highest_values.txt','a') as front_max_file:
-            front_max_file.write(f'Pareto: {front} \n {front_max_eval}\n\n')
-        for j in range(ind.shape[0]): # 0,1,2,3,4 (e.g. len(ind) = 5)
-            m = 0
-            for k in range(j,ind.shape[0]): # 0,1,2,3,4 | 1,2,3,4 | 2,3,4 | 3,4 | 4=X
-                d = 0 # distance of genes
-                d_par = 0 # distance for parameters
-                if j!=k:
-                    for gene in range(parameters):
-                        d_par += ((individuals[ind[j],gene]-individuals[ind[k],gene])/float(max_values[gene]-min_values[gene]))**2
-                    d_par = math.sqrt(d_par/parameters)
-                    #d += np.logical_xor(individuals_temp[ind[j]],individuals_temp[ind[k]]).sum()
-                    #d = math.sqrt(d/individuals.shape[1])
-                    d += np.logical_xor(individuals_temp[ind[j]],individuals_temp[ind[k]]).sum() # XOR(gene_a,i,gene_b,i)
-                    n_union = np.union1d(np.argwhere(individuals_temp[ind[j]]==1),np.argwhere(individuals_temp[ind[k]]==1)).shape[0]# #N_union
-                    if n_union > 0: #there is at least 1 gene active in any of the chromosomes
-                        d /= n_union
-
-                    d += d_par
-                    d /= 2.0
-
-                    dist_mat[j,k] = dist_mat[k,j] = d
-                    if d<=sigma_share:
-                        m += 1-((d/sigma_share)**2)
-                else:
-                    m+=1
-            for p in range(j): # This is the lower-left part of the distance matrix we need to take into consideration for the m
-                if p!=j and dist_mat[j,p]<=sigma_share:
-                    m += (1-((dist_mat[j,p]/float(sigma_share))**2))
-
-            if m==0:
-                m=1
-
-            evaluation_values_f[:-1,ind[j]] = front_max_eval/m
-            ms[i] += m
-        ms[i] /= ind.shape[0]
-        if verbose: print(f'Mean m for frontier {front} ({ind.shape[0]}) = {ms[i]}')
+        if to_log:
+            log_text(output_folder, 'Evolutionary process/Pareto_highest_values.txt', f'Pareto: {front} \n {front_max_eval}\n\n')
+
+        d_par = np.sqrt(_parameter_distances(individuals[ind], max_values, min_values)/parameters) # distance for parameters
+
+        n_xor = xor_distances(bits[ind]).astype(float) # XOR(gene_a,i,gene_b,i)
+        n_active = popcount(bits[ind])
+        n_union = (n_active[:,None]+n_active[None,:]+n_xor)/2 # N_union = |A|+|B|-|A AND B|
+        d = np.divide(n_xor, n_union, out=n_xor.copy(), where=n_union>0) # there is at least 1 gene active in any of the chromosomes
+        dist_mat = (d+d_par)/2.0 #  distance matrix of individuals belong in the same frontier
+
+        m = _sharing_counts(dist_mat, sigma_share)
+        evaluation_values_f[:-1,ind] = front_max_eval[:,None]/m
+        if verbose and to_log: print(f'Mean m for frontier {front} ({ind.shape[0]}) = {m.mean()}')
     return evaluation_values_f
 
 
@@ -1150,48 +2605,43 @@ def similarity_function_rounded(fronts, evaluation_values, individuals, sigma_sh
 def apply_evolutionary_process(generations, population, max_values, min_values, two_points_crossover_probability,
 								arithmetic_crossover_probability, mutation_probability,dataset,
 								labels, individuals, goal_significances, num_of_folds, classification_problems,  output_folder,
-								JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, eval_names, multiclass=True, verbose=False, to_plot=False):
+								JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, eval_names, multiclass=True, verbose=False, to_plot=False, n_jobs=1,
+								fitness_cache=None, cv_seed=None, shared_dataset=None, rng=None, fs_masks=None, binned=False, dmatrix_pool=None, racing_folds=0,
+								checkpoint_every=0, checkpoint=None, migration=None, pareto_archive=None, model_store=None, evaluation_pool=None):
 
     max_eval_per_generation = np.empty(generations)
     average_eval_per_generation = np.empty(generations)
     sum_ranked_eval_per_generation = np.empty(generations)
     selected_individuals = np.empty((population, min_values.shape[0]))
 
+    # Continue a run from the checkpoint of its last completed generation
+    start_generation = 0
+    if checkpoint is not None:
+        start_generation = checkpoint['generation']
+        max_eval_per_generation[:start_generation] = checkpoint['max_eval_per_generation'][:start_generation]
+        average_eval_per_generation[:start_generation] = checkpoint['average_eval_per_generation'][:start_generation]
+        sum_ranked_eval_per_generation[:start_generation] = checkpoint['sum_ranked_eval_per_generation'][:start_generation]
+        restore_random_states(checkpoint['random_states'], rng)
 
-    for rep in range(generations):
+    for rep in range(start_generation, generations):
         if verbose: print(f'Generation {rep}')
-        out_vars = []#dummy_variable = []
-        out_vars2 = []
-        for gene in individuals:
-            out_vars.append(np.argwhere(gene[parameters:]>0.5).ravel())
-            out_vars2.append(np.argwhere(gene>0.5).ravel())
+        # Active feature genes of the population for the feature writers, the log record and the distances of the niches
+        bits = packed_feature_genes(individuals)
+        out_vars = [active_genes(bits, i) for i in range(bits.shape[0])]
         if verbose: 
             print(f'Individual_0 has the following feature positions selected: {out_vars[0]}')
             print(f'Individual_0 has the following features selected: {feature_names[out_vars[0]]}')
 
-        with open(output_folder + 'Evolutionary process/Selected Features.txt','a') as feature_position_file:
-            feature_position_file.write(f'Generation {rep}:\n')
-            for i in range(len(out_vars)):
-                if out_vars[i].shape[0]==0:
-                    feature_position_file.write(f'Indiv_{i} -> None\n')
-                else:
-                    feature_position_file.write(f'Indiv_{i} -> {out_vars[i]}\n')
-            feature_position_file.write('-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\n\n')
-        
-        with open(output_folder + 'Evolutionary process/Selected Feature Names.txt','a') as feature_names_file:
-            feature_names_file.write(f'Generation {rep}:\n')
-            for i in range(len(out_vars)):
-                if out_vars[i].shape[0]==0:
-                    feature_names_file.write(f'Indiv_{i} -> None\n')
-                else:
-                    feature_names_file.write(f'Indiv_{i} -> {feature_names[out_vars[i]]}\n')
-            feature_names_file.write('-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\n\n')
+        # Record of the generation for the logs (see generation_log_texts()). Written at the end of the generation
+        record = {'generation': rep, 'active_genes': bits, 'n_features': individuals.shape[1]-parameters, 'eval_names': eval_names}
 
 
         #evaluate the population of solutions
         evaluation_values, mean_std_list, roc_auc_list, _ = evaluate_individuals(dataset, labels, individuals,
                                                                            goal_significances, num_of_folds, classification_problems,
-                                                                           output_folder, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, multiclass, verbose)
+                                                                           output_folder, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, multiclass, verbose, n_jobs,
+                                                                           fitness_cache, cv_seed, shared_dataset, fs_masks, binned, dmatrix_pool, racing_folds,
+                                                                           model_store, evaluation_pool)
 
         """
         evaluation_values:
@@ -1206,6 +2656,11 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
         """
         evaluation_values = np.array(evaluation_values)
 
+        if pareto_archive is not None: # The non-dominated individuals of all the generations
+            archive_insertions = pareto_archive.update(individuals, evaluation_values)
+            with RunLogText(output_folder, 'Evolutionary process/timing.txt') as time_file:
+                time_file.write(f'Pareto archive: {archive_insertions} individuals entered, {len(pareto_archive)} kept\n')
+
         #Keep "Best" and average metrics for each generation in files
 
         #find and write to file maximum and average performances
@@ -1219,31 +2674,17 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
         except:
             max_eval = evaluation_values[-1][best_indiv_pos]
 
-        with open(output_folder+'Evolutionary process/Index_of_best_individuals_per_metric.txt','a') as f:
-            f.write(f'Gen{rep}:\nOverall: {best_overall_indiv_pos}\tAUC: {best_auc_indiv_pos}\tbAcc: {best_bAcc_indiv_pos}\n\n')
+        if migration is not None: # The best individuals of the generation, before the niches
+            emigrants = individuals[np.argsort(-evaluation_values[-1], kind='stable')[:migration.n_migrants]].copy()
 
-        max_eval_per_generation[rep]=max_eval
-        with open(output_folder+"Evolutionary process/CV_best_performance.txt",'a') as bst_perf:
-            bst_perf.write(str(max_eval_per_generation[rep])+"\n")
+        record['best_indices'] = np.array([best_overall_indiv_pos, best_auc_indiv_pos, best_bAcc_indiv_pos]) # Overall, AUC, bAcc
+        record['evaluation_values'] = evaluation_values.copy()
+        record['best_mean_std'] = np.array(mean_std_list[best_indiv_pos], dtype=float)
+        record['best_genome'] = individuals[best_indiv_pos].copy()
 
+        max_eval_per_generation[rep]=max_eval
         average_eval = evaluation_values[:-1].mean()
         average_eval_per_generation[rep] = average_eval
-        with open(output_folder + "Evolutionary process/CV_average_performance.txt",'a') as avg_perf:
-            avg_perf.write(str(average_eval_per_generation[rep])+"\n")
-        #average_performance_fid.write(str(average_eval_per_generation[rep])+"\n")
-
-        with open(output_folder + 'Evolutionary process/Best_solutions_metrics.txt','a') as best_evals:
-            best_evals.write(f'Generation: {rep}\n')
-            for i in range(eval_names.shape[0]):
-                best_evals.write(str(eval_names[i])+':\t'+str(mean_std_list[best_indiv_pos][i][0])+u" \u00B1 "+str(mean_std_list[best_indiv_pos][i][1])+'\n')
-            best_evals.write('Unweighted overall :\t'+str(evaluation_values[:-1,best_indiv_pos].mean())+'\n\n')
-
-        #########
-
-        with open(output_folder+'Evolutionary process/Overall_score_mean_std_per_generation.txt','a') as mean_std_file:
-            for i,element in enumerate(mean_std_list[best_indiv_pos]):
-                mean_std_file.write(f'{str(eval_names[i])}: {element[0]}'+u" \u00B1 "+f'{element[-1]}'+'\n')
-            mean_std_file.write('\n')
             
         if to_plot:
             plt.title('Receiver Operating Characteristic')
@@ -1284,16 +2725,7 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
 
         ##############
 
-        with open(output_folder+'Evolutionary process/Avg_solutions_metrics.txt','a') as avg_evals:
-            avg_evals.write(f'Generation: {rep}\n')
-            for i in range(eval_names.shape[0]):
-                avg_evals.write(str(eval_names[i])+':\t'+str(evaluation_values[i].mean())+u" \u00B1 "+str(np.std(evaluation_values[i]))+'\n')
-                #avg_evals.write(str(eval_names[i])+':\t'+str(evaluation_values[i].mean())+'\n')
-            avg_evals.write('Evolutionary process/Unweighted overall :\t'+str(evaluation_values[:-1].mean())+'\n\n')
-
-
         average_performance = evaluation_values[:-1].mean()#np.average(evaluation_values[-1,:])
-        best_performance = np.max(evaluation_values[:-1].mean(axis=0))#np.max(evaluation_values[-1])
 
 
         if average_performance == 0:
@@ -1302,31 +2734,23 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
             if verbose: print(f'Evolutionary process/Average performance: {average_performance}')
 
         #Convergence criterion is checked in order to stop the evolution if the population is deemd us converged
-        with open(output_folder + 'Evolutionary process/Convergence.txt','a') as f:
-            f.write(f'Generation {rep}\nConvergenve = {math.fabs(evaluation_values[:-1,0].mean()-average_performance)}\n')
-            f.write(f'Convergence Percentage = {math.fabs(best_performance - average_performance)/best_performance}\n\n')
-            #f.write(f'Convergence Percentage = {math.fabs(evaluation_values[:-1,0].mean()-average_performance)/best_performance}\n\n')
-            #f.write(f'Convergence Percentage = {math.fabs(evaluation_values[:-1,0].sum()-average_performance)/average_performance}\n\n')
-
         if math.fabs(evaluation_values[-1,0]-average_performance)<10E-4*average_performance: #Check if the 'Best' individual is almost equal to average
             #premature_termination=1
             if verbose: print('Premature termination!')
+            log_generation(output_folder, record)
             break
 
 
         Pareto_time_start = time.time()
         #Estimate non dominated fronts (Pareto fronts)
         fronts = pareto_frontiers(evaluation_values)
-
-        with open(output_folder + 'Evolutionary process/Pareto_fronts.txt','a') as pfronts:
-            pfronts.write(f'Generation: {rep}\n')
-            for i in np.sort(np.unique(fronts)):
-                pfronts.write(f'Pareto {i}: {np.argwhere(fronts==i).squeeze()}\n')
-            pfronts.write('\n')
+        record['fronts'] = fronts
+        if model_store is not None: # Only the boosters of the first front are kept
+            model_store.retain(np.flatnonzero(fronts == 1))
 
         #print(fronts)
         Pareto_time_stop = time.time()
-        with open(output_folder + 'Evolutionary process/timing.txt','a') as time_file:
+        with RunLogText(output_folder, 'Evolutionary process/timing.txt') as time_file:
             time_file.write(f'Generation: {rep}\nPareto frontier operation took: {Pareto_time_stop-Pareto_time_start}\n')
 
         pareto_distance_time_start = time.time()
@@ -1340,7 +2764,7 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
         # Use the rounded version aka XOR distance between individual solutions
         # evaluation_values_1 = similarity_function_rounded(fronts, evaluation_values, individuals, sigma_share, max_values, min_values)
         # Normal gene - gene distance between individual solutions
-        evaluation_values_1 = similarity_function_rounded(fronts, evaluation_values, individuals, sigma_share, max_values, min_values)
+        evaluation_values_1 = similarity_function_rounded(fronts, evaluation_values, individuals, sigma_share, max_values, min_values, bits)
 
         evaluation_values = evaluation_values_1.copy()
 
@@ -1351,7 +2775,7 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
             evaluation_values[-1,i] = (np.multiply(evaluation_values[:-1,i],goal_significances.T).sum())/n_eval_values
 
         pareto_distance_time_stop = time.time()
-        with open(output_folder + 'Evolutionary process/timing.txt','a') as time_file:
+        with RunLogText(output_folder, 'Evolutionary process/timing.txt') as time_file:
             time_file.write(f'Calculating the similarities of Niches / pareto frontiers (m) took: {pareto_distance_time_stop - pareto_distance_time_start}\n')
             time_file.write(f'# of fronts:{list(set(fronts))}\n')
 
@@ -1360,22 +2784,7 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
         # NEW Generation preparation
         selected_individuals[0]=individuals[best_indiv_pos] # The individual with the highest overall_score before niches
 
-        # Keep the parameter values and the Activated genes of the 'Best'/0-th individual in a file
-        on_genes_indx = np.arange(individuals[best_indiv_pos,parameters:].shape[0])[individuals[best_indiv_pos,parameters:]>0.5]
-        with open(output_folder + "Evolutionary process/best_solutions_active_genes.txt",'a') as best_solutions_fid:
-            best_solutions_fid.write('Generation: '+str(rep)+'\n')
-            best_solutions_fid.write(str(individuals[best_indiv_pos,np.append(np.arange(parameters),parameters+on_genes_indx)])+"\n")
-            best_solutions_fid.write('Active Features: '+str(on_genes_indx)+'\n\n')
-
-
-        # Keep the parameter values and all the non-zero genes of the 'Best'/0-th individual in a file
-        on_genes_indx = np.arange(individuals[best_indiv_pos,parameters:].shape[0])[individuals[best_indiv_pos,parameters:]>0]
-        with open(output_folder + "Evolutionary process/best_solutions_all_nonzero_genes.txt",'a') as best_solutions_all_fid:
-            best_solutions_all_fid.write('Generation: '+str(rep)+'\n')
-            best_solutions_all_fid.write(str(individuals[best_indiv_pos,np.append(np.arange(parameters),parameters+on_genes_indx)])+"\n")
-            best_solutions_all_fid.write('All non-zero Features: '+str(on_genes_indx)+'\n\n')
-
-
+        # The parameter values and the Activated / non-zero genes of the 'Best'/0-th individual are kept from record['best_genome']
 
         preparation_for_crossover_time_start = time.time()
         sum_ranked = evaluation_values[-1].sum() # Find the sum of overall scores for all individuals
@@ -1391,24 +2800,23 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
                 sum_change[i-1] = (evaluation_values[-1,i-1]/float(sum_ranked_eval_per_generation[rep])) #17/11/2020
 
 
-        with open(output_folder + 'Evolutionary process/Roulette_change.txt','a') as roulette:
-            roulette.write(f'Generation {rep}\n{sum_change}\n')
+        record['sum_change'] = sum_change
 
 
         # Roulette is based on the sum_change not the sum_prop. Essentially it is the probability of a solution to be selected
         # From 100 s=individuals pick 99 with Pr(i) = sum_change[i]. With replacement (can pick the same solution more than once)
-        sel_indx = np.random.choice(a=population, size=population-1, replace=True, p=sum_change)
+        if rng is not None:
+            sel_indx = rng.choice(a=population, size=population-1, replace=True, p=sum_change)
+        else:
+            sel_indx = np.random.choice(a=population, size=population-1, replace=True, p=sum_change)
         for i in range(population-1):
             selected_individuals[i+1] = individuals[sel_indx[i]]
 
-        # Save the selected indices in a file
-        with open(output_folder + 'Evolutionary process/selected_indiv_index.txt','a') as Sel_ind:
-            Sel_ind.write(f'Generation {rep}\nIndividual indices selected: {str(sel_indx)}\n-------\n')
-
-
+        # Save the selected indices in the record
+        record['sel_indx'] = sel_indx
 
         preparation_for_crossover_time_stop = time.time()
-        with open(output_folder + 'Evolutionary process/timing.txt','a') as time_file:
+        with RunLogText(output_folder, 'Evolutionary process/timing.txt') as time_file:
             time_file.write(f'Preparation_for_crossover_time = {preparation_for_crossover_time_stop - preparation_for_crossover_time_start}\n')
 
 
@@ -1416,74 +2824,102 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
         cross_over_time_start = time.time()
 
 
-        for i in range(1,population-1,2):
-            random_number = np.random.uniform(size=population-1) #crete an array of random numbers that is used to activate the cross-over of a pair of individuals or not
-            if random_number[i]<=two_points_crossover_probability:
-                #print("Two Point Crossover")
-                cross_point1=0
-                cross_point2=0
-                while cross_point1==cross_point2:
-                    cross_point1=math.ceil((individuals[0].shape[0]-parameters)*np.random.uniform(0,1))
-                    if cross_point1<math.floor((2*individuals[0].shape[0]-1)/3):
-                        width=math.ceil((math.floor(individuals[0].shape[0]-1)/3 -2)*np.random.uniform(0,1))
-                        cross_point2=cross_point1+width
-                    else:
-                        width=math.ceil(np.random.uniform(0,1)*(math.floor(individuals[0].shape[0]/3 -1)-2-(cross_point1-math.floor(2*individuals[0].shape[0]/3))))
-                        cross_point2=cross_point1+width
-                if cross_point1>cross_point2:
-                    temp_cross_point=cross_point1
-                    cross_point1=cross_point2
-                    cross_point2=temp_cross_point
-
-                cross_point1=int(cross_point1)
-                cross_point2=int(cross_point2)
-
-                with open(output_folder + 'Evolutionary process/Mutation_points.txt', 'a') as tf:
+        if rng is not None:
+            selected_individuals, two_points_log, arithmetic_log = crossover_population(selected_individuals, two_points_crossover_probability,
+                                                                                        arithmetic_crossover_probability, rng)
+            with RunLogText(output_folder, 'Evolutionary process/Mutation_points.txt') as tf:
+                for i, cross_point1, cross_point2, width in two_points_log:
                     tf.write(f'Indiv_{i}, Indiv_{i+1} --> cross_point1: {cross_point1}, cross_point2: {cross_point2}, width: {width}'+'\n')
+            if arithmetic_log:
+                with RunLogText(output_folder, 'Evolutionary process/Arithmetic_Mutations.txt') as tf:
+                    for i, alpha in arithmetic_log:
+                        tf.write(f"Generation: {rep}:\n Indiv_{i}, Indiv_{i+1} --> alpha = {alpha} => CH1 = alpha*A + (1-alpha)*B , CH2 = (1-alpha)*A + alpha*B"+'\n')
+        else:
+            for i in range(1,population-1,2):
+                random_number = np.random.uniform(size=population-1) #crete an array of random numbers that is used to activate the cross-over of a pair of individuals or not
+                if random_number[i]<=two_points_crossover_probability:
+                    #print("Two Point Crossover")
+                    cross_point1=0
+                    cross_point2=0
+                    while cross_point1==cross_point2:
+                        cross_point1=math.ceil((individuals[0].shape[0]-parameters)*np.random.uniform(0,1))
+                        if cross_point1<math.floor((2*individuals[0].shape[0]-1)/3):
+                            width=math.ceil((math.floor(individuals[0].shape[0]-1)/3 -2)*np.random.uniform(0,1))
+                            cross_point2=cross_point1+width
+                        else:
+                            width=math.ceil(np.random.uniform(0,1)*(math.floor(individuals[0].shape[0]/3 -1)-2-(cross_point1-math.floor(2*individuals[0].shape[0]/3))))
+                            cross_point2=cross_point1+width
+                    if cross_point1>cross_point2:
+                        temp_cross_point=cross_point1
+                        cross_point1=cross_point2
+                        cross_point2=temp_cross_point
+
+                    cross_point1=int(cross_point1)
+                    cross_point2=int(cross_point2)
 
+                    log_text(output_folder, 'Evolutionary process/Mutation_points.txt',
+                             f'Indiv_{i}, Indiv_{i+1} --> cross_point1: {cross_point1}, cross_point2: {cross_point2}, width: {width}'+'\n')
 
-                # Create the children for the next generation
-                temp_cross_over = selected_individuals[i+1, parameters+cross_point1:parameters+cross_point2].copy()
-                selected_individuals[i+1, parameters+cross_point1:parameters+cross_point2] = selected_individuals[i, parameters+cross_point1:parameters+cross_point2].copy()
-                selected_individuals[i, parameters+cross_point1:parameters+cross_point2] = temp_cross_over.copy()
 
-            elif random_number[i]>two_points_crossover_probability and random_number[i]<(two_points_crossover_probability+arithmetic_crossover_probability):
-                alpha=np.random.uniform(0,1)
+                    # Create the children for the next generation
+                    temp_cross_over = selected_individuals[i+1, parameters+cross_point1:parameters+cross_point2].copy()
+                    selected_individuals[i+1, parameters+cross_point1:parameters+cross_point2] = selected_individuals[i, parameters+cross_point1:parameters+cross_point2].copy()
+                    selected_individuals[i, parameters+cross_point1:parameters+cross_point2] = temp_cross_over.copy()
 
-                child1 = alpha*selected_individuals[i] + (1-alpha)*selected_individuals[i+1]
-                child2 = (1-alpha)*selected_individuals[i] + alpha*selected_individuals[i+1]
+                elif random_number[i]>two_points_crossover_probability and random_number[i]<(two_points_crossover_probability+arithmetic_crossover_probability):
+                    alpha=np.random.uniform(0,1)
 
-                selected_individuals[i] = child1
-                selected_individuals[i+1] = child2
-                with open(output_folder + 'Evolutionary process/Arithmetic_Mutations.txt', 'a') as tf:
-                    tf.write(f"Generation: {rep}:\n Indiv_{i}, Indiv_{i+1} --> alpha = {alpha} => CH1 = alpha*A + (1-alpha)*B , CH2 = (1-alpha)*A + alpha*B"+'\n')
+                    child1 = alpha*selected_individuals[i] + (1-alpha)*selected_individuals[i+1]
+                    child2 = (1-alpha)*selected_individuals[i] + alpha*selected_individuals[i+1]
+
+                    selected_individuals[i] = child1
+                    selected_individuals[i+1] = child2
+                    log_text(output_folder, 'Evolutionary process/Arithmetic_Mutations.txt',
+                             f"Generation: {rep}:\n Indiv_{i}, Indiv_{i+1} --> alpha = {alpha} => CH1 = alpha*A + (1-alpha)*B , CH2 = (1-alpha)*A + alpha*B"+'\n')
 
         cross_over_time_stop = time.time()
-        with open(output_folder + 'Evolutionary process/timing.txt','a') as time_file:
+        with RunLogText(output_folder, 'Evolutionary process/timing.txt') as time_file:
             time_file.write(f'Cross over time = {cross_over_time_stop - cross_over_time_start}\n')
 
 
         # Αpply mutation operator
         mutation_time_start = time.time()
-        with open(output_folder + 'Evolutionary process/Mutation_points.txt', 'a') as tf:
-            tf.write(f'Generation: {rep}'+'\n')
+        log_text(output_folder, 'Evolutionary process/Mutation_points.txt', f'Generation: {rep}'+'\n')
 
-        sele_indivs = mutation(selected_individuals, population, min_values, max_values, mutation_probability, generations, rep, mu=0, s=0.1)
+        if rng is not None:
+            sele_indivs = mutate_population(selected_individuals, min_values, max_values, mutation_probability, generations, rep, rng, mu=0, s=0.1)
+        else:
+            sele_indivs = mutation(selected_individuals, population, min_values, max_values, mutation_probability, generations, rep, mu=0, s=0.1)
 
         mutation_time_stop = time.time()
-        with open(output_folder + 'Evolutionary process/timing.txt','a') as time_file:
+        with RunLogText(output_folder, 'Evolutionary process/timing.txt') as time_file:
             time_file.write(f'Mutation took = {mutation_time_stop - mutation_time_start}\n')
 
 
         # Update the population with the offspings
         individuals = sele_indivs.copy()
 
+        if migration is not None and rep+1 < generations:
+            individuals = migration.exchange(rep, individuals, emigrants)
+
         # Inform the user for the new "Best" solution
         if best_indiv_pos==0:
             if verbose: print('Individual_0 is the best solution again!')
         else:
             if verbose: print(f'Individual_{best_indiv_pos} is the New best solution')
 
+        log_generation(output_folder, record)
+
+        if checkpoint_every > 0 and ((rep+1) % checkpoint_every == 0 or rep+1 == generations):
+            save_checkpoint(output_folder, {'generation': rep+1, 'population': population, 'generations': generations, 'num_of_folds': num_of_folds,
+                                            'individuals': individuals, 'fitness_cache': fitness_cache,
+                                            'max_eval_per_generation': max_eval_per_generation,
+                                            'average_eval_per_generation': average_eval_per_generation,
+                                            'sum_ranked_eval_per_generation': sum_ranked_eval_per_generation,
+                                            'random_states': get_random_states(rng), 'pareto_archive': pareto_archive,
+                                            'FS_genes': (JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes)})
+
+    record_output_file(output_folder, 'Evolutionary process/best_solution.txt')
     with open (output_folder + "Evolutionary process/best_solution.txt","a") as best_solution_fid:
         for gene in range(individuals.shape[1]):
             if gene < len(individuals[0])-1:
@@ -1494,10 +2930,342 @@ def apply_evolutionary_process(generations, population, max_values, min_values,
 
     return np.array(individuals)
 
+class SteadyStateRanking():
+    """
+    The Pareto fronts and the overall scores after the niches of the archive of apply_steady_state_process(), kept up
+    to date as children enter and individuals leave. The values are the ones pareto_frontiers() and
+    similarity_function_rounded() give for the whole archive, like in one generation of apply_evolutionary_process().
+
+    The dominance relations of the archive are kept in a matrix. The front of an individual is 1 + the highest front of
+    the individuals that dominate it, so a child changes only the fronts of the individuals it dominates and an
+    individual of the last front leaves without changing the other fronts. The niches are computed again only for the
+    fronts whose members changed. A child costs O(archive*objectives) for its dominance relations, O(affected*archive)
+    for the new fronts and the niches of the changed fronts, instead of the O(archive^2*objectives) of the whole ranking.
+
+    Attributes:
+        individuals: (ndarray) Archive X genes
+        evaluation_values: (ndarray) Eval_val X Archive
+        fronts: (ndarray) the Pareto front of every individual of the archive (see pareto_frontiers())
+        overall: (ndarray) the overall score of every individual after the niches
+    """
+
+    def __init__(self, individuals, evaluation_values, goal_significances, max_values, min_values):
+        self.individuals = np.array(individuals, dtype=float)
+        self.evaluation_values = np.array(evaluation_values, dtype=float)
+        self.goal_significances = goal_significances.reshape(-1,1)
+        self.max_values = max_values
+        self.min_values = min_values
+        self.sigma_share = 0.5/(float(self.individuals.shape[1])**(0.1))
+        objectives = self.evaluation_values[:-1]
+        self._dominates = dominance_matrix(objectives, objectives)
+        self.fronts = pareto_frontiers(self.evaluation_values)
+        self._shared = np.empty_like(objectives)
+        self._share(set(self.fronts.tolist()))
+
+    def _share(self, fronts):
+        # The niches of similarity_function_rounded() for the individuals of these fronts, then the overall scores of all the individuals
+        ind = np.flatnonzero(np.isin(self.fronts, list(fronts)))
+        if ind.shape[0]:
+            self._shared[:,ind] = similarity_function_rounded(self.fronts[ind], self.evaluation_values[:,ind], self.individuals[ind], self.sigma_share,
+                                                              self.max_values, self.min_values, to_log=False)[:-1]
+        self.overall = (self._shared*self.goal_significances).sum(axis=0)/self._shared.shape[0]
+
+    def _update_fronts(self, affected):
+        # New fronts of the affected individuals (in the order of their old fronts, so that their dominators are updated first). Returns the changed fronts
+        changed = set()
+        for j in affected[np.argsort(self.fronts[affected], kind='stable')]:
+            dominators = self._dominates[:,j]
+            front = self.fronts[dominators].max()+1 if dominators.any() else 1
+            if front != self.fronts[j]:
+                changed.update((int(self.fronts[j]), int(front)))
+                self.fronts[j] = front
+        return changed
+
+    def add(self, individual, evaluation_values):
+        '''
+        Adds an individual (the last one of the archive) with its evaluation values (Eval_val)
+        '''
+        objectives = self.evaluation_values[:-1]
+        new_objectives = np.asarray(evaluation_values, dtype=float)[:-1,None]
+        dominated_by = dominance_matrix(objectives, new_objectives)[:,0]
+        dominates = dominance_matrix(new_objectives, objectives)[0]
+        self.individuals = np.concatenate([self.individuals, np.asarray(individual, dtype=float)[None,:]])
+        self.evaluation_values = np.concatenate([self.evaluation_values, np.asarray(evaluation_values, dtype=float)[:,None]], axis=1)
+        self._dominates = np.block([[self._dominates, dominated_by[:,None]], [dominates[None,:], np.zeros((1,1), dtype=bool)]])
+        self.fronts = np.append(self.fronts, self.fronts[dominated_by].max()+1 if dominated_by.any() else 1)
+        self._shared = np.concatenate([self._shared, np.empty((self._shared.shape[0], 1))], axis=1)
+        self._share(self._update_fronts(np.flatnonzero(dominates)) | {int(self.fronts[-1])})
+
+    def remove(self, position):
+        '''
+        Removes the individual in this position of the archive
+        '''
+        affected = np.flatnonzero(self._dominates[position])
+        front = int(self.fronts[position])
+        kept = np.arange(self.individuals.shape[0]) != position
+        self.individuals, self.evaluation_values = self.individuals[kept], self.evaluation_values[:,kept]
+        self._dominates = self._dominates[kept][:,kept]
+        self.fronts, self._shared = self.fronts[kept], self._shared[:,kept]
+        self._share(self._update_fronts(affected - (affected > position)) | {front})
+
+def apply_steady_state_process(generations, population, max_values, min_values, two_points_crossover_probability,
+								arithmetic_crossover_probability, mutation_probability, dataset,
+								labels, individuals, goal_significances, num_of_folds, classification_problems, output_folder,
+								JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, multiclass=True, verbose=False, n_jobs=1,
+								fitness_cache=None, cv_seed=None, shared_dataset=None, rng=None, fs_masks=None, binned=False, dmatrix_pool=None,
+								pareto_archive=None):
+    '''
+    Steady-state version of apply_evolutionary_process() without the barrier at the end of every generation. The
+    population is an archive of population individuals. Every time a process of the pool is free, two parents are
+    picked from the archive with the roulette of the niches, their child (crossover and mutation of the vectorized
+    operators) is sent to the process and, when its evaluation returns, it takes the place of the individual of the
+    last Pareto front of the archive with the lowest overall score after the niches (the best individual is never
+    replaced). The fronts and the niches are updated for the affected individuals only (see SteadyStateRanking). The
+    evolution stops after (generations-1)*population children, as many evaluations as the generations.
+
+    The folds are the same for all the children (cv_seed, or one random state drawn at the start), so the children are
+    compared on the same cross validation. The archive depends on the order the evaluations return, so runs with
+    n_jobs > 1 are not reproducible.
+
+    Returns:
+        The individuals of the archive, the one with the highest overall score first
+    '''
+    if rng is None:
+        rng = np.random.default_rng(np.random.randint(2**31-1)) # The operators of the children are the vectorized ones
+    if fs_masks is None:
+        fs_masks = feature_selection_masks(min_values.shape[0]-parameters, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes)
+
+    # The archive starts from the evaluated initial population
+    evaluation_values, _, _, _ = evaluate_individuals(dataset, labels, individuals, goal_significances, num_of_folds, classification_problems,
+                                                      output_folder, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, multiclass, verbose, n_jobs,
+                                                      fitness_cache, cv_seed, shared_dataset, fs_masks, binned, dmatrix_pool)
+    individuals = np.array(individuals, dtype=float)
+    random_state = cv_seed if cv_seed is not None else np.random.randint(500)
+    if pareto_archive is not None:
+        pareto_archive.update(individuals, evaluation_values)
+    ranking = SteadyStateRanking(individuals, evaluation_values, goal_significances, max_values, min_values)
+
+    budget = (generations-1)*population
+    returned = queue.Queue() # Filled by the callbacks of the pool, in the order the evaluations end
+    initargs = _evaluation_pool_initargs(dataset, labels, num_of_folds, multiclass, verbose, n_jobs, shared_dataset, binned, dmatrix_pool)
+    start_time = time.time()
+    busy_time = 0.0
+    submitted = 0
+    received = 0
+    replaced = 0
+
+    def breed():
+        # Roulette of the niches over the archive, like the selection of apply_evolutionary_process()
+        overall = ranking.overall
+        p = overall/overall.sum() if overall.sum() > 0 else None
+        parents = np.empty((3, ranking.individuals.shape[1]))
+        parents[1:] = ranking.individuals[rng.choice(a=population, size=2, replace=True, p=p)]
+        parents, _, _ = crossover_population(parents, two_points_crossover_probability, arithmetic_crossover_probability, rng)
+        parents = mutate_population(parents, min_values, max_values, mutation_probability, generations, submitted//population, rng, mu=0, s=0.1)
+        return parents[1]
+
+    def submit(pool):
+        nonlocal submitted
+        child = breed()
+        filter_mask = filter_function(child[None,:], JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, verbose, fs_masks)[0]
+        key = FitnessCache.key(child, filter_mask, random_state, num_of_folds) if fitness_cache is not None else None
+        evaluation = fitness_cache.get(key) if fitness_cache is not None else None
+        if evaluation is not None:
+            returned.put((child, filter_mask, key, (evaluation, 0, 0, None), 0.0))
+        else:
+            submit_time = time.time()
+            pool.apply_async(_evaluate_in_worker, ((submitted, child, filter_mask, random_state, False),),
+                             callback=lambda result: returned.put((child, filter_mask, key, result, time.time()-submit_time)),
+                             error_callback=returned.put)
+        submitted += 1
+
+    with mp.Pool(processes=n_jobs, initializer=_init_evaluation_worker, initargs=initargs) as pool:
+        for _ in range(min(n_jobs, budget)):
+            submit(pool)
+        while received < budget:
+            item = returned.get()
+            if isinstance(item, BaseException):
+                raise item
+            child, filter_mask, key, (evaluation, hits, misses, _), evaluation_time = item
+            received += 1
+            busy_time += evaluation_time
+            if submitted < budget:
+                submit(pool) # Keep the process busy before the archive is updated
+            if fitness_cache is not None:
+                fitness_cache.put(key, evaluation)
+            if dmatrix_pool is not None:
+                dmatrix_pool.hits += hits
+                dmatrix_pool.misses += misses
+
+            # The child against the archive: the individual of the last front with the lowest score after the niches leaves
+            child_values, _ = evaluation_matrix([evaluation[0]], filter_mask[None,:], goal_significances)
+            if pareto_archive is not None:
+                pareto_archive.insert(child, child_values[:,0])
+            ranking.add(child, child_values[:,0])
+            candidate_overall = ranking.overall.copy()
+            candidate_overall[ranking.evaluation_values[-1].argmax()] = np.inf # The best individual stays
+            last_front = np.flatnonzero(ranking.fronts == ranking.fronts.max())
+            leaving = last_front[candidate_overall[last_front].argmin()]
+            ranking.remove(leaving)
+            if leaving != population:
+                replaced += 1
+            evaluation_values = ranking.evaluation_values
+
+            if received % population == 0 or received == budget:
+                elapsed = time.time()-start_time
+                with RunLogText(output_folder, 'Evolutionary process/timing.txt') as time_file:
+                    time_file.write(f'Steady state: {received} of {budget} children evaluated, {replaced} entered the archive, '
+                                    f'best overall score: {evaluation_values[-1].max()}, average performance: {evaluation_values[:-1].mean()}, '
+                                    f'{received/elapsed:.2f} children/s, use of the processes: {busy_time/(n_jobs*elapsed):.1%}\n')
+                if verbose: print(f'Steady state: {received} of {budget} children, best overall score: {evaluation_values[-1].max()}')
+
+    individuals, fronts = ranking.individuals, ranking.fronts
+    with RunLogText(output_folder, 'Evolutionary process/Pareto_fronts.txt') as pfronts:
+        pfronts.write('\nArchive of the steady state:\n')
+        for i in np.sort(np.unique(fronts)):
+            pfronts.write(f'Pareto {i}: {np.argwhere(fronts==i).squeeze()}\n')
+
+    order = np.argsort(-evaluation_values[-1], kind='stable')
+    individuals = individuals[order]
+    record_output_file(output_folder, 'Evolutionary process/best_solution.txt')
+    with open (output_folder + "Evolutionary process/best_solution.txt","a") as best_solution_fid:
+        best_solution_fid.write("\t".join(str(gene) for gene in individuals[0])+"\n")
+    return individuals
+
+class Migration():
+    """
+    Ring migration of an island of apply_island_model(). Every interval generations the island sends its n_migrants
+    best individuals to the next island and the individuals of the previous island replace the last individuals of
+    its new population (the order of the roulette selection is random and the elite individual is the first).
+    An island that ends its evolution sends None, so the next island does not wait for its migrants any more.
+
+    Attributes:
+        inbox: (mp.Queue) the migrants of the previous island
+        outbox: (mp.Queue) the inbox of the next island
+        interval: (int) the number of generations between two migrations
+        n_migrants: (int) the number of individuals that migrate
+    """
+
+    def __init__(self, inbox, outbox, interval, n_migrants):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.interval = interval
+        self.n_migrants = n_migrants
+        self.closed = False
+
+    def exchange(self, generation, individuals, emigrants):
+        if (generation+1) % self.interval != 0:
+            return individuals
+        self.outbox.put(emigrants)
+        if not self.closed:
+            immigrants = self.inbox.get()
+            if immigrants is None: # The previous island has ended its evolution
+                self.closed = True
+            else:
+                individuals[-immigrants.shape[0]:] = immigrants
+        return individuals
+
+    def close(self):
+        self.outbox.put(None)
+        self.outbox.cancel_join_thread() # The next island may have already ended without reading its last migrants
+
+def _run_island(island, island_seed, individuals, evolution_args, shared_dataset_info, island_globals, migration, results):
+    """
+    Runs apply_evolutionary_process() on the population of an island, in its own process and results directory
+    (Islands/Island_<island>/), and puts the last population of the island in results.
+    """
+    global parameters, feature_names, verbose, output_folder, run_log, available_cores
+    parameters, feature_names, verbose, available_cores, log_format, vectorized_operators = island_globals
+    output_folder = os.path.join(evolution_args['output_folder'], 'Islands', f'Island_{island}', '')
+    os.makedirs(output_folder + 'Evolutionary process', exist_ok=True)
+    random.seed(island_seed)
+    np.random.seed(island_seed)
+    rng = np.random.default_rng(island_seed) if vectorized_operators else None
+
+    shared_dataset = SharedDataset(name=shared_dataset_info[0], shape=shared_dataset_info[1])
+    run_log = RunLog(output_folder, log_format, feature_names, parameters)
+    evaluation_pool = open_evaluation_pool(None, evolution_args['labels'], evolution_args['num_of_folds'], evolution_args['multiclass'], verbose,
+                                           evolution_args['n_jobs'], shared_dataset, evolution_args['binned'], evolution_args['dmatrix_pool'])
+    try:
+        individuals = apply_evolutionary_process(**dict(evolution_args, dataset=shared_dataset.data.T, individuals=individuals, output_folder=output_folder,
+                                                        shared_dataset=shared_dataset, rng=rng, migration=migration, evaluation_pool=evaluation_pool))
+    finally:
+        if evaluation_pool is not None:
+            evaluation_pool.terminate()
+        migration.close()
+        run_log.close()
+        shared_dataset.close()
+    results.put((island, individuals, evolution_args.get('pareto_archive')))
+
+def island_evolution_args(evolution_args, islands):
+    '''
+    Returns the arguments of apply_evolutionary_process() of every island: the evaluation processes (n_jobs) and the
+    memory budget of the DMatrix pool are shared by the islands, and every island gets an empty FitnessCache,
+    DMatrixPool and ParetoArchive of its own (with the settings of the ones of evolution_args)
+    '''
+    fitness_cache, dmatrix_pool, pareto_archive = (evolution_args.get(name) for name in ('fitness_cache', 'dmatrix_pool', 'pareto_archive'))
+    return dict(evolution_args, n_jobs=max(1, evolution_args.get('n_jobs', 1)//islands),
+                fitness_cache=FitnessCache(fitness_cache.max_size) if fitness_cache is not None else None,
+                dmatrix_pool=DMatrixPool(dmatrix_pool.max_bytes//islands) if dmatrix_pool is not None else None,
+                pareto_archive=ParetoArchive(pareto_archive.max_size) if pareto_archive is not None else None)
+
+def apply_island_model(islands, migration_interval, n_migrants, individuals, evolution_args, shared_dataset, vectorized_operators=False, log_format='text'):
+    '''
+    Island model of the evolution. The individuals are split in islands sub-populations that evolve in parallel
+    processes with apply_evolutionary_process() (each with its own niches and roulette selection), and the best
+    individuals of every island migrate to the next island (ring) every migration_interval generations.
+    The cores of the machine, the evaluation processes and the memory of the DMatrix pool are shared by the islands
+    (see island_evolution_args()).
+
+    Args:
+        individuals: (ndarray) the initial individuals of all the islands, islands*population X genes
+        evolution_args: (dict) the other arguments of apply_evolutionary_process()
+        shared_dataset: the SharedDataset of the dataset. The islands attach to it
+        vectorized_operators: if True, every island uses the vectorized genetic operators with its own np.random.Generator
+    Returns:
+        The last populations of all the islands (in the order of the islands). The ParetoArchive of evolution_args
+        (if any) gets the archives of all the islands
+    '''
+    island_seeds = np.random.randint(2**31-1, size=islands).tolist() # One seed per island, drawn from the seeded np.random
+    island_globals = (parameters, feature_names, verbose, max(1, available_cpu_count()//islands), log_format, vectorized_operators)
+    island_args = island_evolution_args(evolution_args, islands)
+    inboxes = [mp.Queue() for _ in range(islands)]
+    results = mp.Queue()
+    processes = []
+    for island, island_individuals in enumerate(np.array_split(individuals, islands)):
+        migration = Migration(inboxes[island], inboxes[(island+1) % islands], migration_interval, n_migrants)
+        processes.append(mp.Process(target=_run_island, name=f'Island_{island}',
+                                    args=(island, island_seeds[island], island_individuals, island_args,
+                                          (shared_dataset.name, shared_dataset.shape), island_globals, migration, results)))
+    for process in processes:
+        process.start()
+
+    last_populations = {}
+    try:
+        while len(last_populations) < islands:
+            try:
+                island, island_individuals, island_archive = results.get(timeout=1)
+                last_populations[island] = island_individuals
+                if island_archive is not None: # Every island has an archive of its own
+                    evolution_args['pareto_archive'].merge(island_archive)
+            except queue.Empty:
+                failed = [process.name for process in processes if process.exitcode not in (None, 0)]
+                if failed:
+                    raise RuntimeError(f'The evolution of {", ".join(failed)} failed')
+    finally:
+        for process in processes:
+            if process.exitcode is None and len(last_populations) < islands:
+                process.terminate()
+            process.join()
+    return np.concatenate([last_populations[island] for island in range(islands)])
+
 def biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, min_values, max_values, population,
 								generations, two_points_crossover_probability=0.45, arithmetic_crossover_probability=0.45,
 								mutation_probability=0.05, goal_significances=None, num_of_folds=10, output_folder=None,
-								eval_names=None, missing_values_flag=True, normalize_flag=False, FS_calc=False, k_vals=[6,7], verbose=True, to_plot=False):
+								eval_names=None, missing_values_flag=True, normalize_flag=False, FS_calc=False, k_vals=[6,7], verbose=True, to_plot=False, n_jobs=1,
+								cache_size=0, cv_seed=None, rng=None, binned=False, dmatrix_pool_mb=0, racing_folds=0, checkpoint_every=0, resume=False,
+								islands=1, migration_interval=5, n_migrants=2, log_format='text', steady_state=False, archive_size=0,
+								model_store=False, export_bundle=False, preprocessing_cache=None, preprocessed=None):
     '''
     Main function of the MEvA-X tool that calls the other modules. Preprocessing steps and results are parts of this function
     Parameters:
@@ -1522,12 +3290,34 @@ def biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, m
         FS_calc [bool]: Selects if the Feature selection methods should be calculated or not
         k_vals [list of ints]: the k in the k-NN for the feature selection techniques
         verbose [bool]: Printing option selection. True prints less text
+        to_plot [bool]: If True, plot the ROC curves of the best solution of every generation
+        n_jobs [int]: Number of processes for the evaluation of the individuals
+        cache_size [int]: Maximum number of evaluations kept in the fitness cache. 0 disables the cache
+        cv_seed [int]: If not None, the folds of the cross validation are fixed for all the generations
+        rng [np.random.Generator]: If not None, the vectorized genetic operators are used with this random number generator
+        binned [bool]: Train the boosters of the evolution with the hist tree method on features binned once per fold plan. The evaluations are the ones of the hist tree method (see BinnedFolds)
+        dmatrix_pool_mb [float]: Memory budget (MB) of the DMatrix of the folds kept per feature subset. 0 disables the pool
+        racing_folds [int]: If 0 < racing_folds < num_of_folds, the individuals of the evolution are first trained on this number of folds and only the promising ones on all the folds
+        checkpoint_every [int]: Save a checkpoint of the evolution in output_folder/checkpoint.npz every this number of generations (see save_checkpoint()). 0 disables the checkpoints
+        resume [bool]: Continue the run of the output_folder from its checkpoint
+        islands [int]: Number of sub-populations (of size population) evolving in parallel processes. 1 for a single population
+        migration_interval [int]: Number of generations between two migrations of the best individuals of an island to the next one
+        n_migrants [int]: Number of individuals that migrate from an island
+        log_format [str]: Format of the logs of the islands ('text' or 'binary', see RunLog)
+        steady_state [bool]: Evolve the population with apply_steady_state_process() instead of generations
+        model_store [bool]: Keep the boosters of the cross validation of the first Pareto front in a ModelStore and reuse them in the majority voting. Not used with binned
+        export_bundle [bool]: Train the models of the first Pareto front on all the samples and write them with the normalization in Pareto_1_results/Bundle (see mevax_predict.py)
+        archive_size [int]: Keep up to this number of non-dominated individuals of all the generations in a ParetoArchive. They join the last population for the final Pareto front. 0 disables the archive
+        preprocessing_cache [str]: The folder of the cache entry (see save_preprocessed_dataset()) the imputed and normalized dataset is written to. None to not cache it
+        preprocessed [dict]: The cache entry of load_preprocessed_dataset(). The dataset is already imputed and normalized
     Return:
     -----------
     '''
     if verbose: print(f"Number of parameters = {parameters}")
     #original_dataset = dataset.copy() # Keep a acopy of the data just in case!
+    original_labels = labels
     unique_labels = list(set(labels)) # or use np.unique(labels) <-- <numpy.ndarray>
+    classes = np.unique(labels) # The original labels in the order of their numeric codes
     labels, unique_labels = transform_labels_to_numeric(labels,unique_labels)
     unique_labels = np.sort(unique_labels, axis=None)
 
@@ -1543,29 +3333,59 @@ def biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, m
                 goal_significances = np.delete(goal_significances,to_del)
         #goal_significances[-2]=0
 
-    # Impute missing values
-    if missing_values_flag:
-        dataset_with_missing_values = impute(labels,dataset)
-        dataset = dataset_with_missing_values.copy()
+    normalizer = None
+    if preprocessed is not None:
+        normalizer = preprocessed['normalizer'] # The dataset of the cache is already imputed and normalized
+    else:
+        # Impute missing values
+        if missing_values_flag:
+            dataset = impute(labels,dataset,n_jobs=n_jobs)
 
-    # Normalize data in scale [0,1]
-    if normalize_flag:
-        #dataset_normalized = normalize_dataset(dataset)
-        #dataset = dataset_normalized.copy()
-        dataset = normalize_dataset(dataset)
+        # Normalize data in scale [0,1]
+        if normalize_flag:
+            #dataset_normalized = normalize_dataset(dataset)
+            #dataset = dataset_normalized.copy()
+            dataset, normalizer = normalize_dataset(dataset, return_normalizer=True)
+
+        if preprocessing_cache is not None:
+            save_preprocessed_dataset(preprocessing_cache, dataset, feature_names, sample_names, original_labels, normalizer, verbose)
 
     classification_problems = create_different_classification_problems(labels, unique_labels)
 
     min_values = np.append(min_values, np.zeros(dataset.shape[0]))
     max_values = np.append(max_values, np.ones(dataset.shape[0]))
 
-    individuals = initialize_individuals(min_values, max_values, population)
+    if islands > 1 and resume:
+        raise ValueError('The runs with islands cannot be resumed')
+    if steady_state and (islands > 1 or resume):
+        raise ValueError('The steady state evolution cannot be used with islands or resumed')
+    if steady_state and (0 < racing_folds < num_of_folds or model_store):
+        raise ValueError('The steady state evolution evaluates every child on all the folds and keeps no boosters: it cannot be used with the racing or the model store')
+    if 0 < racing_folds < num_of_folds and model_store:
+        raise ValueError('The racing cannot be used with the model store: the eliminated individuals have no boosters for all the folds')
+    individuals = initialize_individuals(min_values, max_values, population*islands)
+
+    fitness_cache = FitnessCache(cache_size) if cache_size > 0 else None
+    dmatrix_pool = DMatrixPool(int(dmatrix_pool_mb*1024**2)) if dmatrix_pool_mb > 0 else None
+    pareto_archive = ParetoArchive(archive_size) if archive_size > 0 else None
+    model_store = ModelStore() if model_store and not binned else None # The boosters of the binned folds are not the final models
 
     if feature_names.shape[0]>200: n_features = 100
     else: n_features = feature_names.shape[0]//2
 
+    checkpoint = None
+    if resume:
+        checkpoint = load_checkpoint(output_folder, population, generations, num_of_folds)
+        individuals = checkpoint['individuals']
+        fitness_cache = checkpoint['fitness_cache']
+        pareto_archive = checkpoint['pareto_archive']
+        JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes = checkpoint['FS_genes']
+        if verbose: print(f"Resuming the evolution from generation {checkpoint['generation']}")
+
     # Calculate or import the genes with FS methods
-    if FS_calc:
+    if checkpoint is not None:
+        pass # The genes of the FS methods of the run are in the checkpoint
+    elif FS_calc:
         try:
             #FS_methods = mifs_calc(dataset, labels, k_vals=k_vals, n_features=n_features)
             JMI_genes = mifs_calc(dataset, labels, k_vals=k_vals, n_features=n_features, method='JMI')#FS_methods[:6]
@@ -1639,26 +3459,75 @@ def biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, m
             SelKBest_genes = None
 
 
-    individuals = apply_evolutionary_process(generations, population, max_values, min_values, two_points_crossover_probability,
-                                             arithmetic_crossover_probability, mutation_probability,dataset,
-                                             labels, individuals, goal_significances, num_of_folds, classification_problems,
-                                             output_folder, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, eval_names, multiclass, verbose, to_plot)
+    # The genes of every FS method and k are found once for all the generations
+    fs_masks = feature_selection_masks(min_values.shape[0]-parameters, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes)
 
-    evaluation_values, mean_std_list, roc_auc_list, N_trees = evaluate_individuals(dataset, labels, individuals, goal_significances, num_of_folds,
-                                                                                   classification_problems, output_folder, JMI_genes, Wilcoxon_genes,
-                                                                                   mRMR_genes, SelKBest_genes, multiclass, verbose)
+    # One Samples X Features copy of the dataset in shared memory for the processes of the evaluations of all the generations
+    shared_dataset = SharedDataset(dataset) if n_jobs > 1 or islands > 1 or steady_state else None
+    evaluation_pool = None # Kept for all the generations and the final evaluation (see open_evaluation_pool())
+    try:
+        if islands > 1:
+            evolution_args = dict(generations=generations, population=population, max_values=max_values, min_values=min_values,
+                                  two_points_crossover_probability=two_points_crossover_probability,
+                                  arithmetic_crossover_probability=arithmetic_crossover_probability, mutation_probability=mutation_probability,
+                                  labels=labels, goal_significances=goal_significances, num_of_folds=num_of_folds,
+                                  classification_problems=classification_problems, output_folder=output_folder, JMI_genes=JMI_genes,
+                                  Wilcoxon_genes=Wilcoxon_genes, mRMR_genes=mRMR_genes, SelKBest_genes=SelKBest_genes, eval_names=eval_names,
+                                  multiclass=multiclass, verbose=verbose, to_plot=to_plot, n_jobs=n_jobs, fitness_cache=fitness_cache,
+                                  cv_seed=cv_seed, fs_masks=fs_masks, binned=binned, dmatrix_pool=dmatrix_pool, racing_folds=racing_folds,
+                                  pareto_archive=pareto_archive)
+            individuals = apply_island_model(islands, migration_interval, n_migrants, individuals, evolution_args, shared_dataset,
+                                             rng is not None, log_format)
+        elif steady_state:
+            individuals = apply_steady_state_process(generations, population, max_values, min_values, two_points_crossover_probability,
+                                                     arithmetic_crossover_probability, mutation_probability, dataset,
+                                                     labels, individuals, goal_significances, num_of_folds, classification_problems,
+                                                     output_folder, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, multiclass, verbose, n_jobs,
+                                                     fitness_cache, cv_seed, shared_dataset, rng, fs_masks, binned, dmatrix_pool, pareto_archive)
+        else:
+            evaluation_pool = open_evaluation_pool(dataset, labels, num_of_folds, multiclass, verbose, n_jobs, shared_dataset, binned, dmatrix_pool)
+            individuals = apply_evolutionary_process(generations, population, max_values, min_values, two_points_crossover_probability,
+                                                     arithmetic_crossover_probability, mutation_probability,dataset,
+                                                     labels, individuals, goal_significances, num_of_folds, classification_problems,
+                                                     output_folder, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, eval_names, multiclass, verbose, to_plot, n_jobs,
+                                                     fitness_cache, cv_seed, shared_dataset, rng, fs_masks, binned, dmatrix_pool, racing_folds,
+                                                     checkpoint_every, checkpoint, pareto_archive=pareto_archive, model_store=model_store,
+                                                     evaluation_pool=evaluation_pool)
+
+        if pareto_archive is not None and len(pareto_archive):
+            # The non-dominated individuals of the previous generations compete with the last population
+            individuals = np.concatenate([individuals, pareto_archive.individuals])
+            _, first_copies = np.unique(individuals, axis=0, return_index=True)
+            individuals = individuals[np.sort(first_copies)]
+            with RunLogText(output_folder, 'Evolutionary process/timing.txt') as time_file:
+                time_file.write(f'Pareto archive: {len(pareto_archive)} individuals ({pareto_archive.insertions} insertions), '
+                                f'{individuals.shape[0]} individuals in the final population\n')
+
+        if evaluation_pool is None:
+            evaluation_pool = open_evaluation_pool(dataset, labels, num_of_folds, multiclass, verbose, n_jobs, shared_dataset, binned, dmatrix_pool)
+        evaluation_values, mean_std_list, roc_auc_list, N_trees = evaluate_individuals(dataset, labels, individuals, goal_significances, num_of_folds,
+                                                                                       classification_problems, output_folder, JMI_genes, Wilcoxon_genes,
+                                                                                       mRMR_genes, SelKBest_genes, multiclass, verbose, n_jobs,
+                                                                                       fitness_cache, cv_seed, shared_dataset, fs_masks, binned, dmatrix_pool,
+                                                                                       model_store=model_store, evaluation_pool=evaluation_pool)
+    finally:
+        if evaluation_pool is not None:
+            evaluation_pool.terminate()
+        if shared_dataset is not None:
+            shared_dataset.unlink() # Release the shared memory block even if the evolution fails
     evaluation_values = np.array(evaluation_values, dtype = float)
 
     #average_performance = np.mean(evaluation_values[-1])
     fronts = pareto_frontiers(evaluation_values)
 
-    with open(output_folder + 'Evolutionary process/Pareto_fronts.txt','a') as pfronts:
+    with RunLogText(output_folder, 'Evolutionary process/Pareto_fronts.txt') as pfronts:
         pfronts.write('\nLast Pareto:\n')
         for i in np.sort(np.unique(fronts)):
             pfronts.write(f'Pareto {i}: {np.argwhere(fronts==i).squeeze()}\n')
         pfronts.write('\n')
     
     # Write the same inforation in a file just for the last Pareto
+    record_output_file(output_folder, 'Pareto_fronts.txt')
     with open(output_folder + 'Pareto_fronts.txt','a') as pfronts:
         pfronts.write('Last Pareto:\n')
         for i in np.sort(np.unique(fronts)):
@@ -1680,7 +3549,7 @@ def biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, m
     if verbose: print(f'The indices of individuals in the 1st Pareto are: {pareto1_indx}')
     np.savetxt(output_folder+'Pareto_1_results/RAW_whole_Pareto_1_solutions.txt', delimiter=',', X=individuals[pareto1_indx],fmt='%.5f')
 
-    filter_mask = filter_function(individuals, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, verbose)
+    filter_mask = filter_function(individuals, JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes, verbose, fs_masks)
     #feature_matrix = np.tile(feature_names,(individuals.shape[0],1))
 
     for i,eval_name in enumerate(eval_names):
@@ -1697,12 +3566,19 @@ def biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, m
     ################# MAJORITY VOTING START #######################
 
     print('Full Pareto majority voting')
-    majority_voting(individuals, dataset, labels, filter_mask, pareto1_indx, num_of_folds, N_trees, multiclass, output_folder, par_type='full_pareto1', feature_names=feature_names, verbose=verbose)
+    majority_voting(individuals, dataset, labels, filter_mask, pareto1_indx, num_of_folds, N_trees, multiclass, output_folder, par_type='full_pareto1', feature_names=feature_names, verbose=verbose, n_jobs=n_jobs, model_store=model_store)
     print("Done!")
 
     print('Highest Pareto values majority voting')
-    majority_voting(individuals, dataset, labels, filter_mask, pareto1_indx[pareto1_maximums], num_of_folds, N_trees, multiclass, output_folder, par_type='top_pareto1', feature_names=feature_names, verbose=verbose)
+    majority_voting(individuals, dataset, labels, filter_mask, pareto1_indx[pareto1_maximums], num_of_folds, N_trees, multiclass, output_folder, par_type='top_pareto1', feature_names=feature_names, verbose=verbose, n_jobs=n_jobs, model_store=model_store)
     print("Done!")
+    if model_store is not None:
+        log_text(output_folder, 'timing.txt', f'Model store: {model_store.reused} models of the majority voting reused, {model_store.trained} trained\n')
+
+    if export_bundle:
+        manifest_path = export_pareto_bundle(output_folder + 'Pareto_1_results/Bundle/', individuals, dataset, labels, filter_mask, pareto1_indx,
+                                             N_trees, multiclass, feature_names, classes, normalizer, verbose)
+        print(f'The models of the first Pareto front are exported in: {os.path.dirname(manifest_path)}')
 
     ################# MAJORITY VOTING END #######################
 
@@ -1747,8 +3623,7 @@ def biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, m
     end_time = time.time()-prog_time
     msg = f'Program ended in : {end_time:.4} seconds or {end_time/60:.4} minutes\n'
     print(msg)
-    with open(output_folder + 'Evolutionary process/timing.txt','a') as time_file:
-        time_file.write(msg)
+    log_text(output_folder, 'Evolutionary process/timing.txt', msg)
 
     ##################################### Saving the variables #####################################
     if not os.path.exists(os.path.join(output_folder,'Variables')):
@@ -1762,6 +3637,389 @@ def biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, m
     
     print(f'The Results are saved in the directory: {os.path.abspath(output_folder)}')
 
+# The RunLog of the run. If None, the logs are appended to the text files directly
+run_log = None
+
+def log_text(output_folder, path, text):
+    '''
+    Appends text to a log file of the output folder (path is relative to the output folder), through the run_log if there is one
+    '''
+    if run_log is not None:
+        run_log.append(path, text)
+    else:
+        record_output_file(output_folder, path)
+        with open(output_folder + path, 'a') as f:
+            f.write(text)
+
+class RunLogText():
+    '''
+    File-like object for the "with" blocks that write a log file: the text is collected and given to log_text() at the end of the block
+    '''
+    def __init__(self, output_folder, path):
+        self.output_folder = output_folder
+        self.path = path
+        self._parts = []
+
+    def write(self, text):
+        self._parts.append(text)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        log_text(self.output_folder, self.path, ''.join(self._parts))
+        return False
+
+def log_generation(output_folder, record):
+    '''
+    Logs the record of a generation (see generation_log_texts()), through the run_log if there is one
+    '''
+    if run_log is not None:
+        run_log.write_generation(record)
+    else:
+        for path, text in generation_log_texts(record, feature_names, parameters).items():
+            record_output_file(output_folder, path)
+            with open(output_folder + path, 'a') as f:
+                f.write(text)
+
+def generation_log_texts(record, feature_names, n_parameters):
+    '''
+    Returns the text that the record of a generation adds to every per generation log file of the evolution.
+
+    The record keeps the arrays of the generation: the packed active genes of the population (active_genes,
+    n_features), the evaluation values, the positions of the best individuals (best_indices), the mean and std of
+    the metrics of the best individual (best_mean_std) and its genome (best_genome), the eval_names and, if the
+    generation was not the last one, the fronts, the probabilities of the roulette (sum_change) and the selected
+    individuals (sel_indx).
+    '''
+    rep = record['generation']
+    eval_names = record['eval_names']
+    evaluation_values = record['evaluation_values']
+    best_overall_indiv_pos, best_auc_indiv_pos, best_bAcc_indiv_pos = record['best_indices']
+    best_indiv_pos = best_overall_indiv_pos
+    best_mean_std = record['best_mean_std']
+    out_vars = [active_genes(record['active_genes'], i) for i in range(record['active_genes'].shape[0])]
+    texts = OrderedDict()
+
+    text = f'Generation {rep}:\n'
+    for i in range(len(out_vars)):
+        text += f'Indiv_{i} -> None\n' if out_vars[i].shape[0]==0 else f'Indiv_{i} -> {out_vars[i]}\n'
+    texts['Evolutionary process/Selected Features.txt'] = text + '-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\n\n'
+
+    text = f'Generation {rep}:\n'
+    for i in range(len(out_vars)):
+        text += f'Indiv_{i} -> None\n' if out_vars[i].shape[0]==0 else f'Indiv_{i} -> {feature_names[out_vars[i]]}\n'
+    texts['Evolutionary process/Selected Feature Names.txt'] = text + '-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\n\n'
+
+    texts['Evolutionary process/Index_of_best_individuals_per_metric.txt'] = f'Gen{rep}:\nOverall: {best_overall_indiv_pos}\tAUC: {best_auc_indiv_pos}\tbAcc: {best_bAcc_indiv_pos}\n\n'
+    texts['Evolutionary process/CV_best_performance.txt'] = str(evaluation_values[-1][best_indiv_pos])+"\n"
+    texts['Evolutionary process/CV_average_performance.txt'] = str(evaluation_values[:-1].mean())+"\n"
+
+    text = f'Generation: {rep}\n'
+    for i in range(eval_names.shape[0]):
+        text += str(eval_names[i])+':\t'+str(best_mean_std[i][0])+u" \u00B1 "+str(best_mean_std[i][1])+'\n'
+    texts['Evolutionary process/Best_solutions_metrics.txt'] = text + 'Unweighted overall :\t'+str(evaluation_values[:-1,best_indiv_pos].mean())+'\n\n'
+
+    text = ''
+    for i,element in enumerate(best_mean_std):
+        text += f'{str(eval_names[i])}: {element[0]}'+u" \u00B1 "+f'{element[-1]}'+'\n'
+    texts['Evolutionary process/Overall_score_mean_std_per_generation.txt'] = text + '\n'
+
+    text = f'Generation: {rep}\n'
+    for i in range(eval_names.shape[0]):
+        text += str(eval_names[i])+':\t'+str(evaluation_values[i].mean())+u" \u00B1 "+str(np.std(evaluation_values[i]))+'\n'
+    texts['Evolutionary process/Avg_solutions_metrics.txt'] = text + 'Evolutionary process/Unweighted overall :\t'+str(evaluation_values[:-1].mean())+'\n\n'
+
+    average_performance = evaluation_values[:-1].mean()
+    best_performance = np.max(evaluation_values[:-1].mean(axis=0))
+    texts['Evolutionary process/Convergence.txt'] = (f'Generation {rep}\nConvergenve = {math.fabs(evaluation_values[:-1,0].mean()-average_performance)}\n'
+                                                     f'Convergence Percentage = {math.fabs(best_performance - average_performance)/best_performance}\n\n')
+    if 'fronts' not in record: # Premature termination
+        return texts
+
+    fronts = record['fronts']
+    text = f'Generation: {rep}\n'
+    for i in np.sort(np.unique(fronts)):
+        text += f'Pareto {i}: {np.argwhere(fronts==i).squeeze()}\n'
+    texts['Evolutionary process/Pareto_fronts.txt'] = text + '\n'
+
+    best_genome = record['best_genome']
+    on_genes_indx = out_vars[best_indiv_pos]
+    texts['Evolutionary process/best_solutions_active_genes.txt'] = ('Generation: '+str(rep)+'\n'+
+                                                                     str(best_genome[np.append(np.arange(n_parameters),n_parameters+on_genes_indx)])+"\n"+
+                                                                     'Active Features: '+str(on_genes_indx)+'\n\n')
+    on_genes_indx = np.arange(best_genome[n_parameters:].shape[0])[best_genome[n_parameters:]>0]
+    texts['Evolutionary process/best_solutions_all_nonzero_genes.txt'] = ('Generation: '+str(rep)+'\n'+
+                                                                          str(best_genome[np.append(np.arange(n_parameters),n_parameters+on_genes_indx)])+"\n"+
+                                                                          'All non-zero Features: '+str(on_genes_indx)+'\n\n')
+
+    texts['Evolutionary process/Roulette_change.txt'] = f'Generation {rep}\n{record["sum_change"]}\n'
+    texts['Evolutionary process/selected_indiv_index.txt'] = f'Generation {rep}\nIndividual indices selected: {str(record["sel_indx"])}\n-------\n'
+    return texts
+
+class RunLog():
+    """
+    Log of a run. With the "text" format the per generation log files of the evolution are written at the end of every
+    generation. With the "binary" format the logs go to the run_log directory of the results directory instead, as
+    NumPy .npz files without pickled objects:
+        header.npz: feature_names and parameters (the number of parameter genes)
+        generation_<generation>.npz: the arrays of the record of the generation (GENERATION_FIELDS, and OPTIONAL_FIELDS if the
+                                     generation was not the last one, see generation_log_texts()) and the lines of the other logs
+                                     (timing, crossover points, ...) of the generation as event_paths and event_texts
+        end.npz: event_paths and event_texts of the logs written after the last generation
+    A background thread writes the files, with at most max_pending records waiting. Every file is written in a
+    temporary file and then renamed, so a file cut by a crash is never read. export_run_log() writes the text files
+    of a binary log.
+
+    Attributes:
+        output_folder: the output folder of the run
+        log_format: "text" or "binary"
+    """
+    DIRNAME = 'run_log'
+    GENERATION_FIELDS = ('generation', 'n_features', 'active_genes', 'eval_names', 'evaluation_values', 'best_indices', 'best_mean_std', 'best_genome')
+    OPTIONAL_FIELDS = ('fronts', 'sum_change', 'sel_indx')
+
+    def __init__(self, output_folder, log_format='text', feature_names=None, n_parameters=None, max_pending=16):
+        if log_format not in ('text', 'binary'):
+            raise ValueError(f'Unknown log format: {log_format}')
+        self.output_folder = output_folder
+        self.log_format = log_format
+        self.feature_names = feature_names
+        self.n_parameters = n_parameters
+        self._events = []
+        if log_format == 'binary':
+            self.folder = os.path.join(output_folder, self.DIRNAME)
+            os.makedirs(self.folder, exist_ok=True)
+            self._queue = queue.Queue(maxsize=max_pending)
+            self._error = None
+            self._writer = threading.Thread(target=self._write_records, name='RunLog writer', daemon=True)
+            self._writer.start()
+            if not os.path.isfile(os.path.join(self.folder, 'header.npz')):
+                self._put(('header.npz', {'feature_names': np.asarray(feature_names, dtype=str), 'parameters': np.array(n_parameters)}))
+
+    def _write_records(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    return
+                if self._error is None:
+                    name, arrays = record
+                    path = os.path.join(self.folder, name)
+                    with open(path + '.tmp', 'wb') as f:
+                        np.savez(f, **arrays)
+                    os.replace(path + '.tmp', path)
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _put(self, record):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(record) # Waits if max_pending records are waiting
+
+    def _event_arrays(self):
+        arrays = {'event_paths': np.array([path for path, _ in self._events], dtype=str),
+                  'event_texts': np.array([text for _, text in self._events], dtype=str)}
+        self._events = []
+        return arrays
+
+    def append(self, path, text):
+        if self.log_format == 'text':
+            record_output_file(self.output_folder, path)
+            with open(self.output_folder + path, 'a') as f:
+                f.write(text)
+        else:
+            self._events.append((path, text))
+
+    def write_generation(self, record):
+        if self.log_format == 'text':
+            for path, text in generation_log_texts(record, self.feature_names, self.n_parameters).items():
+                self.append(path, text)
+        else:
+            arrays = {field: np.asarray(record[field]) for field in self.GENERATION_FIELDS + self.OPTIONAL_FIELDS if field in record}
+            arrays.update(self._event_arrays())
+            self._put((f"generation_{record['generation']:06d}.npz", arrays))
+
+    def flush(self):
+        '''
+        Waits until the waiting records are written to their files
+        '''
+        if self.log_format == 'binary':
+            self._queue.join()
+            if self._error is not None:
+                raise self._error
+
+    def close(self):
+        if self.log_format == 'binary':
+            if self._events: # Logs written after the last generation
+                self._put(('end.npz', self._event_arrays()))
+            self._queue.put(None)
+            self._writer.join()
+            if self._error is not None:
+                raise self._error
+
+def read_run_log(folder):
+    '''
+    Yields the records of the run_log directory of a binary RunLog: the header, the generations in order and the logs
+    written after the last generation (generation None). The files are loaded without pickled objects.
+    '''
+    generations = sorted(name for name in os.listdir(folder) if name.startswith('generation_') and name.endswith('.npz'))
+    for name in ['header.npz'] + generations + ['end.npz']:
+        path = os.path.join(folder, name)
+        if not os.path.isfile(path):
+            continue
+        with np.load(path, allow_pickle=False) as arrays:
+            record = {field: arrays[field] for field in arrays.files}
+        if name == 'header.npz':
+            yield {'header': True, 'feature_names': record['feature_names'], 'parameters': int(record['parameters'])}
+            continue
+        record['events'] = list(zip(record.pop('event_paths').tolist(), record.pop('event_texts').tolist()))
+        if name == 'end.npz':
+            record['generation'] = None
+        else:
+            record['generation'] = int(record['generation'])
+            record['n_features'] = int(record['n_features'])
+        yield record
+
+def export_run_log(run_folder, destination=None):
+    '''
+    Writes the text log files of a run with a binary RunLog, as a run with the text logs would write them.
+    The files are written in the destination folder (the folder of the run by default).
+    '''
+    destination = os.path.join(destination if destination else run_folder, '')
+    header = None
+    for record in read_run_log(os.path.join(run_folder, RunLog.DIRNAME)):
+        if record.get('header'):
+            header = record
+            continue
+        texts = []
+        if record['generation'] is not None:
+            texts = list(generation_log_texts(record, header['feature_names'], header['parameters']).items())
+        for path, text in texts + record['events']:
+            os.makedirs(os.path.dirname(destination + path), exist_ok=True)
+            with open(destination + path, 'a') as f:
+                f.write(text)
+
+def get_random_states(rng=None):
+    '''
+    Returns the states of the random number generators used by the evolution (random, np.random and rng) as JSON values
+    '''
+    version, internal_state, gauss = random.getstate()
+    name, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    return {'random': [version, list(internal_state), gauss],
+            'np.random': [name, keys.tolist(), position, has_gauss, cached_gaussian],
+            'rng': rng.bit_generator.state if rng is not None else None}
+
+def restore_random_states(random_states, rng=None):
+    version, internal_state, gauss = random_states['random']
+    random.setstate((version, tuple(internal_state), gauss))
+    name, keys, position, has_gauss, cached_gaussian = random_states['np.random']
+    np.random.set_state((name, np.array(keys, dtype=np.uint32), position, has_gauss, cached_gaussian))
+    if rng is not None and random_states['rng'] is not None:
+        rng.bit_generator.state = random_states['rng']
+
+# The list of the files of the output folder the run appends to (see record_output_file())
+OUTPUT_FILES_LIST = 'output_files.txt'
+_recorded_output_files = set()
+
+def record_output_file(output_folder, path):
+    '''
+    Adds a file the run appends to (path is relative to the output folder) to output_folder/output_files.txt before the
+    file is first written. A resumed run truncates or removes only the files of this list (see restore_output_files())
+    '''
+    key = (os.path.abspath(output_folder), path)
+    if key not in _recorded_output_files:
+        _recorded_output_files.add(key)
+        with open(os.path.join(output_folder, OUTPUT_FILES_LIST), 'a') as f:
+            f.write(path + '\n')
+
+def recorded_output_files(output_folder):
+    '''
+    Returns the paths of output_folder/output_files.txt (see record_output_file())
+    '''
+    list_path = os.path.join(output_folder, OUTPUT_FILES_LIST)
+    if not os.path.isfile(list_path):
+        return []
+    with open(list_path) as f:
+        return list(dict.fromkeys(line.rstrip('\n') for line in f if line.strip()))
+
+def restore_output_files(output_folder, sizes):
+    '''
+    Brings the files of output_folder/output_files.txt back to the sizes they had at the checkpoint, so that the logs of
+    the generations after the checkpoint are not written twice. The files of the list created after the checkpoint are
+    removed. The other files of the output folder are not touched.
+    '''
+    for path in recorded_output_files(output_folder):
+        file_path = os.path.join(output_folder, path)
+        if path not in sizes:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+            _recorded_output_files.discard((os.path.abspath(output_folder), path))
+        elif os.path.isfile(file_path) and os.path.getsize(file_path) != sizes[path]:
+            with open(file_path, 'r+b') as f:
+                f.truncate(sizes[path])
+    with open(os.path.join(output_folder, OUTPUT_FILES_LIST), 'w') as f:
+        f.writelines(path + '\n' for path in sizes)
+
+CHECKPOINT_FILENAME = 'checkpoint.npz'
+
+def save_checkpoint(output_folder, state):
+    '''
+    Saves the state of the evolution after a generation in output_folder/checkpoint.npz, a NumPy .npz file without
+    pickled objects:
+        meta: JSON string with the generation, population, generations, num_of_folds, the states of the random number
+              generators (see get_random_states()) and the sizes of the files of output_folder/output_files.txt
+        individuals, max_eval_per_generation, average_eval_per_generation, sum_ranked_eval_per_generation: the arrays of the evolution
+        JMI_genes, Wilcoxon_genes, mRMR_genes, SelKBest_genes: the genes of the FS methods (missing if a method has no genes)
+        fitness_cache/..., pareto_archive/...: the arrays of FitnessCache.to_arrays() and ParetoArchive.to_arrays() (if used)
+    The checkpoint is written in a temporary file first and then renamed, so an interrupted run always leaves a complete checkpoint.
+    '''
+    if run_log is not None:
+        run_log.flush() # The records of the generations before the checkpoint are in the file
+    meta = {name: state[name] for name in ('generation', 'population', 'generations', 'num_of_folds', 'random_states')}
+    meta['file_sizes'] = {path: os.path.getsize(os.path.join(output_folder, path)) for path in recorded_output_files(output_folder)
+                          if os.path.isfile(os.path.join(output_folder, path))}
+    arrays = {'meta': np.array(json.dumps(meta))}
+    for name in ('individuals', 'max_eval_per_generation', 'average_eval_per_generation', 'sum_ranked_eval_per_generation'):
+        arrays[name] = np.asarray(state[name])
+    for name, FS_genes in zip(('JMI_genes', 'Wilcoxon_genes', 'mRMR_genes', 'SelKBest_genes'), state['FS_genes']):
+        if FS_genes is not None:
+            arrays[name] = np.asarray(FS_genes)
+    for name in ('fitness_cache', 'pareto_archive'):
+        if state[name] is not None:
+            arrays.update({f'{name}/{key}': value for key, value in state[name].to_arrays().items()})
+    checkpoint_path = os.path.join(output_folder, CHECKPOINT_FILENAME)
+    with open(checkpoint_path + '.tmp', 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+def load_checkpoint(output_folder, population, generations, num_of_folds):
+    '''
+    Loads the checkpoint of the run of the output folder (see save_checkpoint()) and restores its output files (see restore_output_files())
+    '''
+    checkpoint_path = os.path.join(output_folder, CHECKPOINT_FILENAME)
+    if not os.path.isfile(checkpoint_path):
+        raise FileNotFoundError(f'No checkpoint found in {output_folder}')
+    with np.load(checkpoint_path, allow_pickle=False) as arrays:
+        checkpoint = json.loads(str(arrays['meta']))
+        if (checkpoint['population'], checkpoint['generations'], checkpoint['num_of_folds']) != (population, generations, num_of_folds):
+            raise ValueError(f"The checkpoint is of a run with population {checkpoint['population']}, {checkpoint['generations']} generations "
+                             f"and {checkpoint['num_of_folds']} folds")
+        for name in ('individuals', 'max_eval_per_generation', 'average_eval_per_generation', 'sum_ranked_eval_per_generation'):
+            checkpoint[name] = arrays[name]
+        checkpoint['FS_genes'] = tuple(arrays[name] if name in arrays.files else None
+                                       for name in ('JMI_genes', 'Wilcoxon_genes', 'mRMR_genes', 'SelKBest_genes'))
+        for name, cls in (('fitness_cache', FitnessCache), ('pareto_archive', ParetoArchive)):
+            prefix = name + '/'
+            stored = {key[len(prefix):]: arrays[key] for key in arrays.files if key.startswith(prefix)}
+            checkpoint[name] = cls.from_arrays(stored) if stored else None
+    restore_output_files(output_folder, checkpoint['file_sizes'])
+    return checkpoint
+
 def picklefy_variables(var,var_name,output_folder):
     try:
         pickle.dump(var, open(f'{output_folder}Variables/{var_name}.pkl', "wb"))
@@ -1794,6 +4052,26 @@ def get_parser():
     MEvAX_args.add_argument("--impute", type=lambda x:bool(strtobool(x)), default=True, dest='missing_values_flag', help="[bool]: Select if the missing values should be imputed with a KNN imputer. Default = True")
     MEvAX_args.add_argument("--normalize", type=lambda x:bool(strtobool(x)), default=True, dest='normalize_flag', help="[bool]: Select if the data should get normalized. If \'True\' it normalizes the values between the intervals [0, 1] or [-1, 1] if there are negative values. Default = True")
     MEvAX_args.add_argument("--verbose", "-V", type=lambda x:bool(strtobool(x)), default=False, dest='verbose', help="[bool]: The option of printing more information. If \'False\' only information of the program essentials will be printed. Default = False")
+    MEvAX_args.add_argument("--jobs", "-j", type=int, default=1, dest='n_jobs', help="[int]: The number of processes used to evaluate the individuals of the population in parallel. Default = 1")
+    MEvAX_args.add_argument("--seed", type=int, default=None, dest='seed', help="[int]: The seed of the random number generators. Runs with the same seed and inputs give the same results. Default = None")
+    MEvAX_args.add_argument("--cache_size", type=int, default=0, dest='cache_size', help="[int]: The maximum number of evaluations kept in the fitness cache. Duplicated and elite individuals found in the cache are not trained again. Every evaluation keeps its metrics and the ROC curves of its folds in memory. 0 disables the cache. Default = 0")
+    MEvAX_args.add_argument("--cv_seed", type=int, default=None, dest='cv_seed', help="[int]: Fixes the folds of the cross validation for all the generations, so that the cached fitness stays valid across generations. If not given, the folds change in every generation. Default = None")
+    MEvAX_args.add_argument("--vectorized_operators", type=lambda x:bool(strtobool(x)), default=False, dest='vectorized_operators', help="[bool]: Apply the selection, crossover and mutation operators on the whole population at once, with one random number generator seeded by --seed. The runs are reproducible but differ from the runs with the default operators. Default = False")
+    MEvAX_args.add_argument("--binned", type=lambda x:bool(strtobool(x)), default=False, dest='binned', help="[bool]: Bin the features once per fold plan (one bin per distinct training value) and train the boosters of the evolution on the bins with the hist tree method, instead of building and sorting the raw matrices of every individual. The evaluations are the ones of the hist tree method on the raw values, which does not make the splits with a loss reduction lower than gamma while it grows the trees, so they can differ from the ones of the default (exact) tree method. Default = False")
+    MEvAX_args.add_argument("--dmatrix_pool_mb", type=float, default=0, dest='dmatrix_pool_mb', help="[float]: The memory budget (MB) of the DMatrix of the folds kept per feature subset. Individuals with the same features and different hyperparameters do not build them again. With --jobs > 1 the budget is split between the processes. 0 disables the pool. Default = 0")
+    MEvAX_args.add_argument("--racing_folds", type=int, default=0, dest='racing_folds', help="[int]: Race the individuals of the evolution: train them first on this number of folds and on the other folds only if they can still reach the first Pareto front. Must be lower than the number of folds. Cannot be used with --model_store. 0 disables the racing. Default = 0")
+    MEvAX_args.add_argument("--checkpoint_every", type=int, default=1, dest='checkpoint_every', help="[int]: Save a checkpoint of the evolution in checkpoint.npz of the results directory every this number of generations. The checkpoint is a NumPy .npz file without pickled objects: a 'meta' JSON string (generation, run settings, states of the random number generators, sizes of the log files of output_files.txt), the population, the per generation arrays, the genes of the FS methods and the arrays of the fitness cache (fitness_cache/...) and of the Pareto archive (pareto_archive/...). A resumed run truncates or removes only the files listed in output_files.txt. 0 disables the checkpoints. Default = 0")
+    MEvAX_args.add_argument("--resume", type=dir_path, default=None, dest='resume', help="[str]: The results directory (Models_P..._G..._K..._...) of an interrupted run to continue from its last checkpoint. The other arguments must be the ones of the interrupted run. Default = None")
+    MEvAX_args.add_argument("--log_format", type=str, default='text', choices=['text', 'binary'], dest='log_format', help="[str]: 'text' writes the log files of the evolution at the end of every generation. 'binary' writes the arrays of every generation in a NumPy .npz file (run_log/generation_<generation>.npz of the results directory, see RunLog) from a background thread. The text files of a binary log are written by export_run_log.py. Default = text")
+    MEvAX_args.add_argument("--islands", type=int, default=1, dest='islands', help="[int]: The number of populations (of P individuals each) that evolve in parallel processes and exchange their best individuals. The last populations of all the islands are merged for the final Pareto front. The --jobs and the memory of the DMatrix pool are split between the islands. 1 runs a single population. Default = 1")
+    MEvAX_args.add_argument("--migration_interval", type=int, default=5, dest='migration_interval', help="[int]: The number of generations between two migrations of the islands. Default = 5")
+    MEvAX_args.add_argument("--n_migrants", type=int, default=2, dest='n_migrants', help="[int]: The number of best individuals of an island that migrate to the next island. Default = 2")
+    MEvAX_args.add_argument("--steady_state", type=lambda x:bool(strtobool(x)), default=False, dest='steady_state', help="[bool]: Evolve the population without generations: a new child is bred and evaluated as soon as a process is free and replaces the weakest individual of the last Pareto front. The runs with more than one process are not reproducible. Cannot be used with --islands, --racing_folds, --model_store or --resume. Default = False")
+    MEvAX_args.add_argument("--archive_size", type=int, default=0, dest='archive_size', help="[int]: Keep up to this number of non-dominated individuals of all the generations in an archive. The archived individuals join the last population for the final Pareto front and the majority voting. 0 disables the archive. Default = 0")
+    MEvAX_args.add_argument("--model_store", type=lambda x:bool(strtobool(x)), default=False, dest='model_store', help="[bool]: Keep the boosters of the cross validation of the individuals of the first Pareto front and reuse them in the majority voting instead of training its models again. The boosters are only reused when the last evaluation had the same folds as the majority voting, so the voting results do not change. Not used with --binned. Cannot be used with --racing_folds. Default = False")
+    MEvAX_args.add_argument("--export_bundle", type=lambda x:bool(strtobool(x)), default=False, dest='export_bundle', help="[bool]: Train the models of the first Pareto front on all the samples and export them with their features and the normalization of the data in Pareto_1_results/Bundle, for the scoring of new samples with mevax_predict.py. Default = False")
+    MEvAX_args.add_argument("--cache_dir", type=str, default=None, dest='cache_dir', help="[str]: The directory of the cache of the preprocessed datasets. The parsed, imputed and normalized dataset is saved there, under the hash of the dataset and labels files and of --impute and --normalize, and the next runs on the same files load it instead of preprocessing the files again. Default = None")
+    MEvAX_args.add_argument("--stream_chunk_size", type=int, default=0, dest='stream_chunk_size', help="[int]: Read the dataset in chunks of this number of rows (features) into a float32 memory-mapped file in the output directory, instead of loading the whole table at once. The duplicated features are averaged as they are read. 0 loads the whole table. Default = 0")
     MEvAX_args.add_argument("--plot", "-plt", type=lambda x:bool(strtobool(x)), default=False, dest='to_plot', help="[bool]: The option of plotting and saving the AUC of the trainngs. If \'True\' it produces AUC plots for every itteration but also slows down the algorithm. Default = False")
 
     return MEvAX_args
@@ -1862,8 +4140,31 @@ if __name__ == "__main__":
     normalize_flag = args.normalize_flag
     verbose = args.verbose
     to_plot = args.to_plot
-
-    [dataset, feature_names, sample_names, labels] = preprocessing_function(dataset_filename, labels_filename, as_pandas=True)
+    n_jobs = args.n_jobs
+    cache_size = args.cache_size
+    cv_seed = args.cv_seed
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+    rng = np.random.default_rng(args.seed) if args.vectorized_operators else None # Generator of the vectorized genetic operators
+
+    preprocessing_cache = preprocessed = memmap_filename = None
+    if args.cache_dir:
+        preprocessing_cache = os.path.join(os.path.abspath(args.cache_dir), preprocessing_cache_key(dataset_filename, labels_filename, missing_values_flag, normalize_flag,
+                                                                                                    'float32' if args.stream_chunk_size > 0 else 'float64'))
+        preprocessed = load_preprocessed_dataset(preprocessing_cache)
+    if preprocessed is not None:
+        print(f'Preprocessed dataset loaded from the cache: {preprocessing_cache}')
+        dataset, feature_names, sample_names, labels = preprocessed['dataset'], preprocessed['feature_names'], preprocessed['sample_names'], preprocessed['labels']
+    else:
+        if preprocessing_cache is not None:
+            os.makedirs(os.path.dirname(preprocessing_cache), exist_ok=True)
+        if args.stream_chunk_size > 0:
+            memmap_handle, memmap_filename = tempfile.mkstemp(suffix='.float32', prefix='dataset_', dir=output_folder)
+            os.close(memmap_handle)
+        [dataset, feature_names, sample_names, labels] = preprocessing_function(dataset_filename, labels_filename, as_pandas=True,
+                                                                                chunk_size=args.stream_chunk_size, memmap_filename=memmap_filename)
 
     ####### PARAMETERS #######
     #						1	2	3	4		5	6	7	8	9	10	11	12 13
@@ -1877,7 +4178,10 @@ if __name__ == "__main__":
     if output_folder and verbose:
         print(f"Output folder: {output_folder}")
 
-    output_folder = os.path.join(output_folder, f"Models_P{population}_G{generations}_K{num_of_folds}_{str(time.time_ns())[:-9]}\\")
+    if args.resume:
+        output_folder = os.path.join(args.resume, '') # The run to continue
+    else:
+        output_folder = os.path.join(output_folder, f"Models_P{population}_G{generations}_K{num_of_folds}_{str(time.time_ns())[:-9]}\\")
     if verbose:
         print(output_folder)
 
@@ -1885,18 +4189,34 @@ if __name__ == "__main__":
         os.makedirs(output_folder)
         os.makedirs(output_folder + 'Evolutionary process')
 
-    with open(output_folder+'Inputs.txt','a') as param_file:
-        param_file.write(f'cwd: {current_dir}\ndataset file: {dataset_filename}\n')
-        param_file.write(f'labels file: {labels_filename}\nNumber of parameters: {parameters}\n')
-        param_file.write(f'Population: {population}\nGenerations: {generations}\n')
-        param_file.write(f'k-folds: {num_of_folds}')
+    if not args.resume:
+        with open(output_folder+'Inputs.txt','a') as param_file:
+            param_file.write(f'cwd: {current_dir}\ndataset file: {dataset_filename}\n')
+            param_file.write(f'labels file: {labels_filename}\nNumber of parameters: {parameters}\n')
+            param_file.write(f'Population: {population}\nGenerations: {generations}\n')
+            param_file.write(f'k-folds: {num_of_folds}')
+            if args.seed is not None:
+                param_file.write(f'\nSeed: {args.seed}')
 
     eval_names = np.array(['Model_complexity #features','Accuracy','Model_complexity #splits',
                                 'weighted Geometric Mean','F1 score','F2 score','Precision','Recall','AUrocC',
                                 'Balanced_accuracy','Manhattan distance^-1','Overall_score'])
     
-
-    biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, min_values, max_values, population,
-                                generations, two_points_crossover_probability, arithmetic_crossover_probability,
-                                mutation_probability, goal_significances, num_of_folds, output_folder,
-                                eval_names, missing_values_flag, normalize_flag, FS_calc, k_vals, verbose, to_plot)
+    run_log = RunLog(output_folder, args.log_format, feature_names, parameters)
+    try:
+        biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, min_values, max_values, population,
+                                    generations, two_points_crossover_probability, arithmetic_crossover_probability,
+                                    mutation_probability, goal_significances, num_of_folds, output_folder,
+                                    eval_names, missing_values_flag, normalize_flag, FS_calc, k_vals, verbose, to_plot, n_jobs,
+                                    cache_size, cv_seed, rng, args.binned, args.dmatrix_pool_mb, args.racing_folds,
+                                    args.checkpoint_every, args.resume is not None, args.islands, args.migration_interval, args.n_migrants,
+                                    args.log_format, args.steady_state, args.archive_size, args.model_store, args.export_bundle,
+                                    preprocessing_cache, preprocessed)
+    finally:
+        run_log.close()
+        if memmap_filename is not None:
+            del dataset
+            try:
+                os.remove(memmap_filename) # The memory-mapped dataset of stream_dataset()
+            except OSError:
+                pass
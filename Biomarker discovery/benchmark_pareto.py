@@ -0,0 +1,113 @@
+"""
+Benchmark of the non-dominated sorting of MEvA-X (pareto_frontiers) against the previous implementation with the
+nested loops. The fronts of both implementations are compared on the same random evaluation values.
+
+Usage:
+    python benchmark_pareto.py
+    python benchmark_pareto.py --populations 50 500 5000 --legacy_max 500
+"""
+import argparse
+import importlib.util
+import os
+import time
+import numpy as np
+
+# MEvA-X.py is not a valid module name
+_spec = importlib.util.spec_from_file_location('mevax', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'MEvA-X.py'))
+mevax = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(mevax)
+
+
+def legacy_pareto_frontiers(evaluation_values):
+    '''
+    The pareto_frontiers() of MEvA-X before the fast non-dominated sorting. Kept as the reference.
+    '''
+    assigned = 0  # How many individuals have assigned to a frontier list so far
+    population = evaluation_values.shape[1]
+    fronts = np.zeros(population, dtype='int')
+    front = 1
+    eval_temp = evaluation_values.copy()
+
+    while assigned < population:
+
+        non_dominated_solutions = np.zeros(population, dtype=int)
+        ordered_list = np.flip(np.argsort(eval_temp[0]))
+        non_dominated_solutions[0] = ordered_list[0]
+        number_of_non_dominated_solutions = 1
+
+        for i in range(1, population):
+            n = 0
+            condition = True
+            while n < number_of_non_dominated_solutions:
+                solution1 = eval_temp[:-1,ordered_list[i]]
+                solution2 = eval_temp[:-1,non_dominated_solutions[n]]
+                check = mevax.dominant_solution(solution1, solution2)
+                if check==1:
+                    if number_of_non_dominated_solutions==1:
+                        non_dominated_solutions[0]=ordered_list[i]
+                        condition = False
+                        break
+                    else:
+                        number_of_non_dominated_solutions=number_of_non_dominated_solutions-1
+                        non_dominated_solutions = np.delete(non_dominated_solutions,n)
+                        continue
+                elif check==3:
+                    condition = False
+                    break
+                n += 1
+
+            if condition:
+                non_dominated_solutions[number_of_non_dominated_solutions]=ordered_list[i]
+                number_of_non_dominated_solutions += 1
+        sorted_non_dominated_solutions=sorted(non_dominated_solutions, reverse=True)
+        assigned += number_of_non_dominated_solutions
+        fronts[sorted_non_dominated_solutions[:number_of_non_dominated_solutions]] = front
+        front += 1
+        eval_temp[:,sorted_non_dominated_solutions[:number_of_non_dominated_solutions]] = -1
+    return fronts
+
+
+def random_evaluation_values(n_goals, population, decimals, rng):
+    '''
+    Random evaluation values in [0,1] like the metrics of MEvA-X. Rounding creates ties between the individuals.
+    The last row is the overall score.
+    '''
+    evaluation_values = rng.random((n_goals+1, population))
+    if decimals is not None:
+        evaluation_values = evaluation_values.round(decimals)
+    evaluation_values[-1] = evaluation_values[:-1].mean(axis=0)
+    return evaluation_values
+
+
+def timeit(function, evaluation_values, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fronts = function(evaluation_values)
+        times.append(time.perf_counter()-start)
+    return fronts, min(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of the non-dominated sorting of MEvA-X')
+    parser.add_argument("--populations", type=int, nargs='+', default=[50, 100, 200, 500, 1000, 2000, 5000], help="[int]: The sizes of the populations. Default = 50 100 200 500 1000 2000 5000")
+    parser.add_argument("--goals", type=int, default=10, help="[int]: The number of objectives. Default = 10")
+    parser.add_argument("--decimals", type=int, default=2, help="[int]: The evaluation values are rounded to this number of decimals to have ties. Default = 2")
+    parser.add_argument("--legacy_max", type=int, default=1000, help="[int]: The largest population the previous implementation runs on. Default = 1000")
+    parser.add_argument("--repeats", type=int, default=3, help="[int]: The best time of this number of runs is reported. Default = 3")
+    parser.add_argument("--seed", type=int, default=0, help="[int]: The seed of the random evaluation values. Default = 0")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'Population':>10} {'Fronts':>7} {'Vectorized (s)':>15} {'Legacy (s)':>11} {'Speedup':>8} {'Same fronts':>12}")
+    for population in args.populations:
+        evaluation_values = random_evaluation_values(args.goals, population, args.decimals, rng)
+        fronts, vectorized_time = timeit(mevax.pareto_frontiers, evaluation_values, args.repeats)
+        if population <= args.legacy_max:
+            legacy_fronts, legacy_time = timeit(legacy_pareto_frontiers, evaluation_values, 1)
+            same = np.array_equal(fronts, legacy_fronts)
+            print(f"{population:>10} {fronts.max():>7} {vectorized_time:>15.5f} {legacy_time:>11.5f} {legacy_time/vectorized_time:>8.1f} {str(same):>12}")
+            if not same:
+                raise AssertionError(f'The fronts differ for a population of {population}')
+        else:
+            print(f"{population:>10} {fronts.max():>7} {vectorized_time:>15.5f} {'-':>11} {'-':>8} {'-':>12}")
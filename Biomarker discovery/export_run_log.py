@@ -0,0 +1,28 @@
+"""
+Writes the text log files of the evolution (Selected Features.txt, Pareto_fronts.txt, timing.txt, ...) of a MEvA-X
+run made with --log_format binary, from the run_log directory of its results directory.
+
+Usage:
+    python export_run_log.py RESULTS_DIR
+    python export_run_log.py RESULTS_DIR --output_dir OTHER_DIR
+"""
+import argparse
+import importlib.util
+import os
+
+# MEvA-X.py is not a valid module name
+_spec = importlib.util.spec_from_file_location('mevax', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'MEvA-X.py'))
+mevax = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(mevax)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Writes the text logs of a MEvA-X run from its binary run log')
+    parser.add_argument("run_folder", type=str, help="[str]: The results directory of the run (Models_P..._G..._K..._...)")
+    parser.add_argument("--output_dir", type=str, default=None, help="[str]: The directory of the text logs. Default = the results directory of the run")
+    args = parser.parse_args()
+
+    if not os.path.isdir(os.path.join(args.run_folder, mevax.RunLog.DIRNAME)):
+        raise FileNotFoundError(f'No {mevax.RunLog.DIRNAME} directory found in {args.run_folder}')
+    mevax.export_run_log(args.run_folder, args.output_dir)
+    print(f'The text logs are saved in the directory: {args.output_dir if args.output_dir else args.run_folder}')
@@ -0,0 +1,282 @@
+"""
+Scores new samples with the models of the first Pareto front of a MEvA-X run, from the bundle MEvA-X exports in
+Pareto_1_results/Bundle (see export_pareto_bundle() and --export_bundle of MEvA-X.py). Every member of the bundle
+predicts the samples and the predictions are combined with a soft vote (mean of the predictions) and a hard vote
+(mean of the rounded predictions), like the majority voting of MEvA-X.
+
+The samples file has the format of the dataset of MEvA-X (Features X Samples, the first column has the feature
+names), or Samples X Features with --samples_as_rows. Only the features of the bundle are read and the samples are
+scored in chunks, so files larger than the memory can be scored with --samples_as_rows. The values are normalized
+as the training data. Missing values are passed to XGBoost as missing (they are not imputed).
+
+Usage:
+    python mevax_predict.py BUNDLE_DIR SAMPLES_FILE
+    python mevax_predict.py BUNDLE_DIR SAMPLES_FILE --output predictions.tsv --chunk_size 5000 --samples_as_rows True
+"""
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import xgboost as xgb
+
+# Version of the manifest.json this script reads (BUNDLE_VERSION of MEvA-X.py)
+BUNDLE_VERSION = 1
+
+# Values read as missing, as in parsing_data_and_labels() of MEvA-X.py
+NA_STRINGS = {'', ' ', '_', '-', 'NA', 'N/A', 'NaN', 'nan', 'NULL', 'null', 'None'}
+NA_NUMBERS = {-1000.0, -999.0, 999.0}
+
+
+class Bundle():
+    """
+    The members of a MEvA-X bundle.
+
+    Attributes:
+        features: (list) the names of the features used by at least one member, the columns of the inputs of predict()
+        classes: (list) the original labels, in the order of their numeric codes
+        members: (list) the manifest entries of the members
+    """
+
+    def __init__(self, bundle_folder, nthread=None):
+        with open(os.path.join(bundle_folder, 'manifest.json')) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get('version') != BUNDLE_VERSION:
+            raise ValueError(f"Bundle version {manifest.get('version')} is not supported (expected {BUNDLE_VERSION})")
+        self.classes = manifest['classes']
+        self.members = manifest['members']
+        if not self.members:
+            raise ValueError(f'The bundle {bundle_folder} has no members')
+
+        self.features = []
+        positions = {}
+        for member in self.members:
+            for name in member['feature_names']:
+                if name not in positions:
+                    positions[name] = len(self.features)
+                    self.features.append(name)
+        self._columns = [np.array([positions[name] for name in member['feature_names']]) for member in self.members]
+
+        # x*scale + offset for every feature, as the MinMaxScaler of the training data
+        self._scale = self._offset = None
+        if manifest['normalization'] is not None:
+            normalization = manifest['normalization']['features']
+            self._scale = np.array([normalization[name]['scale'] for name in self.features])
+            self._offset = np.array([normalization[name]['offset'] for name in self.features])
+
+        boosters = {}
+        for member in self.members:
+            if member['booster'] not in boosters:
+                booster = xgb.Booster(model_file=os.path.join(bundle_folder, member['booster']))
+                if nthread:
+                    booster.set_param({'nthread': nthread})
+                boosters[member['booster']] = booster
+        self._boosters = [boosters[member['booster']] for member in self.members]
+
+    def __len__(self):
+        return len(self.members)
+
+    def predict_members(self, inputs):
+        '''
+        Scores the samples of inputs (Samples X self.features, not normalized) with every member
+
+        Returns: Members X Samples predictions (the probability of the second class, or the class code for more than two classes)
+        '''
+        inputs = np.array(inputs, dtype=float)
+        if self._scale is not None:
+            inputs *= self._scale
+            inputs += self._offset
+        predictions = np.empty((len(self), inputs.shape[0]))
+        for i, (member, columns, booster) in enumerate(zip(self.members, self._columns, self._boosters)):
+            predictions[i] = booster.inplace_predict(inputs[:,columns], iteration_range=(0, member['n_trees']))+1e-08
+        return predictions
+
+    def predict(self, inputs):
+        '''
+        Scores the samples of inputs (Samples X self.features, not normalized)
+
+        Returns: the soft and the hard votes of the members for every sample
+        '''
+        return self.votes(self.predict_members(inputs))
+
+    def votes(self, member_predictions):
+        '''
+        The soft and the hard votes of the predictions of predict_members()
+        '''
+        return member_predictions.mean(axis=0), member_predictions.round().mean(axis=0)
+
+    def labels(self, votes):
+        '''
+        The original labels of the votes of predict()
+        '''
+        codes = np.clip(np.asarray(votes).round().astype(int), 0, len(self.classes)-1)
+        return [self.classes[code] for code in codes]
+
+
+def find_delimiter(samples_filename):
+    '''
+    "\\t" if the second line of the file has tabs, "," otherwise (like find_delimiter() of MEvA-X.py)
+    '''
+    with open(samples_filename, 'r') as handle:
+        next(handle)
+        head = next(handle, '')
+    return "\t" if "\t" in head else ","
+
+def text_delimiter(lines):
+    '''
+    find_delimiter() of a list of lines
+    '''
+    return "\t" if len(lines) > 1 and "\t" in lines[1] else ","
+
+def str_to_bool(value):
+    '''
+    The bool of a command line flag: y, yes, t, true, on and 1 are True, n, no, f, false, off and 0 are False
+    (the values of distutils.util.strtobool(), which is not in Python 3.12)
+    '''
+    value = value.strip().lower()
+    if value in ('y', 'yes', 't', 'true', 'on', '1'):
+        return True
+    if value in ('n', 'no', 'f', 'false', 'off', '0'):
+        return False
+    raise ValueError(f'Invalid truth value {value!r}')
+
+def clean_name(name):
+    return name.strip().replace(' ', '_')
+
+def parse_value(value):
+    value = value.strip()
+    if value in NA_STRINGS:
+        return np.nan
+    number = float(value)
+    return np.nan if number in NA_NUMBERS else number
+
+def _average_duplicates(columns, n_features):
+    '''
+    Index arrays to average the columns of the features that appear more than once (like mean_duplicated() of MEvA-X.py)
+    '''
+    counts = np.bincount([feature for _, feature in columns], minlength=n_features)
+    return np.array([position for position, _ in columns], dtype=int), np.array([feature for _, feature in columns], dtype=int), counts
+
+def _to_features(values, positions, features, counts):
+    '''
+    Samples X bundle features from the Samples X read columns values, with the mean of duplicated features (NaN ignored)
+    '''
+    inputs = np.zeros((values.shape[0], counts.shape[0]))
+    seen = np.zeros((values.shape[0], counts.shape[0]))
+    selected = values[:,positions]
+    present = ~np.isnan(selected)
+    np.add.at(inputs.T, features, np.where(present, selected, 0).T)
+    np.add.at(seen.T, features, present.T)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(seen > 0, inputs/np.maximum(seen, 1), np.nan)
+
+def _warn_missing(features, found):
+    missing = [name for name, is_found in zip(features, found) if not is_found]
+    if missing:
+        print(f'Warning: {len(missing)} features of the bundle are not in the samples file and are missing for all the samples: {missing[:10]}', file=sys.stderr)
+
+def read_feature_rows(samples_filename, features, delimiter):
+    '''
+    Reads only the rows of the features of the bundle from a Features X Samples file
+
+    Returns: the sample names and the Samples X features values
+    '''
+    with open(samples_filename, 'r') as handle:
+        return parse_feature_rows(handle, features, delimiter)
+
+def parse_feature_rows(lines, features, delimiter):
+    '''
+    read_feature_rows() of the lines of a Features X Samples file (an iterable of strings, e.g. an open file)
+    '''
+    positions = {name: i for i, name in enumerate(features)}
+    rows = []
+    row_features = []
+    lines = iter(lines)
+    sample_names = [clean_name(name) for name in next(lines).rstrip('\r\n').split(delimiter)[1:]]
+    for line in lines:
+        name, _, values = line.rstrip('\r\n').partition(delimiter)
+        name = clean_name(name)
+        if name in positions:
+            rows.append([parse_value(value) for value in values.split(delimiter)])
+            row_features.append(positions[name])
+    values = np.array(rows, dtype=float).reshape(len(rows), len(sample_names)).T
+    _warn_missing(features, np.bincount(row_features, minlength=len(features)) > 0)
+    positions, row_features, counts = _average_duplicates(list(enumerate(row_features)), len(features))
+    return sample_names, _to_features(values, positions, row_features, counts)
+
+def iter_sample_rows(samples_filename, features, delimiter, chunk_size):
+    '''
+    Reads a Samples X Features file in chunks of chunk_size samples
+
+    Yields: the sample names and the Samples X features values of every chunk
+    '''
+    with open(samples_filename, 'r') as handle:
+        yield from parse_sample_rows(handle, features, delimiter, chunk_size)
+
+def parse_sample_rows(lines, features, delimiter, chunk_size):
+    '''
+    iter_sample_rows() of the lines of a Samples X Features file (an iterable of strings, e.g. an open file)
+    '''
+    positions = {name: i for i, name in enumerate(features)}
+    lines = iter(lines)
+    header = [clean_name(name) for name in next(lines).rstrip('\r\n').split(delimiter)[1:]]
+    columns = [(column, positions[name]) for column, name in enumerate(header) if name in positions]
+    found = np.zeros(len(features), dtype=bool)
+    found[[feature for _, feature in columns]] = True
+    _warn_missing(features, found)
+    column_positions, column_features, counts = _average_duplicates(columns, len(features))
+    names, rows = [], []
+    for line in lines:
+        if not line.strip():
+            continue
+        cells = line.rstrip('\r\n').split(delimiter)
+        if len(cells) < len(header)+1:
+            raise ValueError(f'The sample {clean_name(cells[0])} has {len(cells)-1} values for {len(header)} features')
+        names.append(clean_name(cells[0]))
+        rows.append([parse_value(cells[1+column]) for column in column_positions])
+        if len(rows) == chunk_size:
+            yield names, _to_features(np.array(rows, dtype=float), np.arange(len(column_positions)), column_features, counts)
+            names, rows = [], []
+    if rows:
+        yield names, _to_features(np.array(rows, dtype=float), np.arange(len(column_positions)), column_features, counts)
+
+def score_samples(bundle, samples_filename, output, chunk_size=10000, samples_as_rows=False):
+    '''
+    Scores all the samples of the file and writes one line per sample in output (a text file object)
+
+    Returns: the number of samples
+    '''
+    delimiter = find_delimiter(samples_filename)
+    if samples_as_rows:
+        chunks = iter_sample_rows(samples_filename, bundle.features, delimiter, chunk_size)
+    else:
+        sample_names, all_inputs = read_feature_rows(samples_filename, bundle.features, delimiter)
+        chunks = ((sample_names[start:start+chunk_size], all_inputs[start:start+chunk_size]) for start in range(0, len(sample_names), chunk_size))
+
+    output.write('sample\tsoft_vote\tsoft_prediction\thard_vote\thard_prediction\n')
+    n_samples = 0
+    for names, inputs in chunks:
+        soft, hard = bundle.predict(inputs)
+        for name, soft_vote, soft_label, hard_vote, hard_label in zip(names, soft, bundle.labels(soft), hard, bundle.labels(hard)):
+            output.write(f'{name}\t{soft_vote:.6f}\t{soft_label}\t{hard_vote:.6f}\t{hard_label}\n')
+        n_samples += len(names)
+    return n_samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Scores new samples with the first Pareto front of a MEvA-X run')
+    parser.add_argument("bundle_folder", type=str, help="[str]: The bundle directory of the run (Pareto_1_results/Bundle)")
+    parser.add_argument("samples_filename", type=str, help="[str]: The file of the samples to score. Format expected: FeaturesXSamples (see --samples_as_rows)")
+    parser.add_argument("--output", "-o", type=str, default=None, help="[str]: The file of the predictions (tab separated). Default = the standard output")
+    parser.add_argument("--chunk_size", type=int, default=10000, help="[int]: The number of samples scored at once. Default = 10000")
+    parser.add_argument("--samples_as_rows", type=str_to_bool, default=False, help="[bool]: The samples file is SamplesXFeatures (one sample per line). It is read in chunks of --chunk_size samples. Default = False")
+    parser.add_argument("--nthread", type=int, default=None, help="[int]: The number of threads of XGBoost. Default = all the cores")
+    args = parser.parse_args()
+
+    bundle = Bundle(args.bundle_folder, args.nthread)
+    if args.output is None:
+        score_samples(bundle, args.samples_filename, sys.stdout, args.chunk_size, args.samples_as_rows)
+    else:
+        with open(args.output, 'w') as output:
+            n_samples = score_samples(bundle, args.samples_filename, output, args.chunk_size, args.samples_as_rows)
+        print(f'{n_samples} samples scored with {len(bundle)} models. The predictions are saved in: {args.output}')
@@ -0,0 +1,331 @@
+"""
+Local inference server for the first Pareto front of a MEvA-X run. The bundle MEvA-X exports in
+Pareto_1_results/Bundle (see mevax_predict.py) is loaded once and the samples are scored over HTTP, on a TCP port
+or on a Unix socket.
+
+The requests are micro-batched: the samples of the requests that arrive within --max_wait_ms of each other (up to
+--max_batch samples) are scored together with one prediction per member of the bundle, so many small requests
+cost about as much as one large request.
+
+Endpoints:
+    POST /predict   The body is the text of a samples file (Features X Samples like the dataset of MEvA-X, or
+                    Samples X Features with ?samples_as_rows=true). Tabs or commas, as in mevax_predict.py.
+                    Add ?members=true to get the predictions of every member.
+                    Returns JSON: samples, soft_vote, soft_prediction, hard_vote, hard_prediction (and members)
+    GET /stats      Counters of the requests, the samples, the batches and the latencies (ms)
+    GET /health     The number of members and features of the bundle
+
+Usage:
+    python mevax_serve.py BUNDLE_DIR --port 8050
+    python mevax_serve.py BUNDLE_DIR --unix_socket /tmp/mevax.sock
+    curl --data-binary @samples.tsv http://127.0.0.1:8050/predict
+"""
+import argparse
+import collections
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))) # mevax_predict.py is next to this script
+from mevax_predict import Bundle, text_delimiter, parse_feature_rows, parse_sample_rows, str_to_bool
+
+
+class LatencyCounters():
+    """
+    Counters of the server. The percentiles are computed on the last `window` requests.
+    """
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.failed = 0
+        self.samples = 0
+        self.batches = 0
+        self.batch_sizes = collections.deque(maxlen=window)
+        self.latencies = collections.deque(maxlen=window)
+        self.queue_times = collections.deque(maxlen=window)
+        self.predict_times = collections.deque(maxlen=window)
+
+    def add_batch(self, n_samples, predict_time):
+        with self.lock:
+            self.batches += 1
+            self.batch_sizes.append(n_samples)
+            self.predict_times.append(predict_time)
+
+    def add_request(self, n_samples, latency, queue_time):
+        with self.lock:
+            self.requests += 1
+            self.samples += n_samples
+            self.latencies.append(latency)
+            self.queue_times.append(queue_time)
+
+    def add_failure(self):
+        with self.lock:
+            self.failed += 1
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return {'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+        values = np.array(values)*1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {'mean': round(float(values.mean()), 3), 'p50': round(float(p50), 3), 'p95': round(float(p95), 3),
+                'p99': round(float(p99), 3), 'max': round(float(values.max()), 3)}
+
+    def to_dict(self):
+        with self.lock:
+            return {'uptime_s': round(time.time()-self.started, 3),
+                    'requests': self.requests,
+                    'failed_requests': self.failed,
+                    'samples': self.samples,
+                    'batches': self.batches,
+                    'mean_batch_size': round(float(np.mean(self.batch_sizes)), 3) if self.batch_sizes else None,
+                    'latency_ms': self._summary(self.latencies),
+                    'queue_ms': self._summary(self.queue_times),
+                    'predict_ms': self._summary(self.predict_times)}
+
+
+class _Pending():
+    """
+    A request waiting in the queue of the MicroBatcher
+    """
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.queued = time.perf_counter()
+        self.started = None
+        self.done = threading.Event()
+        self.predictions = None
+        self.error = None
+
+
+class MicroBatcher():
+    """
+    Scores the inputs of concurrent requests together. A single thread takes the first waiting request, then waits
+    up to max_wait seconds for more requests until max_batch samples are collected, and scores all of them with one
+    call of bundle.predict_members(). A request larger than max_batch is scored alone.
+    """
+
+    def __init__(self, bundle, counters, max_batch=1024, max_wait=0.005):
+        self.bundle = bundle
+        self.counters = counters
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='MicroBatcher', daemon=True)
+        self._thread.start()
+
+    def predict_members(self, inputs):
+        '''
+        Blocks until the inputs (Samples X bundle.features) are scored
+
+        Returns: Members X Samples predictions and the time the request waited in the queue (s)
+        '''
+        pending = _Pending(inputs)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.predictions, pending.started-pending.queued
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        n_samples = first.inputs.shape[0]
+        deadline = time.perf_counter()+self.max_wait
+        while n_samples < self.max_batch:
+            timeout = deadline-time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if pending is None:
+                self._queue.put(None)
+                break
+            batch.append(pending)
+            n_samples += pending.inputs.shape[0]
+        return batch, n_samples
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, n_samples = self._collect(first)
+            started = time.perf_counter()
+            for pending in batch:
+                pending.started = started
+            try:
+                predictions = self.bundle.predict_members(np.concatenate([pending.inputs for pending in batch]))
+                self.counters.add_batch(n_samples, time.perf_counter()-started)
+                start = 0
+                for pending in batch:
+                    pending.predictions = predictions[:,start:start+pending.inputs.shape[0]]
+                    start += pending.inputs.shape[0]
+            except Exception as error:
+                for pending in batch:
+                    pending.error = error
+            for pending in batch:
+                pending.done.set()
+
+
+def parse_samples(text, features, samples_as_rows=False):
+    '''
+    The sample names and the Samples X features values of the text of a samples file
+    '''
+    lines = text.splitlines()
+    if not lines:
+        raise ValueError('The request has no samples')
+    delimiter = text_delimiter(lines)
+    if samples_as_rows:
+        names, chunks = [], []
+        for chunk_names, chunk_inputs in parse_sample_rows(lines, features, delimiter, len(lines)):
+            names += chunk_names
+            chunks.append(chunk_inputs)
+        return names, np.concatenate(chunks) if chunks else np.zeros((0, len(features)))
+    return parse_feature_rows(lines, features, delimiter)
+
+
+def _flag(query, name):
+    return str_to_bool(query.get(name, ['false'])[0])
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    """
+    The endpoints of the server. server.bundle, server.batcher and server.counters are set by make_server().
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, content):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/stats':
+            self._send_json(200, self.server.counters.to_dict())
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok', 'members': len(self.server.bundle), 'features': len(self.server.bundle.features)})
+        else:
+            self._send_json(404, {'error': f'Unknown endpoint {path}'})
+
+    def do_POST(self):
+        received = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path != '/predict':
+            self._send_json(404, {'error': f'Unknown endpoint {url.path}'})
+            return
+        query = parse_qs(url.query)
+        bundle = self.server.bundle
+        try:
+            text = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+            with_members = _flag(query, 'members')
+            names, inputs = parse_samples(text, bundle.features, _flag(query, 'samples_as_rows'))
+        except (ValueError, UnicodeDecodeError, StopIteration) as error:
+            self.server.counters.add_failure()
+            self._send_json(400, {'error': f'The samples could not be read: {error}'})
+            return
+        try:
+            if len(names):
+                member_predictions, queue_time = self.server.batcher.predict_members(inputs)
+            else:
+                member_predictions, queue_time = np.zeros((len(bundle), 0)), 0.0
+            soft, hard = bundle.votes(member_predictions)
+        except Exception as error:
+            self.server.counters.add_failure()
+            self._send_json(500, {'error': str(error)})
+            return
+
+        content = {'samples': names,
+                   'soft_vote': soft.round(6).tolist(),
+                   'soft_prediction': bundle.labels(soft),
+                   'hard_vote': hard.round(6).tolist(),
+                   'hard_prediction': bundle.labels(hard)}
+        if with_members:
+            content['members'] = member_predictions.T.round(6).tolist()
+        self.server.counters.add_request(len(names), time.perf_counter()-received, queue_time)
+        self._send_json(200, content)
+
+    def address_string(self):
+        # The client address of a Unix socket is not a (host, port) pair
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class InferenceHTTPServer(ThreadingHTTPServer):
+    # Room for the bursts of concurrent clients the micro-batching is for
+    request_queue_size = 128
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def make_server(bundle, host='127.0.0.1', port=8050, unix_socket=None, max_batch=1024, max_wait_ms=5, verbose=False):
+    '''
+    The HTTP server of the bundle, on host:port or on the unix_socket path
+    '''
+    if unix_socket is not None:
+        server = UnixHTTPServer(unix_socket, InferenceHandler)
+    else:
+        server = InferenceHTTPServer((host, port), InferenceHandler)
+    server.bundle = bundle
+    server.counters = LatencyCounters()
+    server.batcher = MicroBatcher(bundle, server.counters, max_batch, max_wait_ms/1000)
+    server.verbose = verbose
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local inference server for the first Pareto front of a MEvA-X run')
+    parser.add_argument("bundle_folder", type=str, help="[str]: The bundle directory of the run (Pareto_1_results/Bundle)")
+    parser.add_argument("--host", type=str, default='127.0.0.1', help="[str]: The address the server listens to. Default = 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050, help="[int]: The port the server listens to. Default = 8050")
+    parser.add_argument("--unix_socket", type=str, default=None, help="[str]: Listens to this Unix socket path instead of --host and --port. Default = None")
+    parser.add_argument("--max_batch", type=int, default=1024, help="[int]: The maximum number of samples of the requests scored together. Default = 1024")
+    parser.add_argument("--max_wait_ms", type=float, default=5, help="[float]: How long (ms) a request waits for other requests to be scored together. 0 disables the micro-batching. Default = 5")
+    parser.add_argument("--nthread", type=int, default=None, help="[int]: The number of threads of XGBoost. Default = all the cores")
+    parser.add_argument("--verbose", type=str_to_bool, default=False, help="[bool]: Logs every request. Default = False")
+    args = parser.parse_args()
+
+    bundle = Bundle(args.bundle_folder, args.nthread)
+    server = make_server(bundle, args.host, args.port, args.unix_socket, args.max_batch, args.max_wait_ms, args.verbose)
+    where = args.unix_socket if args.unix_socket is not None else f'http://{args.host}:{args.port}'
+    print(f'Serving {len(bundle)} models on {len(bundle.features)} features at {where}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+        if args.unix_socket is not None and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
@@ -0,0 +1,61 @@
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SCRIPTS_DIR)
+
+# The bounds of the parameter genes of the __main__ block of MEvA-X.py
+MIN_VALUES = np.array([0, 0, 4, 1, 0.01, 1, 0, 0, 0, 0, 0])
+MAX_VALUES = np.array([5, 3, 11, 101, 0.35, 7, 10, 10, 8, 15, 5])
+
+
+@pytest.fixture(scope='session')
+def mevax():
+    '''
+    The MEvA-X.py script as a module. It is registered in sys.modules so that the processes of its pools find its functions
+    '''
+    spec = importlib.util.spec_from_file_location('mevax', os.path.join(SCRIPTS_DIR, 'MEvA-X.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['mevax'] = module
+    spec.loader.exec_module(module)
+    module.parameters = MIN_VALUES.shape[0] # Set by the __main__ block
+    return module
+
+
+@pytest.fixture
+def problem(mevax, tmp_path):
+    '''
+    A two class dataset (Features X Samples) with a random population and the arguments of evaluate_individuals()
+    '''
+    np.random.seed(3)
+    rng = np.random.default_rng(3)
+    n_features, n_samples = 12, 60
+    labels = np.repeat([0, 1], n_samples//2)
+    dataset = rng.random((n_features, n_samples))
+    dataset[:3] += 0.4*labels # Informative features
+    dataset[5] = rng.integers(0, 4, n_samples) # A feature with few distinct values
+    min_values = np.append(MIN_VALUES, np.zeros(n_features))
+    max_values = np.append(MAX_VALUES, np.ones(n_features))
+    individuals = mevax.initialize_individuals(min_values, max_values, 6)
+    individuals[:,1] = 2 # No feature selection method
+    individuals[:,6] = rng.uniform(0, 0.5, individuals.shape[0]) # gamma and min_child_weight low enough for trees with splits
+    individuals[:,9] = rng.uniform(0, 2, individuals.shape[0])
+    output_folder = str(tmp_path) + os.sep
+    return dict(dataset=dataset, labels=labels, individuals=individuals, num_of_folds=3, output_folder=output_folder,
+                min_values=min_values, max_values=max_values,
+                classification_problems=mevax.create_different_classification_problems(labels, np.array([0, 1])))
+
+
+def evaluate(mevax, problem, individuals=None, **kwargs):
+    '''
+    evaluate_individuals() of the problem without feature selection genes. Returns the evaluation values
+    '''
+    individuals = problem['individuals'] if individuals is None else individuals
+    evaluation_values, _, _, _ = mevax.evaluate_individuals(problem['dataset'], problem['labels'], individuals, np.ones(10), problem['num_of_folds'],
+                                                            problem['classification_problems'], problem['output_folder'], None, None, None, None,
+                                                            multiclass=False, verbose=False, **kwargs)
+    return np.array(evaluation_values, dtype=float)
@@ -0,0 +1,27 @@
+'''
+Writes knn_fixture.npz, the imputations of knn_impute_optimistic() of knnimpute (k=5) that test_preprocessing.py
+compares with knn_impute() of MEvA-X.py. Run it from any directory with knnimpute installed.
+'''
+import os
+
+import numpy as np
+from knnimpute import knn_impute_optimistic
+
+
+def fixture_samples():
+    rng = np.random.default_rng(25)
+    dense = rng.normal(100, 10, size=(40, 12)) # Every pair of samples shares features
+    dense[rng.random(dense.shape) < 0.3] = np.nan
+    blocks = rng.normal(size=(30, 10))
+    blocks[:10, 5:] = np.nan # The first samples share no feature with the last ones
+    blocks[20:, :5] = np.nan
+    blocks[rng.random(blocks.shape) < 0.2] = np.nan
+    return dense, blocks
+
+
+if __name__ == "__main__":
+    arrays = {}
+    for name, samples in zip(('dense', 'blocks'), fixture_samples()):
+        arrays[name] = samples
+        arrays[name+'_imputed'] = knn_impute_optimistic(samples.copy(), np.isnan(samples), k=5)
+    np.savez(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knn_fixture.npz'), **arrays)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+
+def dominates(a, b):
+    return bool((a >= b).all() and (a > b).any())
+
+
+@pytest.mark.parametrize('max_size', [None, 6])
+def test_archive_keeps_the_sorted_non_dominated_individuals(mevax, max_size):
+    rng = np.random.default_rng(4)
+    archive = mevax.ParetoArchive(max_size)
+    inserted = {}
+    for step in range(400):
+        individual = np.append(step, rng.integers(0, 3, 4)).astype(float) # A new genome every time
+        evaluation_values = np.append(rng.integers(0, 6, 3)/5, rng.random()) # Few distinct values: ties and dominated entries
+        archive.insert(individual, evaluation_values)
+        inserted[individual.tobytes()] = evaluation_values[:-1]
+
+        objectives = archive.evaluation_values[:-1]
+        assert len(archive) == archive.individuals.shape[0] == objectives.shape[1]
+        assert (np.diff(objectives[0]) <= 0).all() # Sorted by the first objective
+        assert not any(dominates(objectives[:,i], objectives[:,j]) for i in range(len(archive)) for j in range(len(archive)))
+        assert len(set(individual.tobytes() for individual in archive.individuals)) == len(archive)
+        if max_size is not None:
+            assert len(archive) <= max_size
+
+    if max_size is None: # The archive is the non-dominated set of all the individuals that were inserted
+        non_dominated = set(genome for genome, objectives in inserted.items()
+                            if not any(dominates(other, objectives) for other in inserted.values()))
+        assert set(individual.tobytes() for individual in archive.individuals) == non_dominated
+
+
+def test_archive_arrays_keep_the_archive(mevax, tmp_path):
+    rng = np.random.default_rng(5)
+    archive = mevax.ParetoArchive(8)
+    archive.update(rng.random((30, 4)), np.vstack([rng.random((3, 30)), rng.random((1, 30))]))
+    np.savez(tmp_path/'archive.npz', **archive.to_arrays())
+    with np.load(tmp_path/'archive.npz', allow_pickle=False) as arrays:
+        restored = mevax.ParetoArchive.from_arrays(dict(arrays))
+
+    assert (restored.max_size, restored.insertions) == (archive.max_size, archive.insertions)
+    np.testing.assert_array_equal(restored.individuals, archive.individuals)
+    np.testing.assert_array_equal(restored.evaluation_values, archive.evaluation_values)
+    individuals, evaluation_values = rng.random((10, 4)), rng.random((4, 10))
+    assert restored.update(individuals, evaluation_values) == archive.update(individuals, evaluation_values)
+    np.testing.assert_array_equal(restored.individuals, archive.individuals)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('with_missing', [False, True])
+def test_binned_folds_give_the_fitness_of_the_hist_method(mevax, problem, with_missing):
+    dataset = problem['dataset'].copy()
+    if with_missing:
+        dataset[np.random.default_rng(0).random(dataset.shape) < 0.05] = np.nan
+    labels, individuals = problem['labels'], problem['individuals']
+    filter_mask = mevax.filter_function(individuals, None, None, None, None, False)
+    max_bin = mevax.get_binned_folds(dataset, labels, problem['num_of_folds'], 7).max_bin
+    assert max_bin > 4
+
+    class RawHistIndividual(mevax.Individual):
+        # The hist tree method on the raw values, with enough bins for every distinct value
+        def booster_params(self):
+            return dict(super().booster_params(), tree_method='hist', max_bin=max_bin)
+
+    for i in range(individuals.shape[0]):
+        args = (individuals[i], i, dataset, labels, problem['num_of_folds'], filter_mask[i], False, 7)
+        binned, _, _ = mevax.Individual(*args, verbose=True, nthread=1, binned=True).evaluate()
+        raw, _, _ = RawHistIndividual(*args, verbose=True, nthread=1).evaluate()
+        np.testing.assert_array_equal(binned, raw)
+
+
+def test_binned_codes_are_compact(mevax, problem):
+    binned_folds = mevax.BinnedFolds(problem['dataset'].T, problem['labels'], problem['num_of_folds'], 7)
+    for training_codes, testing_codes, _, _ in binned_folds.folds:
+        assert training_codes.dtype == testing_codes.dtype == np.uint8
+        assert training_codes.max() < binned_folds.max_bin and testing_codes.max() < binned_folds.max_bin
+
+
+def test_binned_folds_are_not_reused_for_a_new_dataset(mevax, problem):
+    # The datasets of the loop are freed, so their ids are reused
+    for i in range(10):
+        dataset = np.random.default_rng(i).random(problem['dataset'].shape)
+        binned_folds = mevax.get_binned_folds(dataset, problem['labels'], problem['num_of_folds'], 7)
+        expected = mevax.BinnedFolds(dataset.T, problem['labels'], problem['num_of_folds'], 7)
+        for (training_codes, testing_codes, _, _), (expected_training, expected_testing, _, _) in zip(binned_folds.folds, expected.folds):
+            np.testing.assert_array_equal(training_codes, expected_training)
+            np.testing.assert_array_equal(testing_codes, expected_testing)
+        del dataset, binned_folds
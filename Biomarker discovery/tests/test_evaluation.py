@@ -0,0 +1,65 @@
+import numpy as np
+
+from conftest import evaluate
+
+
+def test_parallel_evaluation_equals_serial(mevax, problem):
+    serial = evaluate(mevax, problem, n_jobs=1, cv_seed=7)
+    parallel = evaluate(mevax, problem, n_jobs=2, cv_seed=7)
+    np.testing.assert_array_equal(parallel, serial)
+
+
+def test_fitness_cache_gives_the_same_fitness(mevax, problem):
+    individuals = problem['individuals'][[0, 1, 2, 0, 3, 1]] # Duplicates of the same generation
+    uncached = evaluate(mevax, problem, individuals, cv_seed=7)
+    fitness_cache = mevax.FitnessCache(100)
+    first = evaluate(mevax, problem, individuals, cv_seed=7, fitness_cache=fitness_cache)
+    second = evaluate(mevax, problem, individuals, cv_seed=7, fitness_cache=fitness_cache) # All from the cache
+    assert fitness_cache.misses == 4 and fitness_cache.hits == 2+individuals.shape[0]
+    np.testing.assert_array_equal(first, uncached)
+    np.testing.assert_array_equal(second, uncached)
+
+
+def test_shared_dataset_evaluation_equals_serial(mevax, problem):
+    serial = evaluate(mevax, problem, n_jobs=1, cv_seed=7)
+    shared_dataset = mevax.SharedDataset(problem['dataset'])
+    try:
+        parallel = evaluate(mevax, problem, n_jobs=2, cv_seed=7, shared_dataset=shared_dataset)
+    finally:
+        shared_dataset.unlink()
+    np.testing.assert_array_equal(parallel, serial)
+
+
+def test_dmatrix_pool_gives_the_same_fitness(mevax, problem):
+    individuals = problem['individuals'].copy()
+    individuals[3:, mevax.parameters:] = individuals[:3, mevax.parameters:] # Same features, other hyperparameters
+    without_pool = evaluate(mevax, problem, individuals, cv_seed=7)
+    dmatrix_pool = mevax.DMatrixPool(64*1024**2)
+    with_pool = evaluate(mevax, problem, individuals, cv_seed=7, dmatrix_pool=dmatrix_pool)
+    assert dmatrix_pool.hits == 3
+    np.testing.assert_array_equal(with_pool, without_pool)
+    np.testing.assert_array_equal(evaluate(mevax, problem, individuals, cv_seed=7, dmatrix_pool=dmatrix_pool), without_pool)
+
+
+def test_fitness_cache_arrays_keep_the_evaluations(mevax, problem, tmp_path):
+    individuals = problem['individuals'].copy()
+    individuals[0,mevax.parameters:] = 0 # An individual without features
+    fitness_cache = mevax.FitnessCache(100)
+    evaluate(mevax, problem, individuals, cv_seed=7, fitness_cache=fitness_cache)
+    arrays = fitness_cache.to_arrays()
+    assert not arrays['with_features'][0] and arrays['with_features'][1:].all()
+    np.savez(tmp_path/'cache.npz', **arrays)
+    with np.load(tmp_path/'cache.npz', allow_pickle=False) as arrays:
+        restored = mevax.FitnessCache.from_arrays(dict(arrays))
+
+    assert (restored.max_size, restored.hits, restored.misses) == (fitness_cache.max_size, fitness_cache.hits, fitness_cache.misses)
+    assert list(restored._evaluations) == list(fitness_cache._evaluations)
+    for (res, mean_std, roc), (restored_res, restored_mean_std, restored_roc) in zip(fitness_cache._evaluations.values(), restored._evaluations.values()):
+        np.testing.assert_array_equal(restored_res, res)
+        assert restored_mean_std == mean_std
+        if isinstance(roc, np.ndarray):
+            np.testing.assert_array_equal(restored_roc, roc)
+        else:
+            for fold, restored_fold in zip(roc, restored_roc):
+                for values, restored_values in zip(fold, restored_fold):
+                    np.testing.assert_array_equal(restored_values, values)
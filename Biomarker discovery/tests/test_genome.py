@@ -0,0 +1,16 @@
+import numpy as np
+
+
+def test_popcount_xor_distances_match_the_dense_genes(mevax):
+    rng = np.random.default_rng(0)
+    individuals = rng.random((7, mevax.parameters+21))
+    individuals[:,mevax.parameters:] = rng.random((7, 21)) < 0.3
+    individuals[2,mevax.parameters+4] = 0.7 # Left by an arithmetic crossover
+    bits = mevax.packed_feature_genes(individuals)
+    active = individuals[:,mevax.parameters:] > 0.5
+
+    assert bits.shape == (7, 3)
+    np.testing.assert_array_equal(mevax.popcount(bits), active.sum(axis=1))
+    np.testing.assert_array_equal(mevax.xor_distances(bits, chunk_size=3), (active[:,None,:] != active[None,:,:]).sum(axis=2))
+    for i in range(individuals.shape[0]):
+        np.testing.assert_array_equal(mevax.active_genes(bits, i), np.flatnonzero(active[i]))
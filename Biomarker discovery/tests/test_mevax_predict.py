@@ -0,0 +1,142 @@
+import io
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+import xgboost as xgb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import mevax_predict
+import mevax_serve
+
+
+FEATURES = ['g0', 'g1', 'g2']
+
+
+@pytest.fixture
+def bundle_folder(tmp_path):
+    '''
+    A bundle of two members trained on random data, in the format of export_pareto_bundle() of MEvA-X.py
+    '''
+    rng = np.random.default_rng(0)
+    values = rng.random((40, len(FEATURES)))
+    labels = (values[:,0]+values[:,2] > 1).astype(int)
+    members = []
+    for i, names in enumerate([['g0', 'g2'], ['g1', 'g2', 'g0']]):
+        columns = [FEATURES.index(name) for name in names]
+        booster = xgb.train({'objective': 'binary:logistic', 'max_depth': 2}, xgb.DMatrix(values[:,columns], label=labels), num_boost_round=5)
+        booster.save_model(str(tmp_path/f'member_{i}.ubj'))
+        members.append({'individual': i, 'feature_indices': columns, 'feature_names': names, 'n_trees': 5, 'booster': f'member_{i}.ubj'})
+    manifest = {'format': 'MEvA-X bundle', 'version': mevax_predict.BUNDLE_VERSION, 'objective': 'binary:logistic',
+                'classes': ['N', 'R'], 'n_training_features': len(FEATURES),
+                'normalization': {'method': 'min_max', 'features': {name: {'scale': 0.5, 'offset': 0.1} for name in FEATURES}},
+                'members': members}
+    with open(tmp_path/'manifest.json', 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    return tmp_path
+
+
+def write_samples(path, samples, samples_as_rows):
+    names = [f's{i}' for i in range(samples.shape[0])]
+    with open(path, 'w') as handle:
+        if samples_as_rows:
+            handle.write('ID\t'+'\t'.join(FEATURES)+'\n')
+            for name, row in zip(names, samples):
+                handle.write(name+'\t'+'\t'.join(str(value) for value in row)+'\n')
+        else:
+            handle.write('ID\t'+'\t'.join(names)+'\n')
+            for feature, row in zip(FEATURES, samples.T):
+                handle.write(feature+'\t'+'\t'.join(str(value) for value in row)+'\n')
+    return names
+
+
+@pytest.mark.parametrize('samples_as_rows', [False, True])
+def test_score_samples_scores_every_chunk(bundle_folder, tmp_path, samples_as_rows):
+    bundle = mevax_predict.Bundle(str(bundle_folder), nthread=1)
+    samples = np.random.default_rng(1).random((11, len(FEATURES)))
+    names = write_samples(tmp_path/'samples.tsv', samples, samples_as_rows)
+
+    output = io.StringIO()
+    n_samples = mevax_predict.score_samples(bundle, str(tmp_path/'samples.tsv'), output, chunk_size=4, samples_as_rows=samples_as_rows)
+
+    lines = output.getvalue().splitlines()[1:]
+    assert n_samples == len(names)
+    assert [line.split('\t')[0] for line in lines] == names
+    soft, hard = bundle.predict(samples[:,[FEATURES.index(name) for name in bundle.features]])
+    np.testing.assert_allclose([float(line.split('\t')[1]) for line in lines], soft, atol=1e-6)
+    np.testing.assert_allclose([float(line.split('\t')[3]) for line in lines], hard, atol=1e-6)
+
+
+def test_parse_sample_rows_rejects_short_rows():
+    with pytest.raises(ValueError):
+        list(mevax_predict.parse_sample_rows(['ID,g0,g1,g2', 's1,1,2'], FEATURES, ',', 10))
+
+
+@pytest.fixture
+def server(bundle_folder):
+    bundle = mevax_predict.Bundle(str(bundle_folder), nthread=1)
+    server = mevax_serve.make_server(bundle, port=0, max_wait_ms=500)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.batcher.close()
+    thread.join()
+
+
+def post(server, body, query=''):
+    request = urllib.request.Request(f'http://127.0.0.1:{server.server_port}/predict{query}', data=body.encode(), method='POST')
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def samples_text(samples):
+    return 'ID\t'+'\t'.join(FEATURES)+'\n'+''.join(f's{i}\t'+'\t'.join(str(value) for value in row)+'\n' for i, row in enumerate(samples))
+
+
+def test_server_scores_concurrent_requests_in_one_batch(server):
+    bundle = server.bundle
+    rng = np.random.default_rng(2)
+    requests = [rng.random((n_samples, len(FEATURES))) for n_samples in (1, 3, 2, 5)]
+    responses = [None]*len(requests)
+    start = threading.Barrier(len(requests))
+    def client(i):
+        start.wait()
+        responses[i] = post(server, samples_text(requests[i]), '?samples_as_rows=true&members=yes')
+
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(len(requests))]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+
+    for samples, response in zip(requests, responses):
+        inputs = samples[:,[FEATURES.index(name) for name in bundle.features]]
+        soft, hard = bundle.predict(inputs)
+        assert response['samples'] == [f's{i}' for i in range(samples.shape[0])]
+        np.testing.assert_allclose(response['soft_vote'], soft, atol=1e-6)
+        np.testing.assert_allclose(response['hard_vote'], hard, atol=1e-6)
+        assert response['soft_prediction'] == bundle.labels(soft)
+        np.testing.assert_allclose(response['members'], bundle.predict_members(inputs).T, atol=1e-6)
+    stats = server.counters.to_dict()
+    assert stats['requests'] == len(requests) and stats['samples'] == sum(samples.shape[0] for samples in requests)
+    assert stats['batches'] < len(requests) # The requests of the same max_wait_ms are scored together
+
+
+def test_server_rejects_invalid_requests(server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(server, samples_text(np.ones((2, len(FEATURES)))), '?samples_as_rows=maybe')
+    assert error.value.code == 400
+    assert server.counters.to_dict()['failed_requests'] == 1
+
+
+def test_str_to_bool():
+    assert [mevax_predict.str_to_bool(value) for value in ('True', 'yes', '1', 'off', 'F', '0')] == [True, True, True, False, False, False]
+    with pytest.raises(ValueError):
+        mevax_predict.str_to_bool('maybe')
@@ -0,0 +1,159 @@
+import os
+import random
+import time
+
+import numpy as np
+import pytest
+
+from conftest import MAX_VALUES, MIN_VALUES
+
+EVAL_NAMES = np.array(['Model_complexity #features', 'Accuracy', 'Model_complexity #splits', 'weighted Geometric Mean', 'F1 score', 'F2 score',
+                       'Precision', 'Recall', 'AUrocC', 'Balanced_accuracy', 'Manhattan distance^-1', 'Overall_score'])
+
+
+def run_modeller(mevax, problem, **kwargs):
+    dataset = problem['dataset']
+    feature_names = np.array([f'g{i}' for i in range(dataset.shape[0])])
+    sample_names = np.array([f's{i}' for i in range(dataset.shape[1])])
+    labels = np.where(problem['labels'] == 1, 'R', 'N')
+    mevax.biomarker_discovery_modeller(dataset, feature_names, sample_names, labels, MIN_VALUES, MAX_VALUES, 6, 3,
+                                       goal_significances=np.ones(11), num_of_folds=problem['num_of_folds'],
+                                       output_folder=problem['output_folder'], eval_names=EVAL_NAMES, missing_values_flag=False,
+                                       normalize_flag=False, verbose=False, **kwargs)
+
+
+def test_racing_is_rejected_with_the_model_store(mevax, problem):
+    with pytest.raises(ValueError):
+        run_modeller(mevax, problem, racing_folds=1, model_store=True)
+
+
+def separable_problem(problem):
+    '''
+    The problem with enough samples for models with splits in the final majority voting
+    '''
+    rng = np.random.default_rng(5)
+    labels = np.repeat([0, 1], 100)
+    dataset = rng.random((problem['dataset'].shape[0], labels.shape[0]))
+    dataset[:3] += labels
+    return dict(problem, dataset=dataset, labels=labels)
+
+
+def run_folder(mevax, problem, folder, log_format=None, **kwargs):
+    '''
+    Runs the modeller with the seeds, the module globals and the RunLog of the __main__ block, in its own results directory
+    '''
+    os.makedirs(os.path.join(folder, 'Evolutionary process'), exist_ok=True)
+    output_folder = os.path.join(folder, '')
+    random.seed(1)
+    np.random.seed(1)
+    mevax.output_folder = output_folder
+    mevax.feature_names = np.array([f'g{i}' for i in range(problem['dataset'].shape[0])])
+    mevax.prog_time = time.time()
+    mevax.FS_dir = None
+    mevax.verbose = False
+    mevax.run_log = None if log_format is None else mevax.RunLog(output_folder, log_format, mevax.feature_names, mevax.parameters)
+    try:
+        run_modeller(mevax, dict(problem, output_folder=output_folder), rng=np.random.default_rng(1), export_bundle=False, **kwargs)
+    finally:
+        if mevax.run_log is not None:
+            mevax.run_log.close()
+            mevax.run_log = None
+
+
+def output_files(folder):
+    skipped = ('timing.txt', 'checkpoint.npz')
+    files = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            if name not in skipped and not name.endswith('.pkl'):
+                with open(os.path.join(root, name), 'rb') as f:
+                    files[os.path.relpath(os.path.join(root, name), folder)] = f.read()
+    return files
+
+
+def test_resumed_run_equals_an_uninterrupted_run(mevax, problem, tmp_path, monkeypatch):
+    problem = separable_problem(problem)
+    settings = dict(cache_size=50, cv_seed=3, archive_size=10) # The fitness cache and the Pareto archive are in the checkpoint
+    run_folder(mevax, problem, str(tmp_path/'uninterrupted'), **settings)
+
+    class Interrupted(Exception):
+        pass
+
+    log_generation = mevax.log_generation
+    def interrupted_log_generation(output_folder, record):
+        log_generation(output_folder, record)
+        if record['generation'] == 1: # After the logs of the generation, before its checkpoint
+            raise Interrupted
+
+    monkeypatch.setattr(mevax, 'log_generation', interrupted_log_generation)
+    with pytest.raises(Interrupted):
+        run_folder(mevax, problem, str(tmp_path/'resumed'), checkpoint_every=1, **settings)
+    monkeypatch.setattr(mevax, 'log_generation', log_generation)
+    with open(tmp_path/'resumed'/'notes.txt', 'w') as f: # Not a file of the run
+        f.write('notes')
+    run_folder(mevax, problem, str(tmp_path/'resumed'), checkpoint_every=1, resume=True, **settings)
+
+    resumed = output_files(tmp_path/'resumed')
+    assert resumed.pop('notes.txt') == b'notes'
+    assert resumed == output_files(tmp_path/'uninterrupted')
+
+
+def test_binary_log_exports_the_text_logs(mevax, problem, tmp_path):
+    problem = separable_problem(problem)
+    run_folder(mevax, problem, str(tmp_path/'text'))
+    run_folder(mevax, problem, str(tmp_path/'binary'), log_format='binary')
+    with np.load(tmp_path/'binary'/'run_log'/'generation_000000.npz', allow_pickle=False) as arrays:
+        assert set(mevax.RunLog.GENERATION_FIELDS+mevax.RunLog.OPTIONAL_FIELDS) < set(arrays.files)
+    mevax.export_run_log(str(tmp_path/'binary'))
+
+    text = output_files(tmp_path/'text')
+    binary = {path: content for path, content in output_files(tmp_path/'binary').items() if not path.startswith('run_log')}
+    del text['output_files.txt'], binary['output_files.txt'] # The files written through the RunLog are not listed
+    assert binary == text
+
+
+def test_islands_share_the_jobs_and_start_with_empty_caches(mevax):
+    fitness_cache = mevax.FitnessCache(100)
+    fitness_cache.put(('features', (0.1,)*7, 1, 3), 'evaluation')
+    dmatrix_pool = mevax.DMatrixPool(3*1024**2)
+    pareto_archive = mevax.ParetoArchive(20)
+    pareto_archive.insert(np.ones(4), np.array([1.0, 2.0, 1.5]))
+    evolution_args = dict(n_jobs=7, fitness_cache=fitness_cache, dmatrix_pool=dmatrix_pool, pareto_archive=pareto_archive)
+
+    island_args = mevax.island_evolution_args(evolution_args, 3)
+    assert island_args['n_jobs'] == 2
+    assert len(island_args['fitness_cache']) == 0 and island_args['fitness_cache'].max_size == 100
+    assert len(island_args['dmatrix_pool']) == 0 and island_args['dmatrix_pool'].max_bytes == 1024**2
+    assert len(island_args['pareto_archive']) == 0 and island_args['pareto_archive'].max_size == 20
+    assert mevax.island_evolution_args(dict(n_jobs=2, fitness_cache=None, dmatrix_pool=None, pareto_archive=None), 4)['n_jobs'] == 1
+
+
+@pytest.mark.parametrize('settings', [dict(racing_folds=1), dict(model_store=True)])
+def test_steady_state_is_rejected_with_racing_and_the_model_store(mevax, problem, settings):
+    with pytest.raises(ValueError):
+        run_modeller(mevax, problem, steady_state=True, **settings)
+
+
+def test_model_store_does_not_change_the_majority_voting(mevax, problem, tmp_path, monkeypatch):
+    problem = separable_problem(problem)
+    cv_seed = 3
+    run_folder(mevax, problem, str(tmp_path/'default'), cv_seed=cv_seed)
+    run_folder(mevax, problem, str(tmp_path/'store'), cv_seed=cv_seed, model_store=True)
+    assert output_files(tmp_path/'store') == output_files(tmp_path/'default')
+
+    stores = []
+    majority_voting = mevax.majority_voting
+    randint = np.random.randint
+    def same_folds_majority_voting(*args, model_store=None, **kwargs):
+        # The vote draws its seed as usual, but gets the folds of the evaluations so that the store has its boosters
+        stores.append(model_store)
+        with monkeypatch.context() as context:
+            context.setattr(np.random, 'randint', lambda *randint_args: (randint(*randint_args), cv_seed)[1])
+            return majority_voting(*args, model_store=model_store, **kwargs)
+
+    monkeypatch.setattr(mevax, 'majority_voting', same_folds_majority_voting)
+    run_folder(mevax, problem, str(tmp_path/'without'), cv_seed=cv_seed)
+    run_folder(mevax, problem, str(tmp_path/'with'), cv_seed=cv_seed, model_store=True)
+
+    assert stores[-1].reused > 0 and stores[-1].trained == 0
+    assert output_files(tmp_path/'with') == output_files(tmp_path/'without')
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+KNN_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'knn_fixture.npz') # See data/make_knn_fixture.py
+
+
+@pytest.mark.parametrize('labels', [np.array(['R', 'N', 'N', 'R'], dtype=object), np.array([1, 0, 0, 1])])
+def test_preprocessed_dataset_keeps_the_labels(mevax, tmp_path, labels):
+    dataset = np.arange(12, dtype=float).reshape(3, 4)
+    entry = str(tmp_path/'entry')
+    mevax.save_preprocessed_dataset(entry, dataset, ['g0', 'g1', 'g2'], ['s0', 's1', 's2', 's3'], labels, verbose=False)
+
+    assert np.load(os.path.join(entry, 'labels.npy'), allow_pickle=False).shape == labels.shape
+    preprocessed = mevax.load_preprocessed_dataset(entry)
+    assert preprocessed['labels'].dtype == labels.dtype
+    assert preprocessed['labels'].tolist() == labels.tolist()
+    np.testing.assert_array_equal(preprocessed['dataset'], dataset)
+    assert preprocessed['feature_names'].tolist() == ['g0', 'g1', 'g2']
+
+
+def test_preprocessed_dataset_reports_the_failures_without_globals(mevax, tmp_path, monkeypatch, capsys):
+    def failed_rename(source, destination):
+        raise OSError('read-only')
+
+    monkeypatch.delattr(mevax, 'verbose', raising=False)
+    monkeypatch.setattr(mevax.os, 'rename', failed_rename)
+    mevax.save_preprocessed_dataset(str(tmp_path/'entry'), np.ones((2, 2)), ['g0', 'g1'], ['s0', 's1'], ['R', 'N'], verbose=True)
+
+    assert 'read-only' in capsys.readouterr().out
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('name', ['dense', 'blocks'])
+@pytest.mark.parametrize('block_size, n_jobs', [(2**23, 1), (100, 1), (100, 2)])
+def test_knn_impute_matches_knnimpute(mevax, name, block_size, n_jobs):
+    with np.load(KNN_FIXTURE) as fixture:
+        samples, expected = fixture[name], fixture[name+'_imputed']
+    imputed = mevax.knn_impute(samples, k=5, n_jobs=n_jobs, block_size=block_size)
+    np.testing.assert_allclose(imputed, expected, rtol=1e-6)
+    assert np.isnan(samples).any() # The samples are not imputed in place
+
+
+@pytest.mark.parametrize('imputer', ['knn', 'mean'])
+def test_impute_returns_an_array(mevax, imputer):
+    with np.load(KNN_FIXTURE) as fixture:
+        samples = fixture['dense']
+    data = pd.DataFrame(samples.T, index=[f'g{i}' for i in range(samples.shape[1])])
+    labels = np.repeat(['N', 'R'], samples.shape[0]//2)
+    imputed = mevax.impute(labels, data, imputer=imputer)
+    assert type(imputed) is np.ndarray and imputed.shape == data.shape
+    assert not np.isnan(imputed).any()
+    np.testing.assert_array_equal(imputed[data.notnull().to_numpy()], data.to_numpy()[data.notnull().to_numpy()])
@@ -0,0 +1,42 @@
+import numpy as np
+
+from conftest import MAX_VALUES, MIN_VALUES
+
+
+def whole_ranking(mevax, individuals, evaluation_values, goal_significances, min_values, max_values):
+    '''
+    The fronts and the overall scores after the niches of all the individuals, like in one generation of apply_evolutionary_process()
+    '''
+    fronts = mevax.pareto_frontiers(evaluation_values)
+    sigma_share = 0.5/(float(individuals.shape[1])**(0.1))
+    shared_values = mevax.similarity_function_rounded(fronts, evaluation_values, individuals, sigma_share, max_values, min_values, to_log=False)
+    return fronts, (shared_values[:-1]*goal_significances.reshape(-1,1)).sum(axis=0)/(shared_values.shape[0]-1)
+
+
+def test_incremental_ranking_equals_the_whole_ranking(mevax, monkeypatch):
+    monkeypatch.setattr(mevax, 'verbose', False, raising=False)
+    rng = np.random.default_rng(2)
+    n_features, population = 20, 12
+    min_values = np.append(MIN_VALUES, np.zeros(n_features))
+    max_values = np.append(MAX_VALUES, np.ones(n_features))
+    goal_significances = rng.uniform(0.5, 2, 4)
+
+    def random_individuals(n):
+        individuals = mevax.initialize_individuals(min_values, max_values, n)
+        individuals[:,MIN_VALUES.shape[0]:] = rng.random((n, n_features)) < 0.3
+        return individuals
+
+    def random_values(n):
+        return np.vstack([rng.integers(0, 4, (4, n))/4, rng.random((1, n))]) # Few distinct values: ties and long chains of dominance
+
+    ranking = mevax.SteadyStateRanking(random_individuals(population), random_values(population), goal_significances, max_values, min_values)
+    for step in range(40):
+        ranking.add(random_individuals(1)[0], random_values(1)[:,0])
+        fronts, overall = whole_ranking(mevax, ranking.individuals, ranking.evaluation_values, goal_significances, min_values, max_values)
+        np.testing.assert_array_equal(ranking.fronts, fronts)
+        np.testing.assert_array_equal(ranking.overall, overall)
+
+        ranking.remove(rng.integers(population+1) if step % 2 else np.flatnonzero(fronts == fronts.max())[0])
+        fronts, overall = whole_ranking(mevax, ranking.individuals, ranking.evaluation_values, goal_significances, min_values, max_values)
+        np.testing.assert_array_equal(ranking.fronts, fronts)
+        np.testing.assert_array_equal(ranking.overall, overall)